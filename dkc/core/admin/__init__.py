@@ -1,7 +1,15 @@
+from .checksum_recompute import ChecksumRecomputeAdmin
 from .file import FileAdmin
 from .folder import FolderAdmin
 from .quota import QuotaAdmin
 from .terms import TermsAdmin
 from .tree import TreeAdmin
 
-__all__ = ['FileAdmin', 'FolderAdmin', 'QuotaAdmin', 'TermsAdmin', 'TreeAdmin']
+__all__ = [
+    'ChecksumRecomputeAdmin',
+    'FileAdmin',
+    'FolderAdmin',
+    'QuotaAdmin',
+    'TermsAdmin',
+    'TreeAdmin',
+]
@@ -0,0 +1,28 @@
+from django.contrib import admin
+from django.http import HttpRequest
+
+from dkc.core.models import ChecksumRecompute
+
+
+@admin.register(ChecksumRecompute)
+class ChecksumRecomputeAdmin(admin.ModelAdmin):
+    list_display = ['id', 'created', 'creator', 'progress', 'completed']
+    list_select_related = ['creator']
+
+    fields = ['created', 'creator', 'total', 'enqueued', 'progress', 'completed']
+    readonly_fields = fields
+
+    @admin.display(description='% Queued')
+    def progress(self, obj: ChecksumRecompute) -> str:
+        if obj.total is None:
+            return 'Starting'
+        if obj.total == 0:
+            return '--'
+        return '{:.1%}'.format(obj.enqueued / obj.total)
+
+    def has_add_permission(self, request: HttpRequest) -> bool:
+        # These are only created by the "Recompute checksum" action on files
+        return False
+
+    def has_change_permission(self, request: HttpRequest, obj=None) -> bool:
+        return False
@@ -1,19 +1,26 @@
+from typing import Dict, List
+
 from django.contrib import admin, messages
+from django.contrib.admin.utils import get_fields_from_path
+from django.contrib.admin.views.main import SEARCH_VAR
 from django.db.models import QuerySet
 from django.http import HttpRequest
+from django.urls import reverse
+from django.utils.html import format_html
 
-from dkc.core.models import File
-from dkc.core.tasks import file_compute_sha512
+from dkc.core.admin.pagination import EstimatedCountAdminMixin
+from dkc.core.models import ChecksumRecompute, File
+from dkc.core.tasks import enqueue_checksum_recompute
 
 
 @admin.register(File)
-class FileAdmin(admin.ModelAdmin):
+class FileAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
     list_display = ['id', 'name', 'short_checksum', 'created', 'creator', 'folder']
     list_display_links = ['id', 'name']
     list_filter = [
         ('sha512', admin.EmptyFieldListFilter),
+        'sha512_verified',
         ('created', admin.DateFieldListFilter),
-        'creator__username',
     ]
     list_select_related = True
 
@@ -26,7 +33,10 @@ class FileAdmin(admin.ModelAdmin):
         'user_metadata',
         'content_type',
         'blob',
+        'md5',
+        'sha256',
         'sha512',
+        'sha512_verified',
         'size',
         'creator',
         'created',
@@ -36,13 +46,34 @@ class FileAdmin(admin.ModelAdmin):
     autocomplete_fields = ['folder']
 
     def get_readonly_fields(self, request, obj=None):
-        fields = ['sha512', 'created', 'modified']
+        fields = ['md5', 'sha256', 'sha512', 'sha512_verified', 'created', 'modified']
         # Allow setting of folder only on initial creation
         if obj is None:
             return fields
         else:
             return fields + ['folder']
 
+    def get_changelist_selection(self, params: Dict[str, List[str]]) -> QuerySet[File]:
+        """
+        Select every File matching the filters and search of a changelist's query parameters.
+
+        Unlike the changelist itself, this needs no request, and makes no count or pagination
+        queries.
+        """
+        # Like a query string, the last value of each parameter is used
+        lookup_params = {key: values[-1] for key, values in params.items() if values}
+        queryset = File.objects.all()
+        for list_filter in self.list_filter:
+            if isinstance(list_filter, (list, tuple)):
+                field_path, filter_class = list_filter
+            else:
+                field_path, filter_class = list_filter, admin.FieldListFilter.create
+            field = get_fields_from_path(File, field_path)[-1]
+            spec = filter_class(field, None, lookup_params, File, self, field_path)
+            queryset = spec.queryset(None, queryset)
+        queryset, _ = self.get_search_results(None, queryset, lookup_params.get(SEARCH_VAR, ''))
+        return queryset
+
     @admin.display(
         description='Checksum prefix',
         empty_value='Not computed',
@@ -54,6 +85,22 @@ class FileAdmin(admin.ModelAdmin):
 
     @admin.action(description='Recompute checksum')
     def compute_sha512(self, request: HttpRequest, queryset: QuerySet):
-        for file in queryset:
-            file_compute_sha512.delay(file.pk)
-        self.message_user(request, f'{len(queryset)} files queued', messages.SUCCESS)
+        if request.POST.get('select_across') == '1':
+            # Selections of every matching file may be very large, so resolve them later
+            recompute = ChecksumRecompute.objects.create(
+                creator=request.user,
+                changelist_params={key: request.GET.getlist(key) for key in request.GET},
+            )
+        else:
+            recompute = ChecksumRecompute.objects.create(
+                creator=request.user, file_ids=list(queryset.values_list('pk', flat=True))
+            )
+        enqueue_checksum_recompute.delay(recompute.id)
+        self.message_user(
+            request,
+            format_html(
+                'Files are being queued; <a href="{}">view progress</a>',
+                reverse('admin:core_checksumrecompute_change', args=[recompute.id]),
+            ),
+            messages.SUCCESS,
+        )
@@ -1,11 +1,12 @@
 from django.contrib import admin
 from django.db import transaction
 
+from dkc.core.admin.pagination import EstimatedCountAdminMixin
 from dkc.core.models import Folder, Tree
 
 
 @admin.register(Folder)
-class FolderAdmin(admin.ModelAdmin):
+class FolderAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
     list_select_related = ['parent']
     list_display = ['id', 'name', 'parent']
     list_display_links = ['id', 'name']
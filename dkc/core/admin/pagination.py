@@ -0,0 +1,56 @@
+import json
+
+from django.core.paginator import Paginator
+from django.db import connections, models
+from django.utils.functional import cached_property
+
+# Below this many estimated rows, counting exactly is fast enough
+EXACT_COUNT_THRESHOLD = 10000
+
+
+def estimated_count(queryset: models.QuerySet) -> int:
+    """
+    Count the rows of a queryset, estimating the count of large results.
+
+    Unfiltered querysets are estimated from the table statistics, and filtered ones from the
+    query planner. If the estimate is small, or estimates are unavailable, an exact count is
+    made instead.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+
+    with connection.cursor() as cursor:
+        if not queryset.query.where and not queryset.query.distinct:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table],
+            )
+            estimate = int(cursor.fetchone()[0])
+        else:
+            sql, params = queryset.query.sql_with_params()
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+            # The result may or may not have already been decoded
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            estimate = int(plan[0]['Plan']['Plan Rows'])
+
+    # Tables which were never analyzed have a negative or zero estimate
+    if estimate < EXACT_COUNT_THRESHOLD:
+        return queryset.count()
+    return estimate
+
+
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self) -> int:
+        return estimated_count(self.object_list)
+
+
+class EstimatedCountAdminMixin:
+    """Avoid exact counts of large tables in an admin changelist."""
+
+    paginator = EstimatedCountPaginator
+    # Don't count the entire table, in addition to the filtered results
+    show_full_result_count = False
@@ -2,11 +2,12 @@ from django.contrib import admin
 from django.db import models
 import humanize
 
+from dkc.core.admin.pagination import EstimatedCountAdminMixin
 from dkc.core.models import Quota
 
 
 @admin.register(Quota)
-class QuotaAdmin(admin.ModelAdmin):
+class QuotaAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
     list_display = ['id', 'user', 'human_used', 'human_allowed', 'usage_percent']
     list_select_related = ['user']
 
@@ -1,11 +1,12 @@
 from django.contrib import admin
 from django.db.models import F
 
+from dkc.core.admin.pagination import EstimatedCountAdminMixin
 from dkc.core.models import Tree
 
 
 @admin.register(Tree)
-class TreeAdmin(admin.ModelAdmin):
+class TreeAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
     list_display = ['id', 'name', 'public', 'quota']
     list_display_links = ['id']
 
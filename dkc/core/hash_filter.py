@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+import logging
+import math
+import threading
+import time
+from typing import Iterator, Optional
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Never size a filter for fewer than this many members, so a near-empty instance doesn't need
+# to be rebuilt after its first few insertions
+MIN_CAPACITY = 1 << 16
+
+
+class BloomFilter:
+    """
+    A fixed-size Bloom filter of hex-encoded digests.
+
+    Members are already uniformly-distributed digests, so instead of re-hashing them, two 64-bit
+    values are read directly from the digest and combined by double hashing to derive each of
+    the bit positions.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001) -> None:
+        self.capacity = max(capacity, 1)
+        self.num_bits = max(int(-self.capacity * math.log(error_rate) / math.log(2) ** 2), 64)
+        self.num_hashes = max(round(self.num_bits / self.capacity * math.log(2)), 1)
+        self.count = 0
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, digest: str) -> Iterator[int]:
+        h1 = int(digest[:16], 16)
+        # Force an odd step, so it can never be zero
+        h2 = int(digest[16:32], 16) | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, digest: str) -> None:
+        for position in self._positions(digest.lower()):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, digest: str) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(digest.lower())
+        )
+
+    @property
+    def is_saturated(self) -> bool:
+        return self.count > self.capacity
+
+
+class ChecksumFilter:
+    """
+    A per-process negative cache of the checksums present in the File table.
+
+    The filter is built from the checksum index, in the background when each web process starts,
+    or otherwise on first use. Afterwards, it is refreshed with newly-hashed files at most once
+    every ``DKC_HASH_FILTER_REFRESH_SECONDS``, and rebuilt in the background once it has grown
+    beyond its sized capacity. Checksums computed within this process are added immediately.
+
+    A negative answer is authoritative, except for files which were hashed by another process
+    since the last refresh. Lookups never wait for a background build; until it completes, every
+    checksum is reported as possibly present, unless the previous filter is still fresh.
+    """
+
+    def __init__(self, field: str) -> None:
+        self.field = field
+        self._bloom: Optional[BloomFilter] = None
+        # Database-clock time of the last synchronization, used as the incremental watermark
+        self._synced_at: Optional[datetime] = None
+        # Process-clock time of the last synchronization, used to throttle refreshes
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._building = False
+        self._building_lock = threading.Lock()
+
+    def _hashed_files(self):
+        from dkc.core.models import File
+
+        # All checksums are computed together, so the sha512 condition matches the partial index
+        return File.objects.exclude(sha512='').exclude(**{self.field: ''}).order_by()
+
+    def rebuild(self) -> None:
+        """Build a new filter from every checksum currently in the database."""
+        with self._lock:
+            synced_at = timezone.now()
+            hashed_files = self._hashed_files()
+            bloom = BloomFilter(max(hashed_files.count() * 2, MIN_CAPACITY))
+            for digest in hashed_files.values_list(self.field, flat=True).iterator(
+                chunk_size=10000
+            ):
+                bloom.add(digest)
+            self._bloom = bloom
+            self._synced_at = synced_at
+            self._checked_at = time.monotonic()
+
+    def rebuild_in_background(self) -> None:
+        """Start rebuilding the filter in a daemon thread, unless a rebuild is already running."""
+        with self._building_lock:
+            if self._building:
+                return
+            self._building = True
+        threading.Thread(
+            target=self._background_rebuild, name=f'{self.field}-filter', daemon=True
+        ).start()
+
+    def _background_rebuild(self) -> None:
+        try:
+            self.rebuild()
+        except Exception:
+            logger.exception('Failed to build the %s filter', self.field)
+        finally:
+            self._building = False
+            # Each thread has its own connection, which would otherwise be left open
+            connection.close()
+
+    def _is_stale(self) -> bool:
+        return time.monotonic() - self._checked_at > settings.DKC_HASH_FILTER_REFRESH_SECONDS
+
+    def _refresh(self) -> None:
+        with self._lock:
+            synced_at = timezone.now()
+            # Overlap with the previous refresh, to tolerate clock skew between processes
+            since = self._synced_at - timedelta(seconds=settings.DKC_HASH_FILTER_REFRESH_SECONDS)
+            for digest in (
+                self._hashed_files()
+                .filter(modified__gte=since)
+                .values_list(self.field, flat=True)
+                .iterator()
+            ):
+                self._bloom.add(digest)
+            self._synced_at = synced_at
+            self._checked_at = time.monotonic()
+
+    def _sync(self) -> bool:
+        """Bring the filter up to date, and return whether it may be used."""
+        if self._building:
+            return self._bloom is not None and not self._is_stale()
+        if self._bloom is None:
+            self.rebuild()
+        elif self._bloom.is_saturated:
+            # A saturated filter is only less selective, so keep using it until it's replaced
+            self.rebuild_in_background()
+            return not self._is_stale()
+        elif self._is_stale():
+            self._refresh()
+        return True
+
+    def add(self, digest: str) -> None:
+        """Record a newly-computed checksum, if the filter has been built."""
+        if self._bloom is not None:
+            self._bloom.add(digest)
+
+    def might_contain(self, digest: str) -> bool:
+        """Return False if no File has the given checksum, or True if one possibly does."""
+        if not self._sync():
+            return True
+        return digest in self._bloom
+
+
+known_checksums = {
+    'md5': ChecksumFilter('md5'),
+    'sha256': ChecksumFilter('sha256'),
+    'sha512': ChecksumFilter('sha512'),
+}
+
+
+def warm_known_checksums() -> None:
+    """Start building every filter in the background, so no request waits for a full build."""
+    for checksum_filter in known_checksums.values():
+        checksum_filter.rebuild_in_background()
@@ -0,0 +1,36 @@
+from django.db import models, transaction
+from django.db.models.functions import Cast
+import djclick as click
+from guardian.models import GroupObjectPermission, UserObjectPermission
+
+
+def _delete_orphans(permission_model, dry_run: bool) -> None:
+    content_type_ids = (
+        permission_model.objects.order_by().values_list('content_type', flat=True).distinct()
+    )
+    for content_type_id in content_type_ids:
+        permissions = permission_model.objects.filter(content_type_id=content_type_id)
+        model = permissions.first().content_type.model_class()
+        if model is not None:
+            # Generic object keys are text, so the comparison must be done in text too
+            existing_pks = model._base_manager.annotate(
+                pk_text=Cast('pk', output_field=models.TextField())
+            ).values('pk_text')
+            permissions = permissions.exclude(object_pk__in=existing_pks)
+        # Otherwise, the model itself has been removed, so all its permissions are orphans
+
+        label = f'{permission_model.__name__} for {model.__name__ if model else content_type_id}'
+        if dry_run:
+            print(f'{label}: {permissions.count()} orphans')
+        else:
+            deleted, _ = permissions.delete()
+            print(f'{label}: {deleted} orphans deleted')
+
+
+@click.command()
+@click.option('--dry-run', is_flag=True, help='Only count orphaned permissions.')
+def command(dry_run: bool) -> None:
+    """Delete generic object permissions which refer to objects that no longer exist."""
+    with transaction.atomic():
+        _delete_orphans(UserObjectPermission, dry_run)
+        _delete_orphans(GroupObjectPermission, dry_run)
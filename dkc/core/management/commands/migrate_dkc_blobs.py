@@ -1,49 +1,196 @@
-import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+from typing import BinaryIO, Dict, List, Optional, Tuple
 
-from django.core.files import File as DjangoFile
+from bson import ObjectId
 import djclick as click
+from minio.commonconfig import ComposeSource, CopySource
+from minio.error import S3Error
+from pymongo import MongoClient
+from pymongo.database import Database
 import requests
 
-from dkc.core.models import File
+from dkc.core.models import ChecksumRequest, File
+from dkc.core.models.file import CHECKSUM_ALGORITHMS
+from dkc.core.tasks import compute_pending_checksums
 
 DKC_API = 'https://data.kitware.com/api/v1'
 
+# Girder's enum value for assetstores which are S3 buckets
+S3_ASSETSTORE_TYPE = 2
+# The largest object which can be copied with a single CopyObject request
+MAX_COPY_OBJECT_SIZE = 5 << 30
 
-def copy_file(pending_file: File, token: str) -> None:
+# The stored object key, and the checksums of the content, if it was read
+CopyResult = Tuple[str, Optional[Dict[str, str]]]
+# The bucket and key of a legacy file's object
+S3Source = Tuple[str, str]
+
+
+class HashingReader:
+    """Read a stream, computing every checksum of the bytes as they pass through."""
+
+    def __init__(self, stream: BinaryIO) -> None:
+        self.stream = stream
+        self.hashers = {algorithm: hashlib.new(algorithm) for algorithm in CHECKSUM_ALGORITHMS}
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self.stream.read(size)
+        for hasher in self.hashers.values():
+            hasher.update(chunk)
+        return chunk
+
+    def hexdigests(self) -> Dict[str, str]:
+        return {algorithm: hasher.hexdigest() for algorithm, hasher in self.hashers.items()}
+
+
+def copy_file(pending_file: File, token: str) -> Optional[CopyResult]:
+    """
+    Stream a legacy file into the storage of its blob.
+
+    Returns the stored object key and the checksums of the content, or None if the legacy file
+    can't be downloaded.
+    """
+    storage = pending_file.blob.storage
+    key = pending_file.blob.field.generate_filename(pending_file, pending_file.name)
     with requests.get(
         f'{DKC_API}/file/{pending_file.legacy_file_id}/download',
         stream=True,
         headers={'Girder-Token': token},
     ) as resp:
         if 400 <= resp.status_code < 500:
-            print('4xx encountered, deleting file')
-            pending_file.delete()
-            return
+            return None
 
         resp.raise_for_status()
 
-        with tempfile.SpooledTemporaryFile(max_size=64 << 20) as tmp:
-            for chunk in resp.iter_content(chunk_size=1 << 20):
-                tmp.write(chunk)
-            tmp.seek(0)
-            pending_file.blob = DjangoFile(tmp, name=pending_file.name)
-            pending_file.save(update_fields=['blob'])
+        resp.raw.decode_content = True
+        reader = HashingReader(resp.raw)
+        # Parts are uploaded as they are downloaded, so the content is never buffered in whole
+        storage.client.put_object(
+            storage.bucket_name,
+            key,
+            reader,
+            pending_file.size,
+            content_type=pending_file.content_type,
+        )
+    return key, reader.hexdigests()
+
+
+def server_side_copy_file(pending_file: File, source: S3Source) -> CopyResult:
+    """
+    Copy a legacy file's object into the storage of its blob, without transferring its content.
+
+    The storage's credentials must be able to read the legacy bucket. The content is never read,
+    so no checksums are returned.
+    """
+    storage = pending_file.blob.storage
+    key = pending_file.blob.field.generate_filename(pending_file, pending_file.name)
+    bucket, source_key = source
+    if pending_file.size > MAX_COPY_OBJECT_SIZE:
+        # Larger objects must be copied in parts, with UploadPartCopy
+        storage.client.compose_object(storage.bucket_name, key, [ComposeSource(bucket, source_key)])
+    else:
+        storage.client.copy_object(storage.bucket_name, key, CopySource(bucket, source_key))
+    return key, None
+
+
+def _legacy_s3_sources(db: Database, pending_files: List[File]) -> Dict[str, S3Source]:
+    """Resolve the objects of legacy files in S3 assetstores, by legacy file id."""
+    buckets: Dict[ObjectId, str] = {
+        assetstore['_id']: assetstore['bucket']
+        for assetstore in db.assetstore.find({'type': S3_ASSETSTORE_TYPE}, ['bucket'])
+    }
+    legacy_files = db.file.find(
+        {
+            '_id': {
+                '$in': [ObjectId(pending_file.legacy_file_id) for pending_file in pending_files]
+            },
+            'assetstoreId': {'$in': list(buckets)},
+            's3Key': {'$exists': True},
+        },
+        ['assetstoreId', 's3Key'],
+    )
+    return {
+        str(legacy_file['_id']): (buckets[legacy_file['assetstoreId']], legacy_file['s3Key'])
+        for legacy_file in legacy_files
+    }
+
+
+def _copy_file_safe(
+    pending_file: File, token: str, source: Optional[S3Source]
+) -> Tuple[File, Optional[Exception], Optional[CopyResult]]:
+    try:
+        if source is not None:
+            try:
+                return pending_file, None, server_side_copy_file(pending_file, source)
+            except S3Error as e:
+                print(f'Server-side copy of {pending_file.id} failed, downloading: {e!r}')
+        return pending_file, None, copy_file(pending_file, token)
+    except Exception as e:
+        return pending_file, e, None
 
 
 @click.command()
 @click.argument('dkc_api_key')
-def command(dkc_api_key) -> None:
+@click.option(
+    '--workers', type=click.IntRange(min=1), default=8, help='Number of files to copy at once.'
+)
+@click.option(
+    '--server-side-copy',
+    'mongo_uri',
+    help='Legacy database to resolve S3 objects from, which are copied within storage.',
+)
+def command(dkc_api_key, workers, mongo_uri) -> None:
     resp = requests.post(f'{DKC_API}/api_key/token', data={'key': dkc_api_key})
     resp.raise_for_status()
     token = resp.json()['authToken']['token']
+    db = MongoClient(mongo_uri).girder if mongo_uri else None
 
-    while True:
-        pending_files = list(
-            File.objects.filter(blob='').exclude(legacy_file_id='').order_by()[:1000]
-        )
-        if not pending_files:
-            break
+    # A saved blob is the checkpoint of each file, so pending files are exactly the remaining work
+    last_id = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            pending_files = list(
+                File.objects.filter(blob='', id__gt=last_id)
+                .exclude(legacy_file_id='')
+                .order_by('id')[:1000]
+            )
+            if not pending_files:
+                break
+            sources = _legacy_s3_sources(db, pending_files) if db is not None else {}
+            # Sizes of server-side copies without any checksum, which must be read to compute one
+            unhashed: Dict[int, int] = {}
 
-        for pending_file in pending_files:
-            print(pending_file.id, pending_file.name, pending_file.size)
-            copy_file(pending_file, token)
+            # Only the transfers are concurrent; the database is only used from this thread
+            for pending_file, error, result in executor.map(
+                lambda pending_file: _copy_file_safe(
+                    pending_file, token, sources.get(pending_file.legacy_file_id)
+                ),
+                pending_files,
+            ):
+                print(pending_file.id, pending_file.name, pending_file.size)
+                if error is not None:
+                    # Leave the file pending, so it's retried on the next run
+                    print(f'FAILED {pending_file.id}: {error!r}')
+                elif result is None:
+                    print('4xx encountered, deleting file')
+                    pending_file.delete()
+                else:
+                    pending_file.blob, checksums = result
+                    update_fields = ['blob', 'modified']
+                    # Server-side copies keep any legacy checksum, which remains unverified.
+                    # Their md5 and sha256 are intentionally not computed, to avoid reading them.
+                    if checksums is None and not pending_file.sha512:
+                        unhashed[pending_file.pk] = pending_file.size
+                    elif checksums is not None:
+                        if pending_file.sha512 and pending_file.sha512 != checksums['sha512']:
+                            print(f'MISMATCH {pending_file.id}: legacy checksum was replaced')
+                        for algorithm, digest in checksums.items():
+                            setattr(pending_file, algorithm, digest)
+                        pending_file.sha512_verified = True
+                        update_fields += [*CHECKSUM_ALGORITHMS, 'sha512_verified']
+                    pending_file.save(update_fields=update_fields)
+            if unhashed:
+                ChecksumRequest.enqueue_sizes(unhashed)
+                compute_pending_checksums.delay()
+            last_id = pending_files[-1].id
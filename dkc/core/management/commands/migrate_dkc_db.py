@@ -1,21 +1,32 @@
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
-from typing import DefaultDict, List, Optional, Set, Tuple
+import multiprocessing
+from typing import DefaultDict, Dict, Iterable, List, Optional, Set, Tuple, Type
 
 from django.contrib.auth.models import User
-from django.db import transaction
+from django.db import connections, models, transaction
 import djclick as click
 from pymongo import MongoClient
 from pymongo.database import Database
 
-from dkc.core.models import File, Folder, Tree
+from dkc.core.models import (
+    File,
+    Folder,
+    LegacyCheckpoint,
+    LegacySync,
+    StorageUsageChange,
+    Tree,
+)
 from dkc.core.permissions import Permission, PermissionGrant
 
 # ssh -L 27017:0.0.0.0:27017 zach.mullen@data
 # docker-compose run --rm django ./manage.py \
-#  migrate_dkc_db mongodb://host.docker.internal:27017/ 2 >> checkpoint.txt
+#  migrate_dkc_db mongodb://host.docker.internal:27017/ 2 --jobs 8 >> checkpoint.txt
 
 UserMap = DefaultDict[str, User]  # maps legacy user ObjectIDs to dkc-next users
+ParentKey = Tuple[str, str]  # the parentCollection and parentId of a legacy folder
 
 PERM_MAP = {  # maps legacy permission enum to dkc-next enum
     0: Permission.read,
@@ -23,91 +34,301 @@ PERM_MAP = {  # maps legacy permission enum to dkc-next enum
     2: Permission.admin,
 }
 
+# Only the fields which are migrated are read from Mongo
+FOLDER_PROJECTION = [
+    'name',
+    'description',
+    'meta',
+    'creatorId',
+    'created',
+    'parentId',
+    'parentCollection',
+]
+ITEM_PROJECTION = ['name', 'description', 'meta', 'creatorId', 'created', 'folderId']
+FILE_PROJECTION = ['name', 'mimeType', 'size', 'sha512', 'creatorId', 'created', 'itemId']
+
+MONGO_BATCH_SIZE = 10000
+INSERT_BATCH_SIZE = 1000
+# Roots are committed in units of about this many folders and files, each with a checkpoint
+CHECKPOINT_UNIT_SIZE = 10000
+
 
 def aware_date(dt: datetime) -> datetime:
     return dt.replace(tzinfo=timezone.utc)
 
 
-def _sync_file(
-    legacy_file: dict,
-    parent: Folder,
-    legacy_item: dict,
-    user_map: UserMap,
-) -> None:
-    if 'size' not in legacy_file:
-        return  # probably one of these weird "link files". Just throw it away
-
-    try:
-        file = File.objects.get(folder=parent, name=legacy_file['name'])
-    except File.DoesNotExist:
-        file = File(
-            folder=parent,
+# The created fields of folders and files are set to the current time on every insert, so the
+# legacy creation dates are written again once the rows exist
+def _bulk_create_legacy(model: Type[models.Model], instances: List[models.Model]) -> None:
+    """Insert new folders or files in bulk, keeping their legacy creation dates."""
+    dates = [instance.created for instance in instances]
+    model.objects.bulk_create(instances, batch_size=INSERT_BATCH_SIZE)
+    for instance, created in zip(instances, dates):
+        instance.created = created
+    model.objects.bulk_update(instances, ['created'], batch_size=INSERT_BATCH_SIZE)
+
+
+def _save_legacy(instance: models.Model) -> None:
+    """Insert a new folder or file, keeping its legacy creation date."""
+    created = instance.created
+    instance.save()
+    instance.created = created
+    type(instance).objects.filter(pk=instance.pk).update(created=created)
+
+
+def _legacy_folder_values(legacy_doc: dict) -> dict:
+    """Return the fields of a folder which are copied from a legacy folder, item or collection."""
+    return {
+        'name': legacy_doc['name'],
+        'description': legacy_doc.get('description') or '',
+        'user_metadata': legacy_doc.get('meta', {}),
+    }
+
+
+def _legacy_file_values(legacy_item: dict) -> dict:
+    """Return the fields of a file which are copied from its legacy item."""
+    return {
+        'description': legacy_item.get('description') or '',
+        'user_metadata': legacy_item.get('meta', {}),
+    }
+
+
+def _update_fields(instance: models.Model, values: dict) -> bool:
+    """Set the changed values on a model instance, and return whether any changed."""
+    changed = False
+    for name, value in values.items():
+        if getattr(instance, name) != value:
+            setattr(instance, name, value)
+            changed = True
+    return changed
+
+
+@dataclass
+class LegacyIndex:
+    """The legacy folders, items and files, indexed by their parents."""
+
+    folders: DefaultDict[ParentKey, List[dict]] = field(default_factory=lambda: defaultdict(list))
+    items: DefaultDict[str, List[dict]] = field(default_factory=lambda: defaultdict(list))
+    files: DefaultDict[str, List[dict]] = field(default_factory=lambda: defaultdict(list))
+
+    @classmethod
+    def build(
+        cls,
+        legacy_folders: Iterable[dict],
+        legacy_items: Iterable[dict],
+        legacy_files: Iterable[dict],
+    ) -> 'LegacyIndex':
+        index = cls()
+        for legacy_folder in legacy_folders:
+            key = (legacy_folder['parentCollection'], str(legacy_folder['parentId']))
+            index.folders[key].append(legacy_folder)
+        for legacy_item in legacy_items:
+            index.items[str(legacy_item['folderId'])].append(legacy_item)
+        for legacy_file in legacy_files:
+            index.files[str(legacy_file['itemId'])].append(legacy_file)
+        return index
+
+    @classmethod
+    def load(cls, db: Database) -> 'LegacyIndex':
+        """Read each legacy collection with a single query."""
+        return cls.build(
+            db.folder.find({}, FOLDER_PROJECTION, batch_size=MONGO_BATCH_SIZE),
+            db.item.find({}, ITEM_PROJECTION, batch_size=MONGO_BATCH_SIZE),
+            db.file.find({}, FILE_PROJECTION, batch_size=MONGO_BATCH_SIZE),
+        )
+
+
+@dataclass
+class LegacyRoot:
+    """A legacy collection or user, which is migrated to a root folder in its own tree."""
+
+    type: str
+    doc: dict
+
+    @property
+    def oid(self) -> str:
+        return str(self.doc['_id'])
+
+
+class _FolderNode:
+    def __init__(self, folder: Folder) -> None:
+        self.folder = folder
+        self.child_folders: Dict[str, _FolderNode] = {}
+        self.files: Dict[str, File] = {}
+
+    def add_folder(self, legacy_doc: dict, user_map: UserMap) -> '_FolderNode':
+        # Legacy items which become folders may share a name with a sibling folder, so merge them
+        node = self.child_folders.get(legacy_doc['name'])
+        if node is None:
+            node = _FolderNode(
+                Folder(
+                    parent=self.folder,
+                    tree=self.folder.tree,
+                    **_legacy_folder_values(legacy_doc),
+                    legacy_id=str(legacy_doc['_id']),
+                    creator=user_map[str(legacy_doc['creatorId'])],
+                    created=aware_date(legacy_doc['created']),
+                )
+            )
+            self.child_folders[legacy_doc['name']] = node
+        return node
+
+    def add_file(self, legacy_file: dict, legacy_item: dict, user_map: UserMap) -> None:
+        if 'size' not in legacy_file:
+            return  # probably one of these weird "link files". Just throw it away
+        if legacy_file['name'] in self.files:
+            return
+        self.files[legacy_file['name']] = File(
+            folder=self.folder,
             name=legacy_file['name'],
-            description=legacy_item.get('description') or '',
+            **_legacy_file_values(legacy_item),
             content_type=legacy_file.get('mimeType', 'application/octet-stream'),
             legacy_item_id=str(legacy_item['_id']),
             legacy_file_id=str(legacy_file['_id']),
-            user_metadata=legacy_item.get('meta', {}),
             size=legacy_file['size'],
+            # Reuse the legacy checksum, rather than reading the blob again after it's migrated
+            sha512=legacy_file.get('sha512', ''),
+            sha512_verified=not legacy_file.get('sha512'),
             creator=user_map[str(legacy_file['creatorId'])],
+            created=aware_date(legacy_file['created']),
         )
-        file.save()
-        file.created = aware_date(legacy_file['created'])
-        file.save(update_fields=['created'])
-
-
-def _sync_item(db: Database, legacy_item: dict, parent: Folder, user_map: UserMap) -> None:
-    legacy_files = list(db.file.find({'itemId': legacy_item['_id']}))
-    if len(legacy_files) == 1:  # convert item to file
-        _sync_file(legacy_files[0], parent, legacy_item, user_map)
-    else:  # convert item to folder
-        try:
-            folder = Folder.objects.get(parent=parent, name=legacy_item['name'])
-        except Folder.DoesNotExist:
-            folder = Folder(
-                parent=parent,
-                tree=parent.tree,
-                name=legacy_item['name'],
-                description=legacy_item.get('description') or '',
-                user_metadata=legacy_item.get('meta', {}),
-                legacy_id=str(legacy_item['_id']),
-                creator=user_map[str(legacy_item['creatorId'])],
-            )
-            folder.save()
-            folder.created = aware_date(legacy_item['created'])
-            folder.save(update_fields=['created'])
-
-        for legacy_file in legacy_files:
-            _sync_file(legacy_file, folder, legacy_item, user_map)
 
+    def populate(self, index: LegacyIndex, parent_key: ParentKey, user_map: UserMap) -> None:
+        """Build the entire legacy subtree under this folder, without saving it."""
+        for legacy_folder in index.folders.get(parent_key, []):
+            node = self.add_folder(legacy_folder, user_map)
+            node.populate(index, ('folder', str(legacy_folder['_id'])), user_map)
+
+        if parent_key[0] != 'folder':
+            return  # only folders contain items
+        for legacy_item in index.items.get(parent_key[1], []):
+            legacy_files = index.files.get(str(legacy_item['_id']), [])
+            if len(legacy_files) == 1:  # convert item to file
+                self.add_file(legacy_files[0], legacy_item, user_map)
+            else:  # convert item to folder
+                node = self.add_folder(legacy_item, user_map)
+                for legacy_file in legacy_files:
+                    node.add_file(legacy_file, legacy_item, user_map)
+
+    def compute_sizes(self) -> int:
+        self.folder.size = sum(file.size for file in self.files.values()) + sum(
+            node.compute_sizes() for node in self.child_folders.values()
+        )
+        return self.folder.size
 
-def _sync_folder(db: Database, legacy_folder: dict, parent: Folder, user_map: UserMap) -> None:
-    try:
-        folder = Folder.objects.get(parent=parent, name=legacy_folder['name'])
-    except Folder.DoesNotExist:
-        folder = Folder(
-            parent=parent,
-            tree=parent.tree,
-            name=legacy_folder['name'],
-            description=legacy_folder.get('description') or '',
-            user_metadata=legacy_folder.get('meta', {}),
-            legacy_id=str(legacy_folder['_id']),
-            creator=user_map[str(legacy_folder['creatorId'])],
+    def count_objects(self) -> int:
+        """Count this folder, with every folder and file beneath it."""
+        self.objects = (
+            1 + len(self.files) + sum(node.count_objects() for node in self.child_folders.values())
+        )
+        return self.objects
+
+    def units(self) -> Iterable[Tuple['_FolderNode', bool]]:
+        """
+        Partition this subtree into units to be saved together, with parents before children.
+
+        Each unit is a folder node, and whether its descendants are included, or only its files.
+        This must be called after ``count_objects``.
+        """
+        if self.objects <= CHECKPOINT_UNIT_SIZE:
+            yield self, True
+            return
+        yield self, False
+        for node in self.child_folders.values():
+            yield from node.units()
+
+    def prune_saved(self, saved_folders: Dict[str, int], saved_files: Set[str]) -> None:
+        """
+        Match the descendant folders which are already saved, and drop the saved files.
+
+        Only the contents of saved folders are checked, as new folders have nothing saved in them.
+        """
+        self.files = {
+            name: file
+            for name, file in self.files.items()
+            if file.legacy_file_id not in saved_files
+        }
+        for node in self.child_folders.values():
+            pk = saved_folders.get(node.folder.legacy_id)
+            if pk is not None:
+                node.folder.pk = pk
+                node.prune_saved(saved_folders, saved_files)
+
+    def levels(self) -> Iterable[List['_FolderNode']]:
+        """Yield descendant nodes by depth, so each parent is saved before its children."""
+        level = list(self.child_folders.values())
+        while level:
+            yield level
+            level = [child for node in level for child in node.child_folders.values()]
+
+
+def _save_subtree(root: _FolderNode, recursive: bool = True) -> None:
+    """
+    Insert a folder, unless it's already saved, with its new files and descendants.
+
+    If not ``recursive``, only the files directly within the folder are inserted. Descendant
+    folders which are already saved are kept. The size of everything inserted is added to the
+    saved ancestors.
+    """
+    tree = root.folder.tree
+    # This also overwrites the local size of a saved folder, until it's incremented below
+    if recursive:
+        size = root.compute_sizes()
+    else:
+        size = root.folder.size = sum(file.size for file in root.files.values())
+    if root.folder.pk is None:
+        root.folder.parent_id = root.folder.parent.pk
+        _save_legacy(root.folder)
+        sized_folder = root.folder.parent
+    else:
+        sized_folder = root.folder
+
+    files: List[File] = list(root.files.values())
+    # The size of each saved descendant grows by what's inserted beneath it
+    grown: Dict[int, int] = {}
+    for level in root.levels() if recursive else []:
+        new_folders: List[Folder] = []
+        for node in level:
+            if node.folder.pk is None:
+                # The parent was unsaved when assigned
+                node.folder.parent_id = node.folder.parent.pk
+                new_folders.append(node.folder)
+            elif node.folder.size:
+                grown[node.folder.pk] = node.folder.size
+        _bulk_create_legacy(Folder, new_folders)
+        files.extend(file for node in level for file in node.files.values())
+    for file in files:
+        file.folder_id = file.folder.pk
+    # Bulk creation sends no signals, so sizes are accounted for here, once per subtree
+    _bulk_create_legacy(File, files)
+    sized_folder.increment_size(size)
+    if grown:
+        Folder.objects.filter(pk__in=grown).update(
+            size=models.F('size')
+            + models.Case(
+                *[models.When(pk=pk, then=amount) for pk, amount in grown.items()],
+                output_field=models.BigIntegerField(),
+            )
         )
-        folder.save()
-        folder.created = aware_date(legacy_folder['created'])
-        folder.save(update_fields=['created'])
 
-    legacy_folders = list(
-        db.folder.find({'parentId': legacy_folder['_id'], 'parentCollection': 'folder'})
+    usage: DefaultDict[Tuple[int, str], List[int]] = defaultdict(lambda: [0, 0])
+    for file in files:
+        total = usage[(file.creator_id, file.content_type)]
+        total[0] += 1
+        total[1] += file.size
+    StorageUsageChange.objects.bulk_create(
+        [
+            StorageUsageChange(
+                user_id=user_id,
+                tree_id=tree.pk,
+                content_type=content_type,
+                files=file_count,
+                bytes=file_bytes,
+            )
+            for (user_id, content_type), (file_count, file_bytes) in usage.items()
+        ],
+        batch_size=INSERT_BATCH_SIZE,
     )
-    for legacy_subfolder in legacy_folders:
-        _sync_folder(db, legacy_subfolder, folder, user_map)
-    del legacy_folders
-
-    legacy_items = list(db.item.find({'folderId': legacy_folder['_id']}))
-    for legacy_item in legacy_items:
-        _sync_item(db, legacy_item, folder, user_map)
 
 
 def _set_tree_permissions(tree: Tree, collection: dict, user_map: UserMap) -> None:
@@ -126,86 +347,340 @@ def _set_tree_permissions(tree: Tree, collection: dict, user_map: UserMap) -> No
     tree.set_permission_list(grants)
 
 
-def _sync_root_folders(
-    db: Database, user_map: UserMap, skip_collections: Set[str], skip_users: Set[str]
-) -> None:
-    collections = list(db.collection.find())
-    for collection in collections:
-        if str(collection['_id']) in skip_collections:
-            continue
-
-        try:
-            folder = Folder.objects.get(parent=None, name=collection['name'])
-        except Folder.DoesNotExist:
-            with transaction.atomic():
-                creator = user_map[str(collection.get('creatorId'))]
-                tree: Tree = Tree.objects.create(
-                    quota=creator.quota, public=collection.get('public', False)
-                )
-                folder = Folder(
-                    parent=None,
-                    tree=tree,
-                    name=collection['name'],
-                    description=collection.get('description') or '',
-                    user_metadata=collection.get('meta', {}),
-                    legacy_id=str(collection['_id']),
-                    creator=creator,
-                )
-                folder.save()
-                folder.created = aware_date(collection['created'])
-                folder.save(update_fields=['created'])
+def _root_folder_name(root: LegacyRoot) -> str:
+    return root.doc['name'] if root.type == 'collection' else f'@{root.doc["login"]}'
 
-        _set_tree_permissions(folder.tree, collection, user_map)
 
-        legacy_folders = list(
-            db.folder.find({'parentId': collection['_id'], 'parentCollection': 'collection'})
+def _create_root(root: LegacyRoot, user_map: UserMap) -> Folder:
+    name = _root_folder_name(root)
+    if root.type == 'collection':
+        creator = user_map[str(root.doc.get('creatorId'))]
+        tree: Tree = Tree.objects.create(quota=creator.quota, public=root.doc.get('public', False))
+        _set_tree_permissions(tree, root.doc, user_map)
+        folder = Folder(
+            parent=None,
+            tree=tree,
+            **_legacy_folder_values(root.doc),
+            legacy_id=root.oid,
+            creator=creator,
+            created=aware_date(root.doc['created']),
         )
-        for legacy_folder in legacy_folders:
-            _sync_folder(db, legacy_folder, folder, user_map)
-
-        print(f'CHECKPOINT collection {str(collection["_id"])}')
-
-    del collections
+    else:
+        creator = user_map[root.oid]
+        tree = Tree.objects.create(quota=creator.quota, public=False)
+        tree.grant_permission(PermissionGrant(creator, Permission.admin))
+        folder = Folder(
+            parent=None,
+            tree=tree,
+            name=name,
+            description=f'Migrated user data for {root.doc["login"]}',
+            legacy_id=root.oid,
+            creator=creator,
+            created=aware_date(root.doc['created']),
+        )
+    _save_legacy(folder)
+    return folder
+
+
+def _import_root(root: LegacyRoot, index: LegacyIndex, user_map: UserMap) -> None:
+    """
+    Import a legacy collection or user, with everything beneath it.
+
+    The import is committed in units of subtrees, each with a checkpoint, so an interrupted
+    import resumes at its first incomplete unit. Roots which were partly imported by earlier
+    versions of this command have no checkpoints, so only their missing folders and files are
+    inserted.
+    """
+    if LegacyCheckpoint.objects.filter(
+        kind=LegacyCheckpoint.Kind.ROOT, legacy_id=root.oid
+    ).exists():
+        return
+
+    with transaction.atomic():
+        folder = (
+            Folder.objects.filter(parent=None, name=_root_folder_name(root))
+            .select_related('tree__quota')
+            .first()
+        )
+        created = folder is None
+        if created:
+            folder = _create_root(root, user_map)
+
+    node = _FolderNode(folder)
+    node.populate(index, (root.type, root.oid), user_map)
+    if not created:
+        # Excluding blank legacy ids allows the partial indexes to be used
+        node.prune_saved(
+            dict(
+                Folder.objects.filter(tree=folder.tree)
+                .exclude(legacy_id='')
+                .values_list('legacy_id', 'pk')
+            ),
+            set(
+                File.objects.filter(folder__tree=folder.tree)
+                .exclude(legacy_file_id='')
+                .values_list('legacy_file_id', flat=True)
+            ),
+        )
+    node.count_objects()
+    # Root folders of users imported before their legacy ids were recorded have none
+    units = [
+        (unit, recursive, root.oid if unit is node else unit.folder.legacy_id)
+        for unit, recursive in node.units()
+    ]
+    completed: Set[str] = set(
+        LegacyCheckpoint.objects.filter(
+            kind=LegacyCheckpoint.Kind.SUBTREE, legacy_id__in=[key for _, _, key in units]
+        ).values_list('legacy_id', flat=True)
+    )
+    # Later units are saved beneath the folders of completed ones
+    completed_folders: Dict[str, int] = dict(
+        Folder.objects.filter(tree=folder.tree, legacy_id__in=completed).values_list(
+            'legacy_id', 'pk'
+        )
+    )
 
-    legacy_users = list(db.user.find())
-    for legacy_user in legacy_users:
-        if str(legacy_user['_id']) in skip_users:
+    for unit, recursive, key in units:
+        if key in completed:
+            if unit is not node:
+                unit.folder.pk = completed_folders[key]
             continue
+        with transaction.atomic():
+            _save_subtree(unit, recursive)
+            LegacyCheckpoint.objects.create(kind=LegacyCheckpoint.Kind.SUBTREE, legacy_id=key)
+    LegacyCheckpoint.objects.create(kind=LegacyCheckpoint.Kind.ROOT, legacy_id=root.oid)
+
+
+# State of each worker process, inherited from the parent when it is forked
+_worker_index: Optional[LegacyIndex] = None
+_worker_user_map: Optional[UserMap] = None
+
+
+def _init_worker(index: LegacyIndex, user_map: UserMap) -> None:
+    global _worker_index, _worker_user_map
+    _worker_index, _worker_user_map = index, user_map
+
+
+def _import_root_worker(root: LegacyRoot) -> LegacyRoot:
+    _import_root(root, _worker_index, _worker_user_map)
+    return root
+
+
+def _import_roots(roots: List[LegacyRoot], index: LegacyIndex, user_map: UserMap, jobs: int) -> int:
+    """Import legacy roots in parallel, and return the number which failed."""
+    failed = 0
+    if jobs == 1:
+        for root in roots:
+            try:
+                _import_root(root, index, user_map)
+            except Exception as e:
+                print(f'FAILED {root.type} {root.oid}: {e!r}')
+                failed += 1
+            else:
+                print(f'CHECKPOINT {root.type} {root.oid}')
+        return failed
+
+    # Each process must open its own database connection
+    connections.close_all()
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        # Forking shares the index with every worker, without copying it
+        mp_context=multiprocessing.get_context('fork'),
+        initializer=_init_worker,
+        initargs=(index, user_map),
+    ) as executor:
+        futures = {executor.submit(_import_root_worker, root): root for root in roots}
+        for future in as_completed(futures):
+            root = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                # Leave the root out of the checkpoint, so it's retried on the next run
+                print(f'FAILED {root.type} {root.oid}: {e!r}')
+                failed += 1
+            else:
+                print(f'CHECKPOINT {root.type} {root.oid}')
+    return failed
+
+
+def _apply_delta(
+    legacy_folders: List[dict],
+    legacy_items: List[dict],
+    legacy_files: List[dict],
+    roots: Dict[ParentKey, Folder],
+    user_map: UserMap,
+) -> None:
+    """
+    Upsert changed legacy folders, items and files beneath already imported roots.
+
+    ``legacy_items`` must include the items of every file in ``legacy_files``.
+    """
+    folder_parents: Dict[str, ParentKey] = {
+        str(doc['_id']): (doc['parentCollection'], str(doc['parentId'])) for doc in legacy_folders
+    }
+    item_parents: Dict[str, ParentKey] = {
+        str(doc['_id']): ('folder', str(doc['folderId'])) for doc in legacy_items
+    }
+    docs_by_id = {str(doc['_id']): doc for doc in [*legacy_folders, *legacy_items]}
+
+    # Match existing rows in bulk; excluding blank legacy ids allows the partial indexes to be used
+    lookup_ids = {*folder_parents, *item_parents} | {
+        oid
+        for type_, oid in [*folder_parents.values(), *item_parents.values()]
+        if type_ == 'folder'
+    }
+    existing_folders: Dict[str, Folder] = {
+        folder.legacy_id: folder
+        for folder in Folder.objects.exclude(legacy_id='')
+        .filter(legacy_id__in=lookup_ids)
+        .select_related('tree__quota')
+    }
+    existing_item_files: DefaultDict[str, List[File]] = defaultdict(list)
+    for file in File.objects.exclude(legacy_item_id='').filter(legacy_item_id__in=item_parents):
+        existing_item_files[file.legacy_item_id].append(file)
+    existing_file_ids: Set[str] = set(
+        File.objects.exclude(legacy_file_id='')
+        .filter(legacy_file_id__in=[str(doc['_id']) for doc in legacy_files])
+        .values_list('legacy_file_id', flat=True)
+    )
 
-        folder_name = f'@{legacy_user["login"]}'
-        user = user_map[str(legacy_user['login'])]
-        try:
-            folder = Folder.objects.get(parent=None, name=folder_name)
-        except Folder.DoesNotExist:
-            with transaction.atomic():
-                tree: Tree = Tree.objects.create(quota=user.quota, public=False)
-                tree.grant_permission(PermissionGrant(user, Permission.admin))
-                folder = Folder(
-                    parent=None,
-                    tree=tree,
-                    name=folder_name,
-                    description=f'Migrated user data for {legacy_user["login"]}',
-                    creator=user,
-                )
-                folder.save()
-                folder.created = aware_date(legacy_user['created'])
-                folder.save(update_fields=['created'])
+    def resolve(key: ParentKey) -> Optional[Folder]:
+        return existing_folders.get(key[1]) if key[0] == 'folder' else roots.get(key)
+
+    # Update existing rows in place, only where they changed
+    updated_folders: List[Folder] = []
+    updated_files: List[File] = []
+    for oid, parent_key in [*folder_parents.items(), *item_parents.items()]:
+        legacy_doc = docs_by_id[oid]
+        folder = existing_folders.get(oid)
+        parent = resolve(parent_key)
+        if folder is not None:
+            if parent is None or folder.parent_id != parent.pk:
+                print(f'SKIPPED {oid}: moving folders is not supported')
+            elif _update_fields(folder, _legacy_folder_values(legacy_doc)):
+                updated_folders.append(folder)
+        for file in existing_item_files.get(oid, []):
+            if folder is None and (parent is None or file.folder_id != parent.pk):
+                print(f'SKIPPED {oid}: moving files is not supported')
+            elif _update_fields(file, _legacy_file_values(legacy_doc)):
+                updated_files.append(file)
+    Folder.objects.bulk_update(
+        updated_folders, ['name', 'description', 'user_metadata'], batch_size=INSERT_BATCH_SIZE
+    )
+    File.objects.bulk_update(
+        updated_files, ['description', 'user_metadata'], batch_size=INSERT_BATCH_SIZE
+    )
 
-        legacy_folders = list(
-            db.folder.find({'parentId': legacy_user['_id'], 'parentCollection': 'user'})
+    # Build the new documents beneath the existing folders they were added to
+    new_folders = [doc for doc in legacy_folders if str(doc['_id']) not in existing_folders]
+    new_items = [
+        doc
+        for doc in legacy_items
+        if str(doc['_id']) not in existing_folders and str(doc['_id']) not in existing_item_files
+    ]
+    new_files = [doc for doc in legacy_files if str(doc['_id']) not in existing_file_ids]
+    index = LegacyIndex.build(new_folders, new_items, new_files)
+    new_folder_ids = {str(doc['_id']) for doc in new_folders}
+    new_item_ids = {str(doc['_id']) for doc in new_items}
+
+    nodes: Dict[int, _FolderNode] = {}
+
+    def node_for(folder: Folder) -> _FolderNode:
+        if folder.pk not in nodes:
+            nodes[folder.pk] = _FolderNode(folder)
+        return nodes[folder.pk]
+
+    parent_keys = {folder_parents[oid] for oid in new_folder_ids} | {
+        item_parents[oid] for oid in new_item_ids
+    }
+    for parent_key in parent_keys:
+        if parent_key[0] == 'folder' and parent_key[1] in new_folder_ids:
+            continue  # built along with its new parent
+        parent = resolve(parent_key)
+        if parent is None:
+            print(f'SKIPPED {parent_key[0]} {parent_key[1]}: its parent was never imported')
+            continue
+        node_for(parent).populate(index, parent_key, user_map)
+
+    for legacy_file in new_files:
+        item_id = str(legacy_file['itemId'])
+        if item_id in new_item_ids:
+            continue  # built along with its new item
+        folder = existing_folders.get(item_id)
+        if folder is None:
+            print(f'SKIPPED file {legacy_file["_id"]}: converting items is not supported')
+            continue
+        node_for(folder).add_file(legacy_file, docs_by_id[item_id], user_map)
+
+    for node in nodes.values():
+        _save_subtree(node)
+
+
+@transaction.atomic
+def _sync_delta(db: Database, since: datetime, user_map: UserMap) -> None:
+    """Sync the legacy documents which were added or updated since a previous sync."""
+    root_folders = list(Folder.objects.filter(parent=None).select_related('tree__quota'))
+    roots_by_legacy_id = {folder.legacy_id: folder for folder in root_folders if folder.legacy_id}
+    roots_by_name = {folder.name: folder for folder in root_folders}
+
+    roots: Dict[ParentKey, Folder] = {}
+    for root in [LegacyRoot('collection', doc) for doc in db.collection.find()] + [
+        LegacyRoot('user', doc) for doc in db.user.find({}, ['login', 'created'])
+    ]:
+        # Roots of users imported before their legacy ids were recorded are found by name
+        folder = roots_by_legacy_id.get(root.oid) or (
+            roots_by_name.get(_root_folder_name(root)) if root.type == 'user' else None
         )
-        for legacy_folder in legacy_folders:
-            _sync_folder(db, legacy_folder, folder, user_map)
-
-        print(f'CHECKPOINT user {str(legacy_user["_id"])}')
+        if folder is None:
+            if aware_date(root.doc['created']) < since:
+                print(f'SKIPPED {root.type} {root.oid}: never imported, run a full import')
+                continue
+            folder = _create_root(root, user_map)
+            LegacyCheckpoint.objects.create(kind=LegacyCheckpoint.Kind.ROOT, legacy_id=root.oid)
+        elif root.type == 'collection' and aware_date(root.doc['updated']) >= since:
+            if _update_fields(folder, _legacy_folder_values(root.doc)):
+                folder.save(update_fields=['name', 'description', 'user_metadata'])
+            if _update_fields(folder.tree, {'public': root.doc.get('public', False)}):
+                folder.tree.save(update_fields=['public'])
+            _set_tree_permissions(folder.tree, root.doc, user_map)
+        roots[(root.type, root.oid)] = folder
+
+    changed = {'updated': {'$gte': since}}
+    legacy_items = list(db.item.find(changed, ITEM_PROJECTION))
+    # Legacy files have no update time, but are added to items without updating them
+    legacy_files = list(
+        db.file.find(
+            {
+                '$or': [
+                    {'created': {'$gte': since}},
+                    {'itemId': {'$in': [doc['_id'] for doc in legacy_items]}},
+                ]
+            },
+            FILE_PROJECTION,
+        )
+    )
+    item_ids = {doc['_id'] for doc in legacy_items}
+    legacy_items += db.item.find(
+        {'_id': {'$in': list({doc['itemId'] for doc in legacy_files} - item_ids)}},
+        ITEM_PROJECTION,
+    )
+    _apply_delta(
+        list(db.folder.find(changed, FOLDER_PROJECTION)),
+        legacy_items,
+        legacy_files,
+        roots,
+        user_map,
+    )
 
 
 def _sync_users(db: Database, default_user: User) -> UserMap:
     user_map: UserMap = defaultdict(lambda: default_user)
+    existing_users: Dict[str, User] = {
+        user.email: user for user in User.objects.select_related('quota')
+    }
     for legacy_user in db.user.find():
-        try:
-            user = User.objects.get(email=legacy_user['email'])
-        except User.DoesNotExist:
+        user = existing_users.get(legacy_user['email'])
+        if user is None:
             user = User(
                 username=legacy_user['login'],
                 email=legacy_user['email'],
@@ -222,29 +697,69 @@ def _sync_users(db: Database, default_user: User) -> UserMap:
     return user_map
 
 
-def _read_checkpoint_file(checkpoint_file: Optional[str]) -> Tuple[Set[str], Set[str]]:
-    colls, users = set(), set()
-    if checkpoint_file:
-        with open(checkpoint_file) as fd:
-            for line in fd.readlines():
-                if line.startswith('CHECKPOINT'):
-                    _, type_, oid = line.split()
-                    if type_ == 'collection':
-                        colls.add(oid)
-                    elif type_ == 'user':
-                        users.add(oid)
-    return colls, users
+def _record_checkpoint_file(checkpoint_file: str) -> None:
+    """Record the completed roots listed in the output of a previous run."""
+    oids: Set[str] = set()
+    with open(checkpoint_file) as fd:
+        for line in fd.readlines():
+            if line.startswith('CHECKPOINT'):
+                _, type_, oid = line.split()
+                if type_ in ['collection', 'user']:
+                    oids.add(oid)
+    LegacyCheckpoint.objects.bulk_create(
+        [LegacyCheckpoint(kind=LegacyCheckpoint.Kind.ROOT, legacy_id=oid) for oid in oids],
+        ignore_conflicts=True,
+    )
 
 
 @click.command()
 @click.argument('mongo_uri', type=click.STRING)
 @click.argument('user_id', type=click.INT)
-@click.option('--checkpoint-file', type=click.Path(dir_okay=False, exists=True))
-def command(mongo_uri: str, user_id: int, checkpoint_file: Optional[str]) -> None:
-    skip_colls, skip_users = _read_checkpoint_file(checkpoint_file)
+@click.option(
+    '--checkpoint-file',
+    type=click.Path(dir_okay=False, exists=True),
+    help='Output of a run from before checkpoints were recorded in the database.',
+)
+@click.option(
+    '--jobs', type=click.IntRange(min=1), default=4, help='Number of roots to import in parallel.'
+)
+@click.option(
+    '--delta', is_flag=True, help='Only sync legacy data which changed since the last sync.'
+)
+def command(
+    mongo_uri: str, user_id: int, checkpoint_file: Optional[str], jobs: int, delta: bool
+) -> None:
+    if checkpoint_file:
+        _record_checkpoint_file(checkpoint_file)
     default_user: User = User.objects.get(id=user_id)
     assert not default_user.is_anonymous
     db = MongoClient(mongo_uri).girder
 
+    since = LegacySync.delta_since()
+    if delta and since is None:
+        raise click.UsageError('No sync has completed yet, so a full import must be run first.')
+    sync = LegacySync.objects.create(started=datetime.now(timezone.utc), delta=delta)
+
     user_map = _sync_users(db, default_user)
-    _sync_root_folders(db, user_map, skip_colls, skip_users)
+    if delta:
+        _sync_delta(db, since, user_map)
+        sync.completed = datetime.now(timezone.utc)
+        sync.save(update_fields=['completed'])
+        return
+
+    completed_roots: Set[str] = set(
+        LegacyCheckpoint.objects.filter(kind=LegacyCheckpoint.Kind.ROOT).values_list(
+            'legacy_id', flat=True
+        )
+    )
+    roots = [
+        root
+        for root in [LegacyRoot('collection', doc) for doc in db.collection.find()]
+        + [LegacyRoot('user', doc) for doc in db.user.find({}, ['login', 'created'])]
+        if root.oid not in completed_roots
+    ]
+    index = LegacyIndex.load(db)
+    if not _import_roots(roots, index, user_map, jobs):
+        # Only a complete import can be the basis of a later delta sync
+        sync.completed = datetime.now(timezone.utc)
+        sync.save(update_fields=['completed'])
@@ -1,13 +1,29 @@
+from collections import defaultdict
+import math
+import random
 import typing
 
-from django.contrib.auth.models import User
+from django.contrib.auth.models import Group, User
+from django.core.files.base import ContentFile
+from django.db import models, transaction
+from django.db.models.functions import Cast, Greatest, Substr
 import djclick as click
 
-from dkc.core.models import Tree
+from dkc.core.models import EffectivePermission, File, Quota, StorageUsageChange, Tree
 from dkc.core.models.folder import Folder
 from dkc.core.permissions import Permission, PermissionGrant
 from dkc.core.tests.factories import FileFactory, FolderFactory, UserFactory
 
+BULK_BATCH_SIZE = 5000
+
+# Each returns a random file size, given the mean size
+SIZE_DISTRIBUTIONS: typing.Dict[str, typing.Callable[[int], int]] = {
+    'fixed': lambda mean: mean,
+    'uniform': lambda mean: random.randint(0, 2 * mean),
+    # With a sigma of 1, a mu of ln(mean) - 1/2 gives the desired mean
+    'lognormal': lambda mean: int(random.lognormvariate(math.log(mean) - 0.5, 1)),
+}
+
 
 def _populate_subtree(
     folder: typing.Optional[Folder], depth: int, user: User, branching: int, files: int
@@ -22,12 +38,203 @@ def _populate_subtree(
         _populate_subtree(child, depth - 1, user, branching, files)
 
 
+def _next_mock_number(queryset: models.QuerySet, field: str) -> int:
+    """Return the number following the largest existing "mock-<n>" name, to continue after it."""
+    suffix = Cast(Substr(field, len('mock-') + 1), models.BigIntegerField())
+    last = queryset.filter(**{f'{field}__regex': r'^mock-[0-9]+$'}).aggregate(
+        last=models.Max(suffix)
+    )['last']
+    return 0 if last is None else last + 1
+
+
+def _bulk_create_users(count: int) -> typing.List[User]:
+    # Continue numbering after any previous runs, even if some of their users were deleted
+    start = _next_mock_number(User.objects.all(), 'username')
+    users = User.objects.bulk_create(
+        [
+            User(username=f'mock-{n}', email=f'mock-{n}@example.com', password='')
+            for n in range(start, start + count)
+        ],
+        batch_size=BULK_BATCH_SIZE,
+    )
+    # Bulk creation sends no signals, so quotas must also be created
+    Quota.objects.bulk_create([Quota(user=user) for user in users], batch_size=BULK_BATCH_SIZE)
+    return list(User.objects.select_related('quota').filter(pk__in=[user.pk for user in users]))
+
+
+def _bulk_create_groups(count: int, size: int, users: typing.List[User]) -> typing.List[Group]:
+    start = _next_mock_number(Group.objects.all(), 'name')
+    groups = Group.objects.bulk_create(
+        [Group(name=f'mock-{n}') for n in range(start, start + count)]
+    )
+    # Effective permissions of the members are computed when the groups are granted permissions
+    User.groups.through.objects.bulk_create(
+        [
+            User.groups.through(group_id=group.pk, user_id=user.pk)
+            for group in groups
+            for user in random.sample(users, min(size, len(users)))
+        ],
+        batch_size=BULK_BATCH_SIZE,
+    )
+    return groups
+
+
+def _bulk_populate_tree(
+    name: str,
+    owner: User,
+    depth: int,
+    branching: int,
+    files: int,
+    file_size: typing.Callable[[], int],
+    blob_name: str,
+) -> Tree:
+    """Create a tree with bulk inserts, computing the sizes of its folders in a single pass."""
+    tree = Tree.objects.create(quota=owner.quota)
+    root = Folder.objects.create(tree=tree, parent=None, name=name, creator=owner)
+
+    levels: typing.List[typing.List[Folder]] = [[root]]
+    for _ in range(depth):
+        levels.append(
+            Folder.objects.bulk_create(
+                [
+                    Folder(parent=parent, tree=tree, name=f'folder-{n}', creator=owner)
+                    for parent in levels[-1]
+                    for n in range(branching)
+                ],
+                batch_size=BULK_BATCH_SIZE,
+            )
+        )
+
+    # Files are only inserted into the deepest folders, in batches to bound memory use
+    sizes: typing.DefaultDict[int, int] = defaultdict(int)
+    batch: typing.List[File] = []
+    for folder in levels[-1]:
+        for n in range(files):
+            size = max(file_size(), 0)
+            sizes[folder.pk] += size
+            batch.append(
+                File(folder=folder, name=f'file-{n}.dat', size=size, blob=blob_name, creator=owner)
+            )
+            if len(batch) >= BULK_BATCH_SIZE:
+                File.objects.bulk_create(batch)
+                batch = []
+    File.objects.bulk_create(batch)
+
+    # Bulk creation sends no signals, so sizes are accounted for here, deepest folders first
+    for level in reversed(levels):
+        for folder in level:
+            folder.size = sizes[folder.pk]
+            if folder.parent_id is not None:
+                sizes[folder.parent_id] += folder.size
+    Folder.objects.bulk_update(
+        [folder for level in levels for folder in level], ['size'], batch_size=BULK_BATCH_SIZE
+    )
+    # Mock data may exceed the default quota
+    Quota.objects.filter(pk=owner.quota.pk).update(
+        used=models.F('used') + root.size,
+        allowed=Greatest('allowed', models.F('used') + root.size),
+    )
+    StorageUsageChange.objects.create(
+        user_id=owner.pk,
+        tree_id=tree.pk,
+        content_type=File._meta.get_field('content_type').default,
+        files=len(levels[-1]) * files,
+        bytes=root.size,
+    )
+    return tree
+
+
+@transaction.atomic
+def _bulk_populate(
+    roots: int,
+    users: typing.List[User],
+    groups: typing.List[Group],
+    grants: int,
+    depth: int,
+    branching: int,
+    files: int,
+    file_size: typing.Callable[[], int],
+) -> None:
+    # Every file shares a single placeholder blob, whose content doesn't match the file sizes
+    storage = File._meta.get_field('blob').storage
+    blob_name = storage.save('mock/placeholder.dat', ContentFile(b'mock'))
+
+    start = _next_mock_number(Folder.objects.filter(parent=None), 'name')
+    principals: typing.List[typing.Union[User, Group]] = [*users, *groups]
+    with EffectivePermission.deferred_refresh():
+        for n in range(start, start + roots):
+            owner = users[n % len(users)]
+            tree = _bulk_populate_tree(
+                f'mock-{n}', owner, depth, branching, files, file_size, blob_name
+            )
+            acl = [
+                PermissionGrant(principal, random.choice(list(Permission)))
+                for principal in random.sample(principals, min(grants, len(principals)))
+                if principal != owner
+            ]
+            tree.grant_permission_list(acl + [PermissionGrant(owner, Permission.admin)])
+            print(f'Created tree {tree.pk}, of {tree.root_folder.size} bytes')
+
+
 @click.command()
 @click.argument('depth', type=click.INT, default=3)
 @click.argument('branching', type=click.INT, default=3)
 @click.argument('files', type=click.INT, default=3)
 @click.option('--user-id', type=click.INT)
-def command(depth: int, branching: int, files: int, user_id: typing.Optional[int]):
+@click.option(
+    '--bulk', is_flag=True, help='Insert in bulk, to generate production-scale data quickly.'
+)
+@click.option('--roots', type=click.IntRange(min=1), default=1, help='Bulk: number of trees.')
+@click.option(
+    '--users', type=click.IntRange(min=1), default=1, help='Bulk: number of users owning trees.'
+)
+@click.option('--groups', type=click.IntRange(min=0), default=0, help='Bulk: number of groups.')
+@click.option('--group-size', type=click.IntRange(min=1), default=10)
+@click.option(
+    '--grants',
+    type=click.IntRange(min=0),
+    default=0,
+    help='Bulk: number of users and groups granted a random permission on each tree.',
+)
+@click.option('--mean-file-size', type=click.IntRange(min=1), default=1 << 20)
+@click.option(
+    '--size-distribution', type=click.Choice(list(SIZE_DISTRIBUTIONS)), default='lognormal'
+)
+@click.option('--seed', type=click.INT, help='Seed, to generate the same data repeatedly.')
+def command(
+    depth: int,
+    branching: int,
+    files: int,
+    user_id: typing.Optional[int],
+    bulk: bool,
+    roots: int,
+    users: int,
+    groups: int,
+    group_size: int,
+    grants: int,
+    mean_file_size: int,
+    size_distribution: str,
+    seed: typing.Optional[int],
+):
+    if bulk:
+        random.seed(seed)
+        if user_id is None:
+            owners = _bulk_create_users(users)
+        else:
+            owners = [User.objects.select_related('quota').get(id=user_id)]
+        distribution = SIZE_DISTRIBUTIONS[size_distribution]
+        _bulk_populate(
+            roots,
+            owners,
+            _bulk_create_groups(groups, group_size, owners),
+            grants,
+            depth,
+            branching,
+            files,
+            lambda: distribution(mean_file_size),
+        )
+        return
+
     user = UserFactory() if user_id is None else User.objects.get(id=user_id)
     _populate_subtree(None, depth, user, branching, files)
     for tree in Tree.objects.all():
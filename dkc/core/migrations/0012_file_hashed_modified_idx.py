@@ -0,0 +1,21 @@
+# Generated by Django 3.2 on 2021-04-20 15:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_authorizedupload'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(
+                condition=models.Q(_negated=True, sha512=''),
+                fields=['modified'],
+                name='file_hashed_modified_idx',
+            ),
+        ),
+    ]
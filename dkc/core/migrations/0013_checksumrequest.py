@@ -0,0 +1,49 @@
+# Generated by Django 3.2 on 2021-04-22 14:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django_extensions.db.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_file_hashed_modified_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChecksumRequest',
+            fields=[
+                (
+                    'id',
+                    models.AutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name='ID'
+                    ),
+                ),
+                ('size', models.PositiveBigIntegerField()),
+                ('created', django_extensions.db.fields.CreationDateTimeField(auto_now_add=True)),
+                ('completed', models.DateTimeField(blank=True, null=True)),
+                (
+                    'file',
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='checksum_request',
+                        to='core.file',
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='checksumrequest',
+            index=models.Index(
+                condition=models.Q(completed=None),
+                fields=['size', 'created'],
+                name='checksum_request_pending_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='checksumrequest',
+            index=models.Index(fields=['completed'], name='checksum_request_completed_idx'),
+        ),
+    ]
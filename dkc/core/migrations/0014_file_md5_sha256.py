@@ -0,0 +1,27 @@
+# Generated by Django 3.2 on 2021-04-26 17:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_checksumrequest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='md5',
+            field=models.CharField(
+                blank=True, db_index=True, default='', editable=False, max_length=32
+            ),
+        ),
+        migrations.AddField(
+            model_name='file',
+            name='sha256',
+            field=models.CharField(
+                blank=True, db_index=True, default='', editable=False, max_length=64
+            ),
+        ),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 3.2 on 2021-05-03 13:27
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Materialize the highest level of each user's existing user and group grants on each tree
+POPULATE_SQL = """
+INSERT INTO core_effectivepermission (user_id, tree_id, level)
+SELECT
+    grants.user_id,
+    grants.tree_id,
+    MAX(
+        CASE p.codename
+            WHEN 'read_tree' THEN 1
+            WHEN 'write_tree' THEN 2
+            WHEN 'admin_tree' THEN 3
+        END
+    )
+FROM (
+    SELECT uop.user_id, uop.object_pk::integer AS tree_id, uop.permission_id
+    FROM guardian_userobjectpermission uop
+    JOIN django_content_type ct ON ct.id = uop.content_type_id
+    WHERE ct.app_label = 'core' AND ct.model = 'tree'
+    UNION ALL
+    SELECT ug.user_id, gop.object_pk::integer AS tree_id, gop.permission_id
+    FROM guardian_groupobjectpermission gop
+    JOIN django_content_type ct ON ct.id = gop.content_type_id
+    JOIN auth_user_groups ug ON ug.group_id = gop.group_id
+    WHERE ct.app_label = 'core' AND ct.model = 'tree'
+) AS grants
+JOIN auth_permission p ON p.id = grants.permission_id
+JOIN core_tree t ON t.id = grants.tree_id
+WHERE p.codename IN ('read_tree', 'write_tree', 'admin_tree')
+GROUP BY grants.user_id, grants.tree_id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('guardian', '0002_generic_permissions_index'),
+        ('core', '0014_file_md5_sha256'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EffectivePermission',
+            fields=[
+                (
+                    'id',
+                    models.AutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name='ID'
+                    ),
+                ),
+                ('level', models.PositiveSmallIntegerField()),
+                (
+                    'tree',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='effective_permissions',
+                        to='core.tree',
+                    ),
+                ),
+                (
+                    'user',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='effective_permissions',
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='effectivepermission',
+            index=models.Index(
+                fields=['user', 'level', 'tree'], name='effective_perm_user_level_idx'
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name='effectivepermission',
+            constraint=models.UniqueConstraint(
+                fields=('user', 'tree'), name='effective_permission_unique'
+            ),
+        ),
+        migrations.RunSQL(POPULATE_SQL, reverse_sql=migrations.RunSQL.noop),
+    ]
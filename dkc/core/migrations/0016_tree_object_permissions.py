@@ -0,0 +1,115 @@
+# Generated by Django 3.2 on 2021-05-06 19:52
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+TREE_CONTENT_TYPE_SQL = (
+    "(SELECT id FROM django_content_type WHERE app_label = 'core' AND model = 'tree')"
+)
+
+# Grants referencing trees which no longer exist are dropped
+FORWARD_SQL = [
+    f"""
+    INSERT INTO core_treeuserobjectpermission (permission_id, user_id, content_object_id)
+    SELECT uop.permission_id, uop.user_id, t.id
+    FROM guardian_userobjectpermission uop
+    JOIN core_tree t ON t.id::text = uop.object_pk
+    WHERE uop.content_type_id = {TREE_CONTENT_TYPE_SQL}
+    """,
+    f"""
+    INSERT INTO core_treegroupobjectpermission (permission_id, group_id, content_object_id)
+    SELECT gop.permission_id, gop.group_id, t.id
+    FROM guardian_groupobjectpermission gop
+    JOIN core_tree t ON t.id::text = gop.object_pk
+    WHERE gop.content_type_id = {TREE_CONTENT_TYPE_SQL}
+    """,
+    f'DELETE FROM guardian_userobjectpermission WHERE content_type_id = {TREE_CONTENT_TYPE_SQL}',
+    f'DELETE FROM guardian_groupobjectpermission WHERE content_type_id = {TREE_CONTENT_TYPE_SQL}',
+]
+
+REVERSE_SQL = [
+    f"""
+    INSERT INTO guardian_userobjectpermission (permission_id, user_id, content_type_id, object_pk)
+    SELECT permission_id, user_id, {TREE_CONTENT_TYPE_SQL}, content_object_id::text
+    FROM core_treeuserobjectpermission
+    """,
+    f"""
+    INSERT INTO guardian_groupobjectpermission (permission_id, group_id, content_type_id, object_pk)
+    SELECT permission_id, group_id, {TREE_CONTENT_TYPE_SQL}, content_object_id::text
+    FROM core_treegroupobjectpermission
+    """,
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0015_effectivepermission'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TreeUserObjectPermission',
+            fields=[
+                (
+                    'id',
+                    models.AutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name='ID'
+                    ),
+                ),
+                (
+                    'content_object',
+                    models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.tree'),
+                ),
+                (
+                    'permission',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to='auth.permission'
+                    ),
+                ),
+                (
+                    'user',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL
+                    ),
+                ),
+            ],
+            options={
+                'abstract': False,
+                'unique_together': {('user', 'permission', 'content_object')},
+            },
+        ),
+        migrations.CreateModel(
+            name='TreeGroupObjectPermission',
+            fields=[
+                (
+                    'id',
+                    models.AutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name='ID'
+                    ),
+                ),
+                (
+                    'content_object',
+                    models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.tree'),
+                ),
+                (
+                    'group',
+                    models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='auth.group'),
+                ),
+                (
+                    'permission',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to='auth.permission'
+                    ),
+                ),
+            ],
+            options={
+                'abstract': False,
+                'unique_together': {('group', 'permission', 'content_object')},
+            },
+        ),
+        migrations.RunSQL(FORWARD_SQL, reverse_sql=REVERSE_SQL),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2 on 2021-05-10 09:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_tree_object_permissions'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tree',
+            index=models.Index(
+                condition=models.Q(public=True), fields=['id'], name='tree_public_idx'
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.2 on 2021-05-11 16:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_tree_public_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='folder',
+            index=models.Index(
+                condition=models.Q(parent=None),
+                fields=['creator', 'name'],
+                name='folder_root_creator_idx',
+            ),
+        ),
+    ]
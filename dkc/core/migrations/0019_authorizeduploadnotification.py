@@ -0,0 +1,49 @@
+# Generated by Django 3.2 on 2021-05-13 11:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django_extensions.db.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0018_folder_root_creator_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorizedUploadNotification',
+            fields=[
+                (
+                    'id',
+                    models.AutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name='ID'
+                    ),
+                ),
+                ('created', django_extensions.db.fields.CreationDateTimeField(auto_now_add=True)),
+                (
+                    'creator',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='upload_notifications',
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    'folder',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='upload_notifications',
+                        to='core.folder',
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='authorizeduploadnotification',
+            index=models.Index(fields=['creator', 'created'], name='upload_notification_idx'),
+        ),
+    ]
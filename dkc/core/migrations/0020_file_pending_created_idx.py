@@ -0,0 +1,19 @@
+# Generated by Django 3.2 on 2021-05-14 15:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_authorizeduploadnotification'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(
+                condition=models.Q(blob=''), fields=['created'], name='file_pending_created_idx'
+            ),
+        ),
+    ]
@@ -0,0 +1,94 @@
+# Generated by Django 3.2 on 2021-05-18 10:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django_extensions.db.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_file_pending_created_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StorageUsageChange',
+            fields=[
+                (
+                    'id',
+                    models.AutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name='ID'
+                    ),
+                ),
+                ('created', django_extensions.db.fields.CreationDateTimeField(auto_now_add=True)),
+                ('user_id', models.IntegerField()),
+                ('tree_id', models.IntegerField()),
+                ('content_type', models.CharField(max_length=255)),
+                ('files', models.IntegerField()),
+                ('bytes', models.BigIntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StorageUsageSnapshot',
+            fields=[
+                (
+                    'id',
+                    models.AutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name='ID'
+                    ),
+                ),
+                ('taken', models.DateTimeField(unique=True)),
+            ],
+            options={
+                'get_latest_by': 'taken',
+            },
+        ),
+        migrations.CreateModel(
+            name='StorageUsage',
+            fields=[
+                (
+                    'id',
+                    models.AutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name='ID'
+                    ),
+                ),
+                (
+                    'dimension',
+                    models.CharField(
+                        choices=[
+                            ('user', 'User'),
+                            ('tree', 'Tree'),
+                            ('content_type', 'Content Type'),
+                        ],
+                        max_length=16,
+                    ),
+                ),
+                ('key', models.CharField(max_length=255)),
+                ('files', models.BigIntegerField()),
+                ('bytes', models.BigIntegerField()),
+                (
+                    'snapshot',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='usages',
+                        to='core.storageusagesnapshot',
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='storageusagechange',
+            index=models.Index(fields=['created'], name='storage_change_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='storageusage',
+            index=models.Index(fields=['dimension', 'key'], name='storage_usage_trend_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='storageusage',
+            constraint=models.UniqueConstraint(
+                fields=('snapshot', 'dimension', 'key'), name='storage_usage_unique'
+            ),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 3.2 on 2021-05-20 13:58
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django_extensions.db.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0021_storage_usage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChecksumRecompute',
+            fields=[
+                (
+                    'id',
+                    models.AutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name='ID'
+                    ),
+                ),
+                ('created', django_extensions.db.fields.CreationDateTimeField(auto_now_add=True)),
+                ('query', models.BinaryField(editable=False)),
+                ('total', models.PositiveIntegerField(blank=True, null=True)),
+                ('enqueued', models.PositiveIntegerField(default=0)),
+                ('completed', models.DateTimeField(blank=True, null=True)),
+                (
+                    'creator',
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name='+',
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+    ]
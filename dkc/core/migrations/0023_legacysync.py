@@ -0,0 +1,30 @@
+# Generated by Django 3.2 on 2021-05-24 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_checksumrecompute'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LegacySync',
+            fields=[
+                (
+                    'id',
+                    models.AutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name='ID'
+                    ),
+                ),
+                ('started', models.DateTimeField()),
+                ('completed', models.DateTimeField(blank=True, null=True)),
+                ('delta', models.BooleanField(default=False)),
+            ],
+            options={
+                'get_latest_by': 'started',
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 3.2 on 2021-05-25 15:40
+
+from django.db import migrations, models
+import django_extensions.db.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_legacysync'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LegacyCheckpoint',
+            fields=[
+                (
+                    'id',
+                    models.AutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name='ID'
+                    ),
+                ),
+                ('created', django_extensions.db.fields.CreationDateTimeField(auto_now_add=True)),
+                (
+                    'kind',
+                    models.CharField(
+                        choices=[('root', 'Root'), ('subtree', 'Subtree')], max_length=16
+                    ),
+                ),
+                ('legacy_id', models.CharField(max_length=24)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='legacycheckpoint',
+            constraint=models.UniqueConstraint(
+                fields=('kind', 'legacy_id'), name='legacy_checkpoint_unique'
+            ),
+        ),
+    ]
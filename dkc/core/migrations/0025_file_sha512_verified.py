@@ -0,0 +1,26 @@
+# Generated by Django 3.2 on 2021-05-27 09:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_legacycheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='sha512_verified',
+            field=models.BooleanField(default=True, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(
+                condition=models.Q(sha512_verified=False),
+                fields=['id'],
+                name='file_sha512_unverified_idx',
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2 on 2021-05-28 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_file_sha512_verified'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='checksumrequest',
+            name='claimed',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='checksumrequest',
+            name='failures',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
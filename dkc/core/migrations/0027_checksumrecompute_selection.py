@@ -0,0 +1,27 @@
+# Generated by Django 3.2 on 2021-05-28 14:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0026_checksumrequest_claimed_failures'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='checksumrecompute',
+            name='query',
+        ),
+        migrations.AddField(
+            model_name='checksumrecompute',
+            name='file_ids',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='checksumrecompute',
+            name='changelist_params',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
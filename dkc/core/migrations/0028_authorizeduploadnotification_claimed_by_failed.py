@@ -0,0 +1,23 @@
+# Generated by Django 3.2 on 2021-05-31 09:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0027_checksumrecompute_selection'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authorizeduploadnotification',
+            name='claimed_by',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='authorizeduploadnotification',
+            name='failed',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,9 +1,32 @@
-from .authorized_upload import AuthorizedUpload
+from .authorized_upload import AuthorizedUpload, AuthorizedUploadNotification
+from .checksum_request import ChecksumRecompute, ChecksumRequest
+from .effective_permission import EffectivePermission
 from .file import File
 from .folder import Folder
+from .legacy_sync import LegacyCheckpoint, LegacySync
 from .quota import Quota
+from .storage_usage import StorageUsage, StorageUsageChange, StorageUsageSnapshot
 from .terms import Terms
 from .terms_agreement import TermsAgreement
-from .tree import Tree
+from .tree import Tree, TreeGroupObjectPermission, TreeUserObjectPermission
 
-__all__ = ['AuthorizedUpload', 'File', 'Folder', 'Quota', 'Terms', 'TermsAgreement', 'Tree']
+__all__ = [
+    'AuthorizedUpload',
+    'AuthorizedUploadNotification',
+    'ChecksumRecompute',
+    'ChecksumRequest',
+    'EffectivePermission',
+    'File',
+    'Folder',
+    'LegacyCheckpoint',
+    'LegacySync',
+    'Quota',
+    'StorageUsage',
+    'StorageUsageChange',
+    'StorageUsageSnapshot',
+    'Terms',
+    'TermsAgreement',
+    'Tree',
+    'TreeGroupObjectPermission',
+    'TreeUserObjectPermission',
+]
@@ -36,3 +36,27 @@ class AuthorizedUpload(models.Model):
             raise signing.BadSignature('Invalid signed scope.')
         if signed_obj.get('id') != self.id:
             raise signing.BadSignature('Invalid signed ID.')
+
+
+class AuthorizedUploadNotification(models.Model):
+    """
+    A pending notification to the creator of an authorized upload, that it was completed.
+
+    Notifications are delivered asynchronously, and all of a user's pending notifications
+    are coalesced into a single email. Notifications are claimed by the task which sends them,
+    and are kept with their failure time if every attempt to send them failed.
+    """
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['creator', 'created'], name='upload_notification_idx'),
+        ]
+
+    creator = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_notifications')
+    folder = models.ForeignKey(
+        Folder, on_delete=models.CASCADE, related_name='upload_notifications'
+    )
+    created = CreationDateTimeField()
+    # The id of the task sending this notification, which is kept across its retries
+    claimed_by = models.CharField(max_length=255, blank=True)
+    failed = models.DateTimeField(null=True, blank=True)
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from typing import Dict, List
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import models, transaction
+from django.utils import timezone
+from django_extensions.db.models import CreationDateTimeField
+
+from .file import File
+
+
+class ChecksumRequest(models.Model):
+    """
+    A request to (re)compute the checksum of a File.
+
+    There is at most one request per File, so repeated requests for a File which is still
+    pending are coalesced. Pending requests are processed smallest-first, so that most files
+    are finalized quickly, even while a large backlog exists.
+
+    Requests are claimed for a limited time while they are computed, so requests claimed by a
+    worker which died are eventually claimed again. A request which fails is left pending, and
+    is retried once its claim expires, up to ``DKC_CHECKSUM_MAX_FAILURES`` times.
+    """
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['size', 'created'],
+                condition=models.Q(completed=None),
+                name='checksum_request_pending_idx',
+            ),
+            models.Index(fields=['completed'], name='checksum_request_completed_idx'),
+        ]
+
+    file = models.OneToOneField(File, on_delete=models.CASCADE, related_name='checksum_request')
+    # Denormalized from the file, so pending requests can be ordered by index
+    size = models.PositiveBigIntegerField()
+    created = CreationDateTimeField()
+    completed = models.DateTimeField(null=True, blank=True)
+    claimed = models.DateTimeField(null=True, blank=True)
+    failures = models.PositiveSmallIntegerField(default=0)
+
+    @classmethod
+    def enqueue(cls, queryset: models.QuerySet[File]) -> int:
+        """
+        Request checksums for every File in the queryset.
+
+        Files which already have a pending request are unaffected. Returns the number of Files.
+        """
+        return cls.enqueue_sizes(dict(queryset.order_by().values_list('pk', 'size')))
+
+    @classmethod
+    def enqueue_sizes(cls, files: Dict[int, int]) -> int:
+        """Request checksums for Files, given as a mapping of their ids to their sizes."""
+        # Re-open completed and failed requests
+        cls.objects.filter(file__in=files.keys()).exclude(completed=None, failures=0).update(
+            completed=None, claimed=None, failures=0, created=timezone.now()
+        )
+        cls.objects.bulk_create(
+            [cls(file_id=pk, size=size) for pk, size in files.items()],
+            ignore_conflicts=True,
+        )
+        return len(files)
+
+    @classmethod
+    def pending(cls) -> models.QuerySet[ChecksumRequest]:
+        return cls.objects.filter(completed=None).order_by('size', 'created')
+
+    @classmethod
+    def claim(cls, count: int) -> List[ChecksumRequest]:
+        """Claim up to ``count`` pending requests, which aren't claimed by another worker."""
+        now = timezone.now()
+        expiration = now - timedelta(hours=settings.DKC_CHECKSUM_CLAIM_EXPIRATION_HOURS)
+        # Locks are only held while claiming, so the blobs are read outside of any transaction
+        with transaction.atomic():
+            requests = list(
+                cls.pending()
+                .filter(models.Q(claimed=None) | models.Q(claimed__lt=expiration))
+                .filter(failures__lt=settings.DKC_CHECKSUM_MAX_FAILURES)
+                .select_related('file')
+                .select_for_update(skip_locked=True, of=('self',))[:count]
+            )
+            cls.objects.filter(pk__in=[request.pk for request in requests]).update(claimed=now)
+        return requests
+
+    @classmethod
+    def statistics(cls, window: timedelta = timedelta(hours=1)) -> Dict[str, int]:
+        """Summarize the current backlog, and the throughput over the recent time window."""
+        backlog = cls.objects.filter(completed=None).aggregate(
+            files=models.Count('pk'), bytes=models.Sum('size')
+        )
+        completed = cls.objects.filter(completed__gte=timezone.now() - window).aggregate(
+            files=models.Count('pk'), bytes=models.Sum('size')
+        )
+        failed = cls.objects.filter(
+            completed=None, failures__gte=settings.DKC_CHECKSUM_MAX_FAILURES
+        ).aggregate(files=models.Count('pk'), bytes=models.Sum('size'))
+        return {
+            'backlog_files': backlog['files'],
+            'backlog_bytes': backlog['bytes'] or 0,
+            'failed_files': failed['files'],
+            'failed_bytes': failed['bytes'] or 0,
+            'completed_files': completed['files'],
+            'completed_bytes': completed['bytes'] or 0,
+        }
+
+
+class ChecksumRecompute(models.Model):
+    """
+    A request, made from the admin, to recompute the checksums of many Files.
+
+    The Files are either the ids which were selected, or everything matching the filters and
+    search of the changelist the action was run from. They are enqueued in the background, which
+    records its progress here.
+    """
+
+    created = CreationDateTimeField()
+    creator = models.ForeignKey(
+        User, null=True, blank=True, on_delete=models.SET_NULL, related_name='+'
+    )
+    # The selected ids, or null if every File matching the changelist parameters was selected
+    file_ids = models.JSONField(null=True, blank=True, editable=False)
+    # The query string of the changelist, as a mapping of each parameter to its values
+    changelist_params = models.JSONField(default=dict, blank=True, editable=False)
+    total = models.PositiveIntegerField(null=True, blank=True)
+    enqueued = models.PositiveIntegerField(default=0)
+    completed = models.DateTimeField(null=True, blank=True)
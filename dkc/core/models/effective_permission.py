@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+import threading
+from typing import Dict, Iterable, Iterator, List, Set, Tuple, Type, Union
+
+from django.contrib.auth.models import Group, User
+from django.db import models, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from dkc.core.permission_cache import notify_permissions_changed, permission_cache
+from dkc.core.permissions import Permission
+
+from .tree import Tree, TreeGroupObjectPermission, TreeUserObjectPermission
+
+_PERMISSION_LEVELS = {permission.value: permission.level for permission in Permission}
+
+# Refreshes which are deferred until the end of a batch, if one is active in this thread
+_deferred = threading.local()
+
+
+class EffectivePermission(models.Model):
+    """
+    The highest permission level that a user holds on a tree, from any user or group grant.
+
+    This is a materialization of the permissions stored by django-guardian, which are the
+    source of truth. Rows are kept up to date by signals, whenever grants or group memberships
+    change. Users without any grant on a tree have no row for it.
+    """
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'tree'], name='effective_permission_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'level', 'tree'], name='effective_perm_user_level_idx'),
+        ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='effective_permissions')
+    tree = models.ForeignKey(Tree, on_delete=models.CASCADE, related_name='effective_permissions')
+    level = models.PositiveSmallIntegerField()
+
+    @classmethod
+    def get_levels(cls, user: User, tree_ids: Iterable[int]) -> Dict[int, int]:
+        """Get the user's level on each tree, or 0 where the user has no permission."""
+
+        def load(missing_tree_ids: List[int]) -> Dict[int, int]:
+            return dict(
+                cls.objects.filter(user=user, tree__in=missing_tree_ids).values_list(
+                    'tree', 'level'
+                )
+            )
+
+        return permission_cache.get_levels(user.pk, tree_ids, load)
+
+    @classmethod
+    def schedule_refresh(
+        cls,
+        tree_ids: Iterable[int],
+        user_ids: Iterable[int] = (),
+        group_ids: Iterable[int] = (),
+    ) -> None:
+        """
+        Refresh the given trees, for the given users and all members of the given groups.
+
+        Within a `deferred_refresh` block, this is postponed until the end of the block.
+        """
+        pending = getattr(_deferred, 'pending', None)
+        if pending is None:
+            user_ids = set(user_ids)
+            group_ids = list(group_ids)
+            if group_ids:
+                user_ids.update(
+                    User.objects.filter(groups__in=group_ids).values_list('pk', flat=True)
+                )
+            cls.refresh(tree_ids, user_ids)
+        else:
+            pending_tree_ids, pending_user_ids, pending_group_ids = pending
+            pending_tree_ids.update(tree_ids)
+            pending_user_ids.update(user_ids)
+            pending_group_ids.update(group_ids)
+
+    @classmethod
+    @contextmanager
+    def deferred_refresh(cls) -> Iterator[None]:
+        """Coalesce all the refreshes scheduled within this block into a single one."""
+        if getattr(_deferred, 'pending', None) is not None:
+            # Already deferred by an enclosing block
+            yield
+            return
+
+        _deferred.pending = (set(), set(), set())
+        try:
+            yield
+            tree_ids, user_ids, group_ids = _deferred.pending
+        finally:
+            _deferred.pending = None
+        cls.schedule_refresh(tree_ids, user_ids, group_ids)
+
+    @classmethod
+    def refresh(cls, tree_ids: Iterable[int], user_ids: Iterable[int]) -> None:
+        """Recompute the effective permissions for every pair of the given trees and users."""
+        # Trees may be in the process of deletion
+        tree_ids = list(Tree.objects.filter(pk__in=list(tree_ids)).values_list('pk', flat=True))
+        user_ids = list(user_ids)
+        if not tree_ids or not user_ids:
+            return
+
+        grant_filters = {
+            'content_object__in': tree_ids,
+            'permission__codename__in': list(_PERMISSION_LEVELS),
+        }
+        grants = TreeUserObjectPermission.objects.filter(
+            user__in=user_ids, **grant_filters
+        ).values_list('user', 'content_object', 'permission__codename')
+        group_grants = TreeGroupObjectPermission.objects.filter(
+            group__user__in=user_ids, **grant_filters
+        ).values_list('group__user', 'content_object', 'permission__codename')
+
+        levels: Dict[Tuple[int, int], int] = {}
+        for queryset in [grants, group_grants]:
+            for user_id, tree_id, codename in queryset:
+                key = (user_id, tree_id)
+                levels[key] = max(levels.get(key, 0), _PERMISSION_LEVELS[codename])
+
+        with transaction.atomic():
+            cls.objects.filter(tree__in=tree_ids, user__in=user_ids).delete()
+            cls.objects.bulk_create(
+                [
+                    cls(user_id=user_id, tree_id=tree_id, level=level)
+                    for (user_id, tree_id), level in levels.items()
+                ]
+            )
+            notify_permissions_changed(tree_ids)
+
+
+def _group_tree_ids(groups: Iterable[Union[Group, int]]) -> Set[int]:
+    return set(
+        TreeGroupObjectPermission.objects.filter(group__in=groups).values_list(
+            'content_object', flat=True
+        )
+    )
+
+
+@receiver(post_save, sender=TreeUserObjectPermission)
+@receiver(post_delete, sender=TreeUserObjectPermission)
+def _user_object_permission_changed(
+    sender: Type[TreeUserObjectPermission], instance: TreeUserObjectPermission, **kwargs
+):
+    EffectivePermission.schedule_refresh([instance.content_object_id], [instance.user_id])
+
+
+@receiver(post_save, sender=TreeGroupObjectPermission)
+@receiver(post_delete, sender=TreeGroupObjectPermission)
+def _group_object_permission_changed(
+    sender: Type[TreeGroupObjectPermission], instance: TreeGroupObjectPermission, **kwargs
+):
+    EffectivePermission.schedule_refresh(
+        [instance.content_object_id], group_ids=[instance.group_id]
+    )
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def _group_membership_changed(
+    sender, instance: Union[User, Group], action: str, reverse: bool, pk_set: Set[int], **kwargs
+):
+    if action == 'pre_clear':
+        # The cleared relations are unavailable after the fact, so record them now
+        related = instance.user_set if reverse else instance.groups
+        instance._cleared_pks = set(related.values_list('pk', flat=True))
+        return
+    elif action == 'post_clear':
+        pk_set = instance._cleared_pks
+    elif action not in ['post_add', 'post_remove']:
+        return
+
+    if reverse:
+        # A group's members changed
+        EffectivePermission.schedule_refresh(_group_tree_ids([instance]), pk_set)
+    else:
+        # A user's groups changed
+        EffectivePermission.schedule_refresh(_group_tree_ids(pk_set), [instance.pk])
+
+
+@receiver(pre_delete, sender=Group)
+def _group_pre_delete(sender: Type[Group], instance: Group, **kwargs):
+    # Group memberships are removed by cascade, which sends no m2m_changed signal
+    instance._affected_tree_ids = _group_tree_ids([instance])
+    instance._affected_user_ids = list(instance.user_set.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Group)
+def _group_post_delete(sender: Type[Group], instance: Group, **kwargs):
+    EffectivePermission.schedule_refresh(instance._affected_tree_ids, instance._affected_user_ids)
@@ -1,19 +1,30 @@
+from datetime import timedelta
 import hashlib
+import threading
 from typing import Optional, Type
 
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.core import validators
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
 from django.dispatch import receiver
+from django.utils import timezone
 from django_extensions.db.models import TimeStampedModel
 from girder_utils.db import JSONObjectField
 from s3_file_field import S3FileField
 
+from ..hash_filter import known_checksums
 from ..permissions import Permission
 from .folder import Folder
 from .tree import Tree
 
+# Digests which are computed for every blob, named as in hashlib
+CHECKSUM_ALGORITHMS = ['md5', 'sha256', 'sha512']
+
+# Set while sizes are being released for many deleted files at once
+_bulk_deletion = threading.local()
+
 
 class File(TimeStampedModel, models.Model):
     class Meta:
@@ -29,6 +40,24 @@ class File(TimeStampedModel, models.Model):
                 condition=~models.Q(legacy_item_id=''),
                 name='file_legacy_item_id_idx',
             ),
+            # Supports incremental refreshes of the checksum filter
+            models.Index(
+                fields=['modified'],
+                condition=~models.Q(sha512=''),
+                name='file_hashed_modified_idx',
+            ),
+            # Supports sampling the checksums which were reused from the legacy instance
+            models.Index(
+                fields=['id'],
+                condition=models.Q(sha512_verified=False),
+                name='file_sha512_unverified_idx',
+            ),
+            # Supports finding pending files, whose quota is only reserved until they expire
+            models.Index(
+                fields=['created'],
+                condition=models.Q(blob=''),
+                name='file_pending_created_idx',
+            ),
         ]
         ordering = ['name']
         constraints = [
@@ -49,7 +78,11 @@ class File(TimeStampedModel, models.Model):
     size = models.PositiveBigIntegerField()
     content_type = models.CharField(max_length=255, default='application/octet-stream')
     blob = S3FileField(blank=True)
+    md5 = models.CharField(max_length=32, blank=True, default='', db_index=True, editable=False)
+    sha256 = models.CharField(max_length=64, blank=True, default='', db_index=True, editable=False)
     sha512 = models.CharField(max_length=128, blank=True, default='', db_index=True, editable=False)
+    # False while the sha512 is a legacy checksum, which hasn't been computed from the blob
+    sha512_verified = models.BooleanField(default=True, editable=False)
     user_metadata = JSONObjectField()
     folder = models.ForeignKey(Folder, on_delete=models.CASCADE, related_name='files')
     # Prevent deletion of User if it has Folders referencing it
@@ -58,6 +91,13 @@ class File(TimeStampedModel, models.Model):
     legacy_file_id = models.CharField(max_length=24, default='', blank=True)
     legacy_item_id = models.CharField(max_length=24, default='', blank=True)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Keep the loaded values, so changes can be detected when saving without another query
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
     @property
     def abs_path(self) -> str:
         """Get a string representation of this File's absolute path."""
@@ -71,12 +111,53 @@ class File(TimeStampedModel, models.Model):
     def short_checksum(self) -> Optional[str]:
         return self.sha512[:10] if self.sha512 else None
 
-    def compute_sha512(self) -> None:
-        hasher = hashlib.sha512()
+    def compute_checksums(self) -> None:
+        """Compute every checksum of the blob, with a single read of its content."""
+        hashers = [hashlib.new(algorithm) for algorithm in CHECKSUM_ALGORITHMS]
         with self.blob.open() as blob:
             for chunk in blob.chunks():
-                hasher.update(chunk)
-        self.sha512 = hasher.hexdigest()
+                for hasher in hashers:
+                    hasher.update(chunk)
+        for algorithm, hasher in zip(CHECKSUM_ALGORITHMS, hashers):
+            setattr(self, algorithm, hasher.hexdigest())
+        self.sha512_verified = True
+
+    @classmethod
+    def expired_pending(cls) -> models.QuerySet['File']:
+        """
+        Return pending files which were never uploaded, and whose reserved quota has expired.
+
+        Files pending migration from the legacy instance never expire.
+        """
+        expiration = timezone.now() - timedelta(days=settings.DKC_PENDING_FILE_EXPIRATION_DAYS)
+        return cls.objects.filter(blob='', legacy_file_id='', created__lt=expiration)
+
+    @classmethod
+    @transaction.atomic
+    def bulk_delete(cls, queryset: models.QuerySet['File']) -> int:
+        """
+        Delete many files, releasing their sizes once per folder, rather than once per file.
+
+        Their storage usage changes are also recorded in bulk. Returns the number of deleted files.
+        """
+        from .storage_usage import StorageUsageChange
+
+        folder_sizes = dict(
+            queryset.order_by()
+            .values('folder')
+            .annotate(total=models.Sum('size'))
+            .values_list('folder', 'total')
+        )
+        StorageUsageChange.record_deletion(queryset)
+        _bulk_deletion.active = True
+        try:
+            deleted = queryset.delete()[1].get(cls._meta.label, 0)
+        finally:
+            _bulk_deletion.active = False
+
+        for folder in Folder.objects.select_related('tree__quota').filter(pk__in=folder_sizes):
+            folder.increment_size(-folder_sizes[folder.pk])
+        return deleted
 
     def clean(self) -> None:
         if self.folder.child_folders.filter(name=self.name).exists():
@@ -93,6 +174,9 @@ class File(TimeStampedModel, models.Model):
         *all* trees with the appropriate permission level.  This queryset is used as a subquery
         to filter the provided queryset by traversing through the folder->tree relationship.
         """
+        if user.is_anonymous:
+            return queryset.filter(Tree.anonymous_filter(permission, 'folder__tree__'))
+
         tree_query = Tree.filter_by_permission(user, permission, Tree.objects).values('pk')
         return queryset.filter(folder__tree__in=models.Subquery(tree_query))
 
@@ -107,6 +191,15 @@ def _file_pre_save(sender: Type[File], instance: File, **kwargs):
         instance.folder.increment_size(instance.size)
 
 
+@receiver(models.signals.post_save, sender=File)
+def _file_post_save(sender: Type[File], instance: File, **kwargs):
+    for algorithm in CHECKSUM_ALGORITHMS:
+        digest = getattr(instance, algorithm)
+        if digest:
+            known_checksums[algorithm].add(digest)
+
+
 @receiver(models.signals.post_delete, sender=File)
 def _file_post_delete(sender: Type[File], instance: File, **kwargs):
-    instance.folder.increment_size(-instance.size)
+    if not getattr(_bulk_deletion, 'active', False):
+        instance.folder.increment_size(-instance.size)
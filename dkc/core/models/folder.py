@@ -23,6 +23,11 @@ class Folder(TimeStampedModel, models.Model):
             models.Index(
                 fields=['legacy_id'], condition=~models.Q(legacy_id=''), name='folder_legacy_id_idx'
             ),
+            models.Index(
+                fields=['creator', 'name'],
+                condition=models.Q(parent=None),
+                name='folder_root_creator_idx',
+            ),
         ]
         ordering = ['name']
         constraints = [
@@ -144,6 +149,9 @@ class Folder(TimeStampedModel, models.Model):
         *all* trees with the appropriate permission level.  This queryset is used as a subquery
         to filter the provided queryset.
         """
+        if user.is_anonymous:
+            return queryset.filter(Tree.anonymous_filter(permission, 'tree__'))
+
         tree_query = Tree.filter_by_permission(user, permission, Tree.objects).values('pk')
         return queryset.filter(tree__in=models.Subquery(tree_query))
 
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Optional
+
+from django.db import models
+from django_extensions.db.models import CreationDateTimeField
+
+# Legacy documents are selected by their update times, which are recorded by a different clock
+SYNC_OVERLAP = timedelta(minutes=10)
+
+
+class LegacySync(models.Model):
+    """A run of the migration from the legacy instance."""
+
+    class Meta:
+        get_latest_by = 'started'
+
+    started = models.DateTimeField()
+    completed = models.DateTimeField(null=True, blank=True)
+    delta = models.BooleanField(default=False)
+
+    @classmethod
+    def delta_since(cls) -> Optional[datetime]:
+        """
+        Return the time after which legacy documents may have changed since the last sync.
+
+        When the last sync completed a full import which failed before, this is the start of the
+        first failed run. Returns None if no sync has completed yet.
+        """
+        completed = cls.objects.exclude(completed=None).order_by('-started')
+        last = completed.first()
+        if last is None:
+            return None
+
+        # A failed full import is rerun only for the roots it didn't import, so the roots it did
+        # import are only as recent as its start
+        incomplete = cls.objects.filter(delta=False, started__lt=last.started)
+        previous = completed.filter(started__lt=last.started).first()
+        if previous is not None:
+            incomplete = incomplete.filter(started__gt=previous.started)
+        earliest = incomplete.aggregate(started=models.Min('started'))['started']
+        return (earliest or last.started) - SYNC_OVERLAP
+
+
+class LegacyCheckpoint(models.Model):
+    """A unit of the migration from the legacy instance which has been committed."""
+
+    class Kind(models.TextChoices):
+        # An entire legacy collection or user
+        ROOT = 'root'
+        # A legacy folder, with either all or only the direct contents beneath it
+        SUBTREE = 'subtree'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'legacy_id'], name='legacy_checkpoint_unique'),
+        ]
+
+    created = CreationDateTimeField()
+    kind = models.CharField(max_length=16, choices=Kind.choices)
+    legacy_id = models.CharField(max_length=24)
@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import timedelta
+from typing import DefaultDict, Dict, List, Optional, Tuple, Type
+
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from django_extensions.db.models import CreationDateTimeField
+
+from .file import File, _bulk_deletion
+from .folder import Folder
+
+# Changes may be committed slightly after they are created, so the most recent ones are left for
+# the next snapshot to include
+CHANGE_COMMIT_GRACE = timedelta(minutes=5)
+
+# The fields which a file's usage is attributed by, or counted from
+USAGE_FIELDS = {'creator', 'folder', 'content_type', 'size'}
+USAGE_ATTNAMES = ['creator_id', 'folder_id', 'content_type', 'size']
+
+
+class StorageUsageChange(models.Model):
+    """
+    A file addition or removal, recorded so that usage snapshots can be built incrementally.
+
+    A file whose usage fields are changed by saving it is recorded as removed, then added again.
+    Like other signals, this isn't done for queryset updates. Changes are deleted once they are
+    included in a snapshot.
+    """
+
+    class Meta:
+        indexes = [models.Index(fields=['created'], name='storage_change_created_idx')]
+
+    created = CreationDateTimeField()
+    # Not foreign keys, so that changes are still counted after a user or tree is deleted
+    user_id = models.IntegerField()
+    tree_id = models.IntegerField()
+    content_type = models.CharField(max_length=255)
+    files = models.IntegerField()
+    bytes = models.BigIntegerField()
+
+    @classmethod
+    def for_file(cls, file: File, sign: int) -> StorageUsageChange:
+        return cls(
+            user_id=file.creator_id,
+            tree_id=file.folder.tree_id,
+            content_type=file.content_type,
+            files=sign,
+            bytes=sign * file.size,
+        )
+
+    @classmethod
+    def record(cls, file: File, sign: int) -> None:
+        cls.for_file(file, sign).save()
+
+    @classmethod
+    def record_deletion(cls, queryset: models.QuerySet[File]) -> None:
+        """Record the removal of every File in a queryset, which is about to be deleted."""
+        cls.objects.bulk_create(
+            [
+                cls(
+                    user_id=user_id,
+                    tree_id=tree_id,
+                    content_type=content_type,
+                    files=-file_count,
+                    bytes=-file_bytes,
+                )
+                for user_id, tree_id, content_type, file_count, file_bytes in (
+                    queryset.order_by()
+                    .values('creator', 'folder__tree', 'content_type')
+                    .annotate(file_count=models.Count('pk'), file_bytes=models.Sum('size'))
+                    .values_list(
+                        'creator', 'folder__tree', 'content_type', 'file_count', 'file_bytes'
+                    )
+                )
+            ],
+            batch_size=1000,
+        )
+
+
+class StorageUsageSnapshot(models.Model):
+    """
+    The total number and size of files, per user, tree and content type, at a point in time.
+
+    Each snapshot is computed from the previous one and the changes since, so only the first
+    snapshot aggregates the entire file table.
+    """
+
+    # Changes created before this time are included
+    taken = models.DateTimeField(unique=True)
+
+    class Meta:
+        get_latest_by = 'taken'
+
+    @classmethod
+    @transaction.atomic
+    def take(cls) -> StorageUsageSnapshot:
+        totals: DefaultDict[Tuple[str, str], List[int]] = defaultdict(lambda: [0, 0])
+
+        def add(
+            dimension: str,
+            rows: models.QuerySet,
+            field: str,
+            count_expression: models.Aggregate,
+            size_expression: models.Aggregate,
+        ) -> None:
+            for key, files, size in (
+                rows.order_by()
+                .values(field)
+                .annotate(total_files=count_expression, total_bytes=size_expression)
+                .values_list(field, 'total_files', 'total_bytes')
+            ):
+                total = totals[(dimension, str(key))]
+                total[0] += files
+                total[1] += size
+
+        previous = cls.objects.order_by('-taken').first()
+        if previous is None:
+            taken = timezone.now()
+            for dimension, field in StorageUsage.FILE_FIELDS.items():
+                add(dimension, File.objects, field, models.Count('pk'), models.Sum('size'))
+        else:
+            taken = timezone.now() - CHANGE_COMMIT_GRACE
+            for usage in previous.usages.all():
+                totals[(usage.dimension, usage.key)] = [usage.files, usage.bytes]
+            changes = StorageUsageChange.objects.filter(
+                created__gte=previous.taken, created__lt=taken
+            )
+            for dimension, field in StorageUsage.CHANGE_FIELDS.items():
+                add(dimension, changes, field, models.Sum('files'), models.Sum('bytes'))
+
+        snapshot = cls.objects.create(taken=taken)
+        StorageUsage.objects.bulk_create(
+            [
+                StorageUsage(
+                    snapshot=snapshot, dimension=dimension, key=key, files=files, bytes=size
+                )
+                for (dimension, key), (files, size) in totals.items()
+                if files
+            ],
+            batch_size=1000,
+        )
+        StorageUsageChange.objects.filter(created__lt=taken).delete()
+        return snapshot
+
+
+class StorageUsage(models.Model):
+    class Dimension(models.TextChoices):
+        USER = 'user'
+        TREE = 'tree'
+        CONTENT_TYPE = 'content_type'
+
+    # The fields which each dimension is keyed by
+    FILE_FIELDS: Dict[str, str] = {
+        Dimension.USER: 'creator',
+        Dimension.TREE: 'folder__tree',
+        Dimension.CONTENT_TYPE: 'content_type',
+    }
+    CHANGE_FIELDS: Dict[str, str] = {
+        Dimension.USER: 'user_id',
+        Dimension.TREE: 'tree_id',
+        Dimension.CONTENT_TYPE: 'content_type',
+    }
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['snapshot', 'dimension', 'key'], name='storage_usage_unique'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['dimension', 'key'], name='storage_usage_trend_idx'),
+        ]
+
+    snapshot = models.ForeignKey(
+        StorageUsageSnapshot, on_delete=models.CASCADE, related_name='usages'
+    )
+    dimension = models.CharField(max_length=16, choices=Dimension.choices)
+    key = models.CharField(max_length=255)
+    files = models.BigIntegerField()
+    bytes = models.BigIntegerField()
+
+
+def _usage_values(file: File) -> Tuple[int, int, str, int]:
+    return file.creator_id, file.folder_id, file.content_type, file.size
+
+
+@receiver(pre_save, sender=File)
+def _file_pre_save_usage(
+    sender: Type[File], instance: File, update_fields: Optional[frozenset], **kwargs
+):
+    if instance._state.adding or (update_fields is not None and not USAGE_FIELDS & update_fields):
+        return
+    loaded = getattr(instance, '_loaded_values', {})
+    if all(attname in loaded for attname in USAGE_ATTNAMES):
+        instance._usage_previous = tuple(loaded[attname] for attname in USAGE_ATTNAMES)
+    else:
+        # Some of the fields were deferred when the file was loaded
+        instance._usage_previous = (
+            File.objects.filter(pk=instance.pk).values_list(*USAGE_ATTNAMES).first()
+        )
+
+
+@receiver(post_save, sender=File)
+def _file_post_save_usage(sender: Type[File], instance: File, created: bool, **kwargs):
+    previous = instance.__dict__.pop('_usage_previous', None)
+    current = _usage_values(instance)
+    if created:
+        StorageUsageChange.record(instance, 1)
+    elif previous is not None and previous != current:
+        user_id, folder_id, content_type, size = previous
+        tree_id = (
+            instance.folder.tree_id
+            if folder_id == instance.folder_id
+            else Folder.objects.values_list('tree', flat=True).get(pk=folder_id)
+        )
+        StorageUsageChange.objects.bulk_create(
+            [
+                StorageUsageChange(
+                    user_id=user_id,
+                    tree_id=tree_id,
+                    content_type=content_type,
+                    files=-1,
+                    bytes=-size,
+                ),
+                StorageUsageChange.for_file(instance, 1),
+            ]
+        )
+    # Later saves of this instance are compared to what was just saved
+    instance.__dict__.setdefault('_loaded_values', {}).update(zip(USAGE_ATTNAMES, current))
+
+
+@receiver(post_delete, sender=File)
+def _file_post_delete_usage(sender: Type[File], instance: File, **kwargs):
+    # Bulk deletions record their changes in bulk
+    if not getattr(_bulk_deletion, 'active', False):
+        StorageUsageChange.record(instance, -1)
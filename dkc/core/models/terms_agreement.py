@@ -1,9 +1,18 @@
+from __future__ import annotations
+
+from typing import Dict, Iterable, Type
+
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django_extensions.db.models import TimeStampedModel
 
 from .terms import Terms
+from .tree import Tree
 
 
 class TermsAgreement(TimeStampedModel, models.Model):
@@ -22,3 +31,83 @@ class TermsAgreement(TimeStampedModel, models.Model):
     def clean(self) -> None:
         if self.checksum != self.terms.checksum:
             raise ValidationError({'checksum': 'The checksum does not match the latest terms.'})
+
+
+def _agreement_cache_key(user_id: int, tree_id: int) -> str:
+    return f'dkc:terms-agreement:{user_id}:{tree_id}'
+
+
+class TermsAgreementChecker:
+    """
+    Determine whether a user must agree to the terms of use of many trees, with few queries.
+
+    The checksum of each of the user's agreements is cached, so repeated checks only need to
+    look up the current terms. A cached agreement stops applying as soon as its terms change.
+    """
+
+    def __init__(self, user: User) -> None:
+        self.user = user
+        self._required: Dict[int, bool] = {}
+
+    def _check(self, checksums: Dict[int, str]) -> Dict[int, bool]:
+        """Given the current terms checksum of some trees, return whether each is required."""
+        if self.user.is_anonymous:
+            return {tree_id: True for tree_id in checksums}
+
+        keys = {tree_id: _agreement_cache_key(self.user.pk, tree_id) for tree_id in checksums}
+        cached = cache.get_many(keys.values())
+        agreed = {tree_id: cached.get(key) for tree_id, key in keys.items()}
+
+        # Only agreements are cached, so anything else must be checked again
+        unknown = [
+            tree_id for tree_id, checksum in checksums.items() if agreed[tree_id] != checksum
+        ]
+        if unknown:
+            latest = dict(
+                TermsAgreement.objects.filter(user=self.user, terms__in=unknown).values_list(
+                    'terms', 'checksum'
+                )
+            )
+            cache.set_many(
+                {keys[tree_id]: checksum for tree_id, checksum in latest.items()},
+                settings.DKC_TERMS_AGREEMENT_CACHE_SECONDS,
+            )
+            agreed.update(latest)
+
+        return {tree_id: agreed[tree_id] != checksum for tree_id, checksum in checksums.items()}
+
+    def prefetch(self, trees: Iterable[Tree]) -> None:
+        """Check all the given trees at once."""
+        new_tree_ids = {tree.pk for tree in trees} - self._required.keys()
+        if not new_tree_ids:
+            return
+
+        checksums = dict(
+            Terms.objects.filter(tree__in=new_tree_ids).values_list('tree', 'checksum')
+        )
+        self._required.update({tree_id: False for tree_id in new_tree_ids})
+        self._required.update(self._check(checksums))
+
+    def is_required(self, tree: Tree) -> bool:
+        """Return whether the user must agree to terms of use before accessing the tree."""
+        if tree.pk not in self._required:
+            self.prefetch([tree])
+        return self._required[tree.pk]
+
+    def has_agreed(self, terms: Terms) -> bool:
+        """Return whether the user has agreed to the current version of some terms."""
+        return not self._check({terms.tree_id: terms.checksum})[terms.tree_id]
+
+
+@receiver(post_save, sender=TermsAgreement)
+def _terms_agreement_post_save(sender: Type[TermsAgreement], instance: TermsAgreement, **kwargs):
+    cache.set(
+        _agreement_cache_key(instance.user_id, instance.terms_id),
+        instance.checksum,
+        settings.DKC_TERMS_AGREEMENT_CACHE_SECONDS,
+    )
+
+
+@receiver(post_delete, sender=TermsAgreement)
+def _terms_agreement_post_delete(sender: Type[TermsAgreement], instance: TermsAgreement, **kwargs):
+    cache.delete(_agreement_cache_key(instance.user_id, instance.terms_id))
@@ -1,21 +1,12 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Dict, List, Set, Type
+from typing import TYPE_CHECKING, Dict, Iterable, List, Set, Tuple, Type
 
-from django.contrib.auth.models import Group, User
+from django.contrib.auth.models import Permission as AuthPermission, User
 from django.contrib.contenttypes.models import ContentType
 from django.db import models, transaction
-from django.dispatch import receiver
-from guardian.models import GroupObjectPermission, UserObjectPermission
-from guardian.shortcuts import (
-    assign_perm,
-    get_group_perms,
-    get_groups_with_perms,
-    get_objects_for_user,
-    get_user_perms,
-    get_users_with_perms,
-    remove_perm,
-)
+from guardian.models import GroupObjectPermissionBase, UserObjectPermissionBase
+from guardian.shortcuts import get_groups_with_perms, get_users_with_perms
 from guardian.utils import get_identity
 
 from dkc.core.permissions import Permission, PermissionGrant
@@ -47,11 +38,33 @@ class Tree(models.Model):
         This method is called by the access control filter backend to limit the
         root folders returned to those the logged in user has read access to.
         """
-        perms = permission.associated_permissions
-        query = get_objects_for_user(user, perms, klass=queryset, any_perm=True)
+        from .effective_permission import EffectivePermission
+
+        if user.is_superuser:
+            return queryset
+        if user.is_anonymous:
+            return queryset.filter(cls.anonymous_filter(permission))
+
+        accessible = models.Q(
+            pk__in=EffectivePermission.objects.filter(
+                user=user, level__gte=permission.level
+            ).values('tree')
+        )
         if permission == Permission.read:
-            query = query.union(queryset.filter(public=True))
-        return query
+            accessible |= models.Q(public=True)
+        return queryset.filter(accessible)
+
+    @staticmethod
+    def anonymous_filter(permission: Permission, prefix: str = '') -> models.Q:
+        """Return a filter for the trees which anonymous users can access.
+
+        The ``prefix`` is the lookup path from the filtered model to its tree, so related models
+        can be filtered with a direct join, rather than a subquery of all accessible trees.
+        """
+        if permission != Permission.read:
+            # Matches nothing, without querying the database
+            return models.Q(pk__in=[])
+        return models.Q(**{f'{prefix}public': True})
 
     def list_granted_permissions(self) -> List[PermissionGrant]:
         """Return a list of all permission grants associated with a tree."""
@@ -74,81 +87,152 @@ class Tree(models.Model):
         """Return whether the given user has a specific permission for the tree."""
         if permission == Permission.read and self.public:
             return True
-        return any(user.has_perm(perm, self) for perm in permission.associated_permissions)
+        if user.is_anonymous or not user.is_active:
+            return False
+        if user.is_superuser:
+            return True
 
-    def _get_group_permissions(self, group: Group) -> Set[Permission]:
-        permission_strings = {p.value for p in Permission}
-        group_perms = get_group_perms(group, self)
-        return {Permission(p) for p in group_perms if p in permission_strings}
+        from .effective_permission import EffectivePermission
 
-    def _get_user_permissions(self, user: User) -> Set[Permission]:
-        permission_strings = {p.value for p in Permission}
-        user_perms = get_user_perms(user, self)
-        return {Permission(p) for p in user_perms if p in permission_strings}
+        return EffectivePermission.get_levels(user, [self.pk])[self.pk] >= permission.level
+
+    @classmethod
+    def _permission_ids(cls) -> Dict[Permission, int]:
+        permissions = AuthPermission.objects.filter(
+            content_type=ContentType.objects.get_for_model(cls),
+            codename__in=[permission.value for permission in Permission],
+        ).values_list('codename', 'pk')
+        return {Permission(codename): pk for codename, pk in permissions}
 
+    @staticmethod
+    def _apply_grants(
+        model: Type[models.Model],
+        principal_field: str,
+        tree_ids: List[int],
+        granted: Dict[int, int],
+        permission_ids: Iterable[int],
+        replace: bool,
+    ) -> Set[int]:
+        """Apply grants of one kind of principal, and return all principals that were changed."""
+        existing = model.objects.filter(content_object__in=tree_ids, permission__in=permission_ids)
+        if not replace:
+            existing = existing.filter(**{f'{principal_field}__in': granted.keys()})
+
+        present: Set[Tuple[int, int]] = set()
+        stale: List[int] = []
+        changed: Set[int] = set()
+        for pk, tree_id, principal_id, permission_id in existing.values_list(
+            'pk', 'content_object', principal_field, 'permission'
+        ):
+            if granted.get(principal_id) == permission_id:
+                present.add((tree_id, principal_id))
+            else:
+                stale.append(pk)
+                changed.add(principal_id)
+
+        if stale:
+            model.objects.filter(pk__in=stale).delete()
+
+        missing = [
+            model(
+                content_object_id=tree_id,
+                permission_id=permission_id,
+                **{f'{principal_field}_id': principal_id},
+            )
+            for tree_id in tree_ids
+            for principal_id, permission_id in granted.items()
+            if (tree_id, principal_id) not in present
+        ]
+        model.objects.bulk_create(missing)
+        changed.update(getattr(row, f'{principal_field}_id') for row in missing)
+        return changed
+
+    @classmethod
     @transaction.atomic
-    def grant_permission(self, grant: PermissionGrant) -> None:
-        """Activate a specific permission grant.
+    def apply_permission_list(
+        cls, trees: Iterable[Tree], grants: List[PermissionGrant], replace: bool = False
+    ) -> None:
+        """Apply a list of permission grants to many trees, with a constant number of queries.
 
-        Applies a user or group permission to the current entity.  This
-        is a wrapper around the django-guardian shortcut "assign_perm", but also contains
-        logic to remove other permissions that had previously existed on the entity.
+        Each user or group is left with exactly the permission it is granted, replacing any
+        other permission it previously had on the tree; if it is granted more than once, the
+        last grant applies. If ``replace`` is set, any other users and groups lose their
+        permissions, so the list becomes the full access control list of every tree.
         """
-        # Get a list of prior existing permissions.
-        user, group = get_identity(grant.user_or_group)
-        if user:
-            existing_permissions = self._get_user_permissions(grant.user_or_group)
-        else:
-            existing_permissions = self._get_group_permissions(grant.user_or_group)
+        from .effective_permission import EffectivePermission
 
-        # Assign the permission if it doesn't already exist.
-        if grant.permission in existing_permissions:
-            existing_permissions.remove(grant.permission)
-        else:
-            assign_perm(grant.permission.value, grant.user_or_group, self)
+        tree_ids = [tree.pk for tree in trees]
+        permission_ids = cls._permission_ids()
 
-        # Remove any extra permissions on the object that existed prior.
-        # In the case where the permission already existed, this is
-        # expected to be a no-op, but it will clean up any inconsistencies
-        # that happen to exist.
-        for permission in existing_permissions:
-            remove_perm(permission.value, grant.user_or_group, self)
+        granted_users: Dict[int, int] = {}
+        granted_groups: Dict[int, int] = {}
+        for grant in grants:
+            user, group = get_identity(grant.user_or_group)
+            if user:
+                granted_users[user.pk] = permission_ids[grant.permission]
+            else:
+                granted_groups[group.pk] = permission_ids[grant.permission]
+
+        # Signals will be sent for deletions, but not for bulk creations
+        with EffectivePermission.deferred_refresh():
+            changed_users = cls._apply_grants(
+                TreeUserObjectPermission,
+                'user',
+                tree_ids,
+                granted_users,
+                permission_ids.values(),
+                replace,
+            )
+            changed_groups = cls._apply_grants(
+                TreeGroupObjectPermission,
+                'group',
+                tree_ids,
+                granted_groups,
+                permission_ids.values(),
+                replace,
+            )
+            EffectivePermission.schedule_refresh(tree_ids, changed_users, changed_groups)
+
+    def grant_permission(self, grant: PermissionGrant) -> None:
+        """Activate a specific permission grant.
+
+        Applies a user or group permission to the current entity, removing any other
+        permission that the user or group previously had on it.
+        """
+        self.grant_permission_list([grant])
 
     def remove_permission(self, grant: PermissionGrant) -> None:
-        remove_perm(grant.permission.value, grant.user_or_group, self)
+        self.remove_permission_list([grant])
 
-    @transaction.atomic
     def grant_permission_list(self, grants: List[PermissionGrant]):
         """Apply a list of permission grants in a transaction."""
-        for grant in grants:
-            self.grant_permission(grant)
+        Tree.apply_permission_list([self], grants)
 
     @transaction.atomic
     def remove_permission_list(self, grants: List[PermissionGrant]):
         """Remove a list of permission grants in a transaction."""
+        from .effective_permission import EffectivePermission
+
+        user_filter = models.Q(pk__in=[])
+        group_filter = models.Q(pk__in=[])
         for grant in grants:
-            self.remove_permission(grant)
+            user, group = get_identity(grant.user_or_group)
+            if user:
+                user_filter |= models.Q(user=user, permission__codename=grant.permission.value)
+            else:
+                group_filter |= models.Q(group=group, permission__codename=grant.permission.value)
+
+        with EffectivePermission.deferred_refresh():
+            TreeUserObjectPermission.objects.filter(user_filter, content_object=self).delete()
+            TreeGroupObjectPermission.objects.filter(group_filter, content_object=self).delete()
 
-    @transaction.atomic
     def set_permission_list(self, grants: List[PermissionGrant]):
         """Set the full access control list in a transaction."""
-        self.grant_permission_list(grants)
-
-        grant_set = set(grants)
-        existing_grant_set = set(self.list_granted_permissions())
-        self.remove_permission_list(list(existing_grant_set - grant_set))
+        Tree.apply_permission_list([self], grants, replace=True)
 
     def get_access(self, user: User) -> Dict[str, bool]:
         """Return the permissions that the given user has on this entity."""
-        if user.is_anonymous:
-            # This is a special case for the anonymous user.  Access can only
-            # be 'read', and only for public trees.
-            access = {p.name: False for p in Permission}
-            access['read'] = self.public
-            return access
-        # This could be optimized to reduce multiple queries... e.g.
-        # admin access implies read access.
-        return {p.name: self.has_permission(user, p) for p in Permission}
+        return TreeAccessChecker(user).get_access(self)
 
     class Meta:
         permissions = (
@@ -156,14 +240,57 @@ class Tree(models.Model):
             (Permission.write.value, 'Write access to a tree'),
             (Permission.admin.value, 'Admin access to a tree'),
         )
+        indexes = [
+            # Public trees are few, and are all that anonymous users can access
+            models.Index(fields=['id'], condition=models.Q(public=True), name='tree_public_idx'),
+        ]
+
+
+class TreeAccessChecker:
+    """
+    Compute a user's access to many trees, with a constant number of queries.
+
+    Access is memoized per tree, so a single instance should be shared for the duration of a
+    request, but not beyond it.
+    """
+
+    def __init__(self, user: User) -> None:
+        self.user = user
+        self._access: Dict[int, Dict[str, bool]] = {}
+
+    def prefetch(self, trees: Iterable[Tree]) -> None:
+        """Compute access to all the given trees at once."""
+        from .effective_permission import EffectivePermission
+
+        new_trees = {tree.pk: tree for tree in trees if tree.pk not in self._access}
+        if not new_trees:
+            return
+
+        # Anonymous and inactive users can only have access to public trees
+        if self.user.is_anonymous or not self.user.is_active:
+            levels = {}
+        elif self.user.is_superuser:
+            levels = {pk: Permission.admin.level for pk in new_trees}
+        else:
+            levels = EffectivePermission.get_levels(self.user, new_trees.keys())
+
+        for pk, tree in new_trees.items():
+            level = levels.get(pk, 0)
+            access = {permission.name: level >= permission.level for permission in Permission}
+            access[Permission.read.name] |= tree.public
+            self._access[pk] = access
+
+    def get_access(self, tree: Tree) -> Dict[str, bool]:
+        if tree.pk not in self._access:
+            self.prefetch([tree])
+        return self._access[tree.pk]
+
+
+# Direct foreign key permission models, which guardian uses automatically for trees. Unlike the
+# generic permission models, these can be joined by integer keys, and are cascade deleted.
+class TreeUserObjectPermission(UserObjectPermissionBase):
+    content_object = models.ForeignKey(Tree, on_delete=models.CASCADE)
 
 
-@receiver(models.signals.post_delete, sender=Tree)
-def _tree_post_delete(sender: Type[Tree], instance: Tree, **kwargs):
-    """Remove all permissions pointing at a deleted tree."""
-    filters = models.Q(
-        content_type=ContentType.objects.get_for_model(instance),
-        object_pk=instance.pk,
-    )
-    UserObjectPermission.objects.filter(filters).delete()
-    GroupObjectPermission.objects.filter(filters).delete()
+class TreeGroupObjectPermission(GroupObjectPermissionBase):
+    content_object = models.ForeignKey(Tree, on_delete=models.CASCADE)
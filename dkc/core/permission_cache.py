@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.db import connection
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'dkc_tree_permissions'
+# Postgres rejects notification payloads of 8000 bytes or more
+MAX_PAYLOAD_LENGTH = 7999
+# Don't attempt to reconnect a failed listener more often than this
+RECONNECT_SECONDS = 10
+
+
+class PermissionCache:
+    """
+    A per-process LRU cache of users' permission levels on trees.
+
+    Whenever the permissions on a tree change, a Postgres notification is sent, and every
+    process drains its pending notifications before each lookup, invalidating the affected
+    trees. If notifications can't be received, nothing is cached.
+
+    Values are only stored when they were read outside of any transaction, so they are always
+    committed state. A value read concurrently with an invalidation is discarded.
+    """
+
+    def __init__(self, max_trees: int) -> None:
+        self.max_trees = max_trees
+        # Tree id -> user id -> level
+        self._trees: OrderedDict[int, Dict[int, int]] = OrderedDict()
+        # Incremented by every invalidation
+        self._generation = 0
+        self._listener = None
+        self._listener_pid: Optional[int] = None
+        self._retry_at = 0.0
+        self._lock = threading.RLock()
+
+    def _clear(self) -> None:
+        self._trees.clear()
+        self._generation += 1
+
+    def invalidate(self, tree_ids: Optional[Iterable[int]] = None) -> None:
+        """Invalidate the given trees, or every tree if none are given."""
+        with self._lock:
+            if tree_ids is None:
+                self._clear()
+                return
+            for tree_id in tree_ids:
+                self._trees.pop(tree_id, None)
+            self._generation += 1
+
+    def _listen(self) -> bool:
+        # A listener connection can't be shared with a forked process
+        if self._listener is not None and self._listener_pid == os.getpid():
+            return True
+        self._listener = None
+        if time.monotonic() < self._retry_at:
+            return False
+
+        try:
+            listener = psycopg2.connect(**connection.get_connection_params())
+            listener.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+            with listener.cursor() as cursor:
+                cursor.execute(f'LISTEN {CHANNEL}')
+        except psycopg2.Error:
+            logger.exception('Failed to listen for permission changes')
+            self._retry_at = time.monotonic() + RECONNECT_SECONDS
+            return False
+
+        # Anything cached before now may have missed notifications
+        self._clear()
+        self._listener = listener
+        self._listener_pid = os.getpid()
+        return True
+
+    def _drain(self) -> bool:
+        """Apply all pending invalidations, and return whether the cache may be used."""
+        if self.max_trees <= 0 or connection.vendor != 'postgresql' or not self._listen():
+            return False
+
+        try:
+            self._listener.poll()
+        except psycopg2.Error:
+            logger.exception('Lost the connection listening for permission changes')
+            self._listener = None
+            self._clear()
+            return False
+
+        while self._listener.notifies:
+            payload = self._listener.notifies.pop().payload
+            self.invalidate(None if payload == '*' else map(int, payload.split(',')))
+        return True
+
+    def get_levels(
+        self,
+        user_id: int,
+        tree_ids: Iterable[int],
+        load: Callable[[List[int]], Dict[int, int]],
+    ) -> Dict[int, int]:
+        """
+        Get the user's permission level on each tree, or 0 if the user has no permission.
+
+        Any levels which aren't cached are fetched by calling ``load`` with the missing tree ids.
+        """
+        levels: Dict[int, int] = {}
+        missing: List[int] = []
+        with self._lock:
+            enabled = self._drain()
+            generation = self._generation
+            for tree_id in tree_ids:
+                users = self._trees.get(tree_id) if enabled else None
+                if users is not None and user_id in users:
+                    levels[tree_id] = users[user_id]
+                    self._trees.move_to_end(tree_id)
+                else:
+                    missing.append(tree_id)
+
+        if not missing:
+            return levels
+
+        loaded = load(missing)
+        for tree_id in missing:
+            levels[tree_id] = loaded.get(tree_id, 0)
+
+        # Within a transaction, uncommitted state may have been read
+        if enabled and not connection.in_atomic_block:
+            with self._lock:
+                self._drain()
+                if self._generation == generation:
+                    for tree_id in missing:
+                        self._trees.setdefault(tree_id, {})[user_id] = levels[tree_id]
+                        self._trees.move_to_end(tree_id)
+                    while len(self._trees) > self.max_trees:
+                        self._trees.popitem(last=False)
+        return levels
+
+
+def notify_permissions_changed(tree_ids: Iterable[int]) -> None:
+    """Invalidate the cached permissions of the given trees, in every process."""
+    tree_ids = list(tree_ids)
+    if not tree_ids:
+        return
+    # Immediately invalidate this process, which must see its own uncommitted changes
+    permission_cache.invalidate(tree_ids)
+    if connection.vendor != 'postgresql':
+        return
+
+    payload = ','.join(str(tree_id) for tree_id in tree_ids)
+    if len(payload) > MAX_PAYLOAD_LENGTH:
+        payload = '*'
+    # Notifications are only delivered once the current transaction commits
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_notify(%s, %s)', [CHANNEL, payload])
+
+
+permission_cache = PermissionCache(settings.DKC_PERMISSION_CACHE_TREES)
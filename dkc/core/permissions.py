@@ -57,6 +57,11 @@ class Permission(Enum):
             perms += [Permission.admin.value]
         return perms
 
+    @property
+    def level(self) -> int:
+        """Return an integer rank of this permission, which implies all lower-ranked ones."""
+        return list(Permission).index(self) + 1
+
 
 @dataclass(frozen=True)
 class PermissionGrant:
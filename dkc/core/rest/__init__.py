@@ -1,6 +1,13 @@
+from .access import AccessViewSet
 from .authorized_upload import AuthorizedUploadViewSet
 from .file import FileViewSet
 from .folder import FolderViewSet
 from .user import UserViewSet
 
-__all__ = ['AuthorizedUploadViewSet', 'FileViewSet', 'FolderViewSet', 'UserViewSet']
+__all__ = [
+    'AccessViewSet',
+    'AuthorizedUploadViewSet',
+    'FileViewSet',
+    'FolderViewSet',
+    'UserViewSet',
+]
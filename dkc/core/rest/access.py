@@ -0,0 +1,71 @@
+from typing import Dict
+
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import serializers
+from rest_framework.decorators import action
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.viewsets import ViewSet
+
+from dkc.core.models import File, Folder, Tree
+from dkc.core.models.tree import TreeAccessChecker
+
+
+class AccessCheckSerializer(serializers.Serializer):
+    folders = serializers.ListField(child=serializers.IntegerField(), default=list)
+    files = serializers.ListField(child=serializers.IntegerField(), default=list)
+
+
+class AccessMapSerializer(serializers.Serializer):
+    folders = serializers.DictField(
+        child=serializers.DictField(child=serializers.BooleanField()),
+        help_text='The access to each readable folder, by id.',
+    )
+    files = serializers.DictField(
+        child=serializers.DictField(child=serializers.BooleanField()),
+        help_text='The access to each readable file, by id.',
+    )
+
+
+class AccessViewSet(ViewSet):
+    permission_classes = [AllowAny]
+
+    @swagger_auto_schema(
+        request_body=AccessCheckSerializer,
+        responses={200: AccessMapSerializer},
+    )
+    @action(detail=False, methods=['post'])
+    def check(self, request):
+        """
+        Retrieve your access to many folders and files at once.
+
+        Ids which do not exist, or which you cannot read, are omitted from the response.
+        """
+        serializer = AccessCheckSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        folder_trees: Dict[int, int] = dict(
+            Folder.objects.filter(pk__in=serializer.validated_data['folders']).values_list(
+                'pk', 'tree'
+            )
+        )
+        file_trees: Dict[int, int] = dict(
+            File.objects.filter(pk__in=serializer.validated_data['files']).values_list(
+                'pk', 'folder__tree'
+            )
+        )
+
+        # Access is determined per tree, so each tree is only checked once
+        trees = Tree.objects.in_bulk({*folder_trees.values(), *file_trees.values()})
+        access_checker = TreeAccessChecker(request.user)
+        access_checker.prefetch(trees.values())
+
+        def access_map(object_trees: Dict[int, int]) -> Dict[int, Dict[str, bool]]:
+            readable = {}
+            for pk, tree_id in object_trees.items():
+                access = access_checker.get_access(trees[tree_id])
+                if access['read']:
+                    readable[pk] = access
+            return readable
+
+        return Response({'folders': access_map(folder_trees), 'files': access_map(file_trees)})
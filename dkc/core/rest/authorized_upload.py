@@ -2,8 +2,6 @@ import logging
 
 from django.conf import settings
 from django.core import signing
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import mixins, serializers
 from rest_framework.decorators import action
@@ -14,8 +12,9 @@ from rest_framework.response import Response
 from rest_framework.views import View
 from rest_framework.viewsets import GenericViewSet
 
-from dkc.core.models import AuthorizedUpload
+from dkc.core.models import AuthorizedUpload, AuthorizedUploadNotification
 from dkc.core.permissions import Permission
+from dkc.core.tasks import send_upload_notifications
 
 
 class AuthorizedUploadSerializer(serializers.ModelSerializer):
@@ -75,17 +74,12 @@ class AuthorizedUploadViewSet(mixins.DestroyModelMixin, GenericViewSet):
             logger.warning('Authorized upload signature tampering detected.')
             raise PermissionDenied('Invalid authorization signature.')
 
-        context = {
-            'folder': upload.folder,
-            'folder_url': f'{settings.DKC_SPA_URL}#/folders/{upload.folder.id}',
-        }
-
-        send_mail(
-            subject='Authorized upload complete',
-            message=render_to_string('email/authorized_upload_complete.txt', context),
-            html_message=render_to_string('email/authorized_upload_complete.html', context),
-            from_email=None,
-            recipient_list=[upload.creator.email],
+        AuthorizedUploadNotification.objects.create(
+            creator_id=upload.creator_id, folder_id=upload.folder_id
+        )
+        # Wait for other completions, so they can be notified together
+        send_upload_notifications.apply_async(
+            args=[upload.creator_id], countdown=settings.DKC_UPLOAD_NOTIFICATION_DELAY_SECONDS
         )
 
         upload.delete()
@@ -1,3 +1,4 @@
+import hashlib
 import logging
 from typing import Dict
 
@@ -17,12 +18,15 @@ from rest_framework.views import View
 from rest_framework.viewsets import ModelViewSet
 
 from dkc.core.exceptions import QuotaLimitedError
-from dkc.core.models import AuthorizedUpload, File, Folder
+from dkc.core.hash_filter import known_checksums
+from dkc.core.models import AuthorizedUpload, ChecksumRequest, File, Folder
+from dkc.core.models.file import CHECKSUM_ALGORITHMS
+from dkc.core.models.tree import Tree, TreeAccessChecker
 from dkc.core.permissions import HasAccess, Permission, PermissionFilterBackend
-from dkc.core.tasks import file_compute_sha512
+from dkc.core.tasks import compute_pending_checksums
 
 from .filtering import ActionSpecificFilterBackend
-from .utils import FormattableDict
+from .utils import AccessListSerializer, FormattableDict
 
 
 class FileSerializer(serializers.ModelSerializer):
@@ -36,6 +40,8 @@ class FileSerializer(serializers.ModelSerializer):
             'description',
             'size',
             'content_type',
+            'md5',
+            'sha256',
             'sha512',
             'folder',
             'creator',
@@ -49,6 +55,7 @@ class FileSerializer(serializers.ModelSerializer):
         read_only_fields = [
             'creator',
         ]
+        list_serializer_class = AccessListSerializer
         # ModelSerializer cannot auto-generate validators for model-level constraints
         validators = [
             serializers.UniqueTogetherValidator(
@@ -58,8 +65,11 @@ class FileSerializer(serializers.ModelSerializer):
             ),
         ]
 
+    def get_tree(self, file: File) -> Tree:
+        return file.folder.tree
+
     def get_access(self, file: File) -> Dict[str, bool]:
-        return file.folder.tree.get_access(self.context['user'])
+        return self.context['access_checker'].get_access(self.get_tree(file))
 
     authorization = serializers.CharField(write_only=True, required=False)
 
@@ -101,7 +111,32 @@ class FileUpdateSerializer(FileSerializer):
 
 
 class HashDownloadSerializer(serializers.Serializer):
-    sha512 = serializers.CharField(min_length=128, max_length=128)
+    algorithm = serializers.ChoiceField(CHECKSUM_ALGORITHMS, default='sha512')
+    hash = serializers.RegexField(r'^[0-9a-fA-F]+$', required=False)
+    # Deprecated, equivalent to "algorithm=sha512&hash=..."
+    sha512 = serializers.RegexField(r'^[0-9a-fA-F]{128}$', required=False)
+
+    def to_internal_value(self, data):
+        # Clients such as CMake's ExternalData use uppercase algorithm names
+        if 'algorithm' in data:
+            data = data.copy()
+            data['algorithm'] = data['algorithm'].lower()
+        return super().to_internal_value(data)
+
+    def validate(self, attrs):
+        if 'sha512' in attrs:
+            attrs['algorithm'] = 'sha512'
+            attrs['hash'] = attrs.pop('sha512')
+        if 'hash' not in attrs:
+            raise serializers.ValidationError({'hash': 'This field is required.'})
+
+        length = hashlib.new(attrs['algorithm']).digest_size * 2
+        if len(attrs['hash']) != length:
+            raise serializers.ValidationError(
+                {'hash': f'Must be {length} characters for {attrs["algorithm"]}.'}
+            )
+        attrs['hash'] = attrs['hash'].lower()
+        return attrs
 
 
 class CreateWithAuthorizedUpload(BasePermission):
@@ -122,7 +157,7 @@ class FileViewSet(ModelViewSet):
     permission_classes = [HasAccess | CreateWithAuthorizedUpload]
 
     filter_backends = [PermissionFilterBackend, ActionSpecificFilterBackend]
-    filterset_fields = ['folder', 'sha512', 'name']
+    filterset_fields = ['folder', 'md5', 'sha256', 'sha512', 'name']
 
     def get_serializer_class(self):
         if self.action in ['update', 'partial_update']:
@@ -132,6 +167,10 @@ class FileViewSet(ModelViewSet):
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context['user'] = self.request.user
+        # Share memoized access across all serializers for this request
+        if not hasattr(self, '_access_checker'):
+            self._access_checker = TreeAccessChecker(self.request.user)
+        context['access_checker'] = self._access_checker
         return context
 
     def _validate_authorized_upload(self, authorization: str, folder: Folder) -> User:
@@ -183,7 +222,7 @@ class FileViewSet(ModelViewSet):
         if 'blob' in serializer.validated_data:
             with transaction.atomic():
                 # We lock this file row in order to make sure `blob` can only be set once.
-                # This ensures that we launch at most one `file_compute_sha512` async jobs.
+                # This ensures that we request at most one checksum computation.
                 # If we didn't have atomicity on this operation, it would be possible to
                 # create a race condition between async hashing jobs that could cause a
                 # mismatch between the blob and the checksum. Aside from security implications,
@@ -194,9 +233,11 @@ class FileViewSet(ModelViewSet):
                         {'blob': ["A file's blob may only be set once."]}
                     )
 
+                # This commits the quota reserved by the pending file, so it no longer expires
                 serializer.save()
+                ChecksumRequest.enqueue(File.objects.filter(pk=file.pk))
 
-            file_compute_sha512.delay(file.pk)
+            compute_pending_checksums.delay()
         else:
             serializer.save()
 
@@ -227,8 +268,14 @@ class FileViewSet(ModelViewSet):
         """Download a file based on the hash of its contents."""
         serializer = HashDownloadSerializer(data=request.query_params)
         serializer.is_valid(raise_exception=True)
-        sha512 = serializer.validated_data['sha512'].lower()
-        qs = File.objects.filter(sha512=sha512).only('blob').order_by()
+        algorithm = serializer.validated_data['algorithm']
+        digest = serializer.validated_data['hash']
+        # Most requests are from clients trying several mirrors, so cheaply rule out unknown hashes
+        if not known_checksums[algorithm].might_contain(digest):
+            return Response(status=404)
+
+        # Files pending migration have legacy checksums, but no blob yet
+        qs = File.objects.filter(**{algorithm: digest}).exclude(blob='').only('blob').order_by()
         qs = File.filter_by_permission(request.user, Permission.read, qs)
 
         file = qs.first()
@@ -1,8 +1,8 @@
-from typing import Dict
+from typing import Dict, Optional, Tuple, Union
 
 from django.contrib.auth.models import Group, User
 from django.core.exceptions import PermissionDenied
-from django.db import transaction
+from django.db import models, transaction
 from django_filters import rest_framework as filters
 from django_filters.filters import CharFilter
 from drf_yasg.utils import swagger_auto_schema
@@ -10,10 +10,21 @@ from guardian.utils import get_identity
 from rest_framework import serializers
 from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
 
-from dkc.core.models import File, Folder, Quota, Terms, TermsAgreement, Tree
+from dkc.core.models import (
+    EffectivePermission,
+    File,
+    Folder,
+    Quota,
+    Terms,
+    TermsAgreement,
+    Tree,
+)
+from dkc.core.models.terms_agreement import TermsAgreementChecker
+from dkc.core.models.tree import TreeAccessChecker
 from dkc.core.permissions import (
     HasAccess,
     IsAdmin,
@@ -25,12 +36,13 @@ from dkc.core.permissions import (
 from dkc.core.tasks import delete_folder
 
 from .filtering import ActionSpecificFilterBackend, IntegerOrNullFilter
-from .utils import FormattableDict
+from .utils import AccessListSerializer, FormattableDict
 
 
 class FolderSerializer(serializers.ModelSerializer):
     public: bool = serializers.BooleanField(read_only=True)
     access: Dict[str, bool] = serializers.SerializerMethodField()
+    terms_required: bool = serializers.SerializerMethodField()
 
     class Meta:
         model = Folder
@@ -45,11 +57,13 @@ class FolderSerializer(serializers.ModelSerializer):
             'modified',
             'public',
             'access',
+            'terms_required',
             'user_metadata',
         ]
         read_only_fields = [
             'creator',
         ]
+        list_serializer_class = AccessListSerializer
         # ModelSerializer cannot auto-generate validators for model-level constraints
         validators = [
             serializers.UniqueTogetherValidator(
@@ -61,8 +75,14 @@ class FolderSerializer(serializers.ModelSerializer):
             # and do not need to be enforced as validators
         ]
 
+    def get_tree(self, folder: Folder) -> Tree:
+        return folder.tree
+
     def get_access(self, folder: Folder) -> Dict[str, bool]:
-        return folder.tree.get_access(self.context['user'])
+        return self.context['access_checker'].get_access(self.get_tree(folder))
+
+    def get_terms_required(self, folder: Folder) -> bool:
+        return self.context['terms_checker'].is_required(self.get_tree(folder))
 
     def validate(self, attrs):
         self._validate_unique_root_name(attrs)
@@ -127,17 +147,42 @@ class FoldersFilterSet(filters.FilterSet):
     name = CharFilter()
 
 
+class FolderPermissionGrantListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        # Resolve all users and groups at once, instead of with a query per grant
+        if isinstance(data, list):
+            names = {'user': set(), 'group': set()}
+            for item in data:
+                if isinstance(item, dict) and item.get('model') in names:
+                    names[item['model']].add(item.get('name'))
+            users = User.objects.in_bulk(names['user'], field_name='username')
+            groups = Group.objects.in_bulk(names['group'], field_name='name')
+            self.child.principals = {
+                **{('user', name): user for name, user in users.items()},
+                **{('group', name): group for name, group in groups.items()},
+            }
+        return super().to_internal_value(data)
+
+
 class FolderPermissionGrantSerializer(serializers.Serializer):
     name = serializers.CharField(required=True)
     model = serializers.ChoiceField(['user', 'group'], required=True)
     permission = serializers.ChoiceField([p.name for p in Permission], required=True)
 
+    # Users and groups which were already resolved by the list serializer
+    principals: Optional[Dict[Tuple[str, str], Union[User, Group]]] = None
+
+    class Meta:
+        list_serializer_class = FolderPermissionGrantListSerializer
+
     def _load_user_or_group(self, data):
         if isinstance(data, PermissionGrant):
             return data.user_or_group
 
         model = data.get('model')
         name = data.get('name')
+        if self.principals is not None:
+            return self.principals.get((model, name))
         if model == 'user':
             return User.objects.filter(username=name).first()
         return Group.objects.filter(name=name).first()
@@ -169,6 +214,11 @@ class FolderPermissionGrantSerializer(serializers.Serializer):
         return data
 
 
+class FolderBulkPermissionSerializer(serializers.Serializer):
+    folders = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+    permissions = FolderPermissionGrantSerializer(many=True)
+
+
 class FolderPublicSerializer(serializers.Serializer):
     public = serializers.BooleanField()
 
@@ -190,6 +240,12 @@ class FolderViewSet(ModelViewSet):
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context['user'] = self.request.user
+        # Share memoized access across all serializers for this request
+        if not hasattr(self, '_access_checker'):
+            self._access_checker = TreeAccessChecker(self.request.user)
+            self._terms_checker = TermsAgreementChecker(self.request.user)
+        context['access_checker'] = self._access_checker
+        context['terms_checker'] = self._terms_checker
         return context
 
     # Atomically roll back the tree creation if folder creation fails
@@ -221,9 +277,40 @@ class FolderViewSet(ModelViewSet):
         folder = self.get_object()
         # Start with the root folder
         ancestors = folder.ancestors[::-1]
+        # All ancestors share the same tree, so avoid fetching it again for each one
+        for ancestor in ancestors:
+            ancestor.tree = folder.tree
         serializer = self.get_serializer(ancestors, many=True)
         return Response(serializer.data)
 
+    def _list_roots(self, queryset: models.QuerySet[Folder]):
+        page = self.paginate_queryset(queryset.filter(parent=None).select_related('tree'))
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @swagger_auto_schema(responses={200: FolderSerializer(many=True)})
+    @action(detail=False, url_path='roots/owned', permission_classes=[IsAuthenticated])
+    def owned_roots(self, request):
+        """List the root folders which you created, and can still access."""
+        user: User = request.user
+        return self._list_roots(
+            Folder.filter_by_permission(user, Permission.read, Folder.objects.filter(creator=user))
+        )
+
+    @swagger_auto_schema(responses={200: FolderSerializer(many=True)})
+    @action(detail=False, url_path='roots/shared', permission_classes=[IsAuthenticated])
+    def shared_roots(self, request):
+        """List the root folders created by others, which you were granted access to."""
+        user: User = request.user
+        granted_trees = EffectivePermission.objects.filter(user=user).values('tree')
+        return self._list_roots(Folder.objects.filter(tree__in=granted_trees).exclude(creator=user))
+
+    @swagger_auto_schema(responses={200: FolderSerializer(many=True)})
+    @action(detail=False, url_path='roots/public')
+    def public_roots(self, request):
+        """List the root folders which anyone can read."""
+        return self._list_roots(Folder.objects.filter(tree__public=True))
+
     @swagger_auto_schema(responses={200: QuotaSerializer})
     @action(detail=True, queryset=Folder.objects.select_related('tree__quota'))
     def quota(self, request, pk=None):
@@ -267,15 +354,8 @@ class FolderViewSet(ModelViewSet):
         except Terms.DoesNotExist:
             return Response(status=204)  # No terms for the folder
 
-        user = request.user
-
-        if not request.user.is_anonymous:
-            try:
-                TermsAgreement.objects.get(terms=terms, user=user, checksum=terms.checksum)
-            except TermsAgreement.DoesNotExist:
-                pass
-            else:
-                return Response(status=204)  # User has already agreed
+        if TermsAgreementChecker(request.user).has_agreed(terms):
+            return Response(status=204)  # User has already agreed
 
         serializer = TermsSerializer(terms)
         return Response(serializer.data)
@@ -371,6 +451,44 @@ class FolderViewSet(ModelViewSet):
         serializer = FolderPermissionGrantSerializer(grants, many=True)
         return Response(serializer.data)
 
+    @swagger_auto_schema(
+        methods=['put', 'patch'],
+        operation_description=(
+            'Apply user or group permissions to many folders at once. '
+            'PUT removes any permissions not explicitly passed, while PATCH keeps them.'
+        ),
+        request_body=FolderBulkPermissionSerializer,
+        responses={204: 'The permissions were applied to every folder.'},
+    )
+    @action(
+        detail=False,
+        methods=['put', 'patch'],
+        url_path='permissions',
+        permission_classes=[IsAuthenticated],
+    )
+    def bulk_permissions(self, request):
+        serializer = FolderBulkPermissionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        folder_ids = serializer.validated_data['folders']
+
+        folders = Folder.objects.select_related('tree').in_bulk(folder_ids)
+        missing = sorted(set(folder_ids) - folders.keys())
+        if missing:
+            raise ValidationError({'folders': f'Invalid folder ids: {missing}'})
+
+        trees = {folder.tree_id: folder.tree for folder in folders.values()}.values()
+        access_checker = TreeAccessChecker(request.user)
+        access_checker.prefetch(trees)
+        if not all(access_checker.get_access(tree)[Permission.admin.name] for tree in trees):
+            raise PermissionDenied()
+
+        Tree.apply_permission_list(
+            trees,
+            serializer.validated_data['permissions'],
+            replace=request.method == 'PUT',
+        )
+        return Response(status=204)
+
     @swagger_auto_schema(
         operation_description='Set the public access flag',
         responses={200: FolderPublicSerializer},
@@ -1,3 +1,7 @@
+from django.db import models
+from rest_framework import serializers
+
+
 class FormattableDict(dict):
     """
     A dict with a no-op .format method.
@@ -7,3 +11,21 @@ class FormattableDict(dict):
 
     def format(self, *args, **kwargs):
         return self
+
+
+class AccessListSerializer(serializers.ListSerializer):
+    """
+    Prefetch the requesting user's access to every tree in a list, before serializing it.
+
+    The child serializer must provide a `get_tree` method, and its context must contain an
+    `access_checker`. If the context also contains a `terms_checker`, whether terms of use must
+    be agreed to is prefetched too.
+    """
+
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, models.Manager) else data)
+        trees = [self.child.get_tree(item) for item in items]
+        self.context['access_checker'].prefetch(trees)
+        if 'terms_checker' in self.context:
+            self.context['terms_checker'].prefetch(trees)
+        return super().to_representation(items)
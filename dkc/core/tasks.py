@@ -1,15 +1,221 @@
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import logging
+import random
+import smtplib
+from typing import List
+
 from celery import shared_task
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import models, transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from dkc.core.models import (
+    AuthorizedUploadNotification,
+    ChecksumRecompute,
+    ChecksumRequest,
+    File,
+    Folder,
+    StorageUsageSnapshot,
+)
+from dkc.core.models.file import CHECKSUM_ALGORITHMS
+
+logger = logging.getLogger(__name__)
+
+
+def _compute_checksums(files: List[File]) -> List[File]:
+    """Compute the checksums of files concurrently, and return the files which succeeded."""
+
+    def compute(file: File) -> bool:
+        try:
+            file.compute_checksums()
+        except Exception:
+            # Don't let one unreadable blob block the rest of the batch
+            logger.exception(f'Failed to compute checksum of file {file.pk}')
+            return False
+        return True
+
+    # Hashing releases the GIL, so threads are sufficient to use multiple cores
+    with ThreadPoolExecutor(max_workers=settings.DKC_CHECKSUM_WORKERS) as executor:
+        succeeded = list(executor.map(compute, files))
+    return [file for file, success in zip(files, succeeded) if success]
+
+
+@shared_task(queue='checksum')
+def compute_pending_checksums():
+    """Compute a batch of pending checksums, smallest files first."""
+    # Concurrent instances of this task will claim disjoint batches
+    requests = ChecksumRequest.claim(settings.DKC_CHECKSUM_BATCH_SIZE)
+    if not requests:
+        return
+
+    computed = _compute_checksums([request.file for request in requests])
+    # Files may have been deleted while they were read
+    existing = set(
+        File.objects.filter(pk__in=[file.pk for file in computed]).values_list('pk', flat=True)
+    )
+    for file in computed:
+        if file.pk in existing:
+            # Only save the checksums, to not overwrite any concurrent changes to other fields
+            file.save(update_fields=CHECKSUM_ALGORITHMS + ['sha512_verified', 'modified'])
+
+    computed_ids = {file.pk for file in computed}
+    ChecksumRequest.objects.filter(
+        pk__in=[request.pk for request in requests if request.file_id in computed_ids]
+    ).update(completed=timezone.now(), claimed=None)
+    # Failed requests keep their claim, so they are retried once it expires
+    ChecksumRequest.objects.filter(
+        pk__in=[request.pk for request in requests if request.file_id not in computed_ids]
+    ).update(failures=models.F('failures') + 1)
+
+    # Continue until the backlog is drained
+    compute_pending_checksums.delay()
+
+
+@shared_task(queue='checksum')
+def verify_legacy_checksums():
+    """
+    Verify a random sample of the checksums which were reused from the legacy instance.
+
+    Legacy checksums are trusted until verified, so this only estimates their accuracy, at a low
+    rate which doesn't compete with newly uploaded files.
+    """
+    unverified = File.objects.filter(sha512_verified=False).exclude(blob='')
+    bounds = unverified.aggregate(first=models.Min('pk'), last=models.Max('pk'))
+    if bounds['first'] is None:
+        return
 
-from dkc.core.models import File, Folder
+    files = list(
+        unverified.filter(pk__gte=random.randint(bounds['first'], bounds['last'])).order_by('pk')[
+            : settings.DKC_LEGACY_CHECKSUM_SAMPLE_SIZE
+        ]
+    )
+    legacy_checksums = {file.pk: file.sha512 for file in files}
+    # Files whose blobs couldn't be read remain unverified
+    for file in _compute_checksums(files):
+        if file.sha512 != legacy_checksums[file.pk]:
+            logger.error(f'Legacy checksum of file {file.pk} does not match its blob')
+        file.save(update_fields=CHECKSUM_ALGORITHMS + ['sha512_verified', 'modified'])
 
 
 @shared_task()
-def file_compute_sha512(file_id: int):
-    file = File.objects.get(pk=file_id)
-    file.compute_sha512()
-    file.save()
+def enqueue_checksum_recompute(recompute_id: int):
+    """Request checksums for every File selected by a ChecksumRecompute, in chunks."""
+    recompute = ChecksumRecompute.objects.get(pk=recompute_id)
+    if recompute.file_ids is not None:
+        queryset = File.objects.filter(pk__in=recompute.file_ids)
+    else:
+        # The admin enqueues this task, so it can't be imported with this module
+        from django.contrib import admin
+
+        from dkc.core.admin.file import FileAdmin
+
+        queryset = FileAdmin(File, admin.site).get_changelist_selection(recompute.changelist_params)
+    queryset = queryset.order_by()
+    recompute.total = queryset.count()
+    recompute.save(update_fields=['total'])
+
+    chunk_size = settings.DKC_CHECKSUM_ENQUEUE_CHUNK_SIZE
+    # Stream the selection with a server-side cursor, rather than loading it all at once
+    files = queryset.values_list('pk', 'size').iterator(chunk_size=chunk_size)
+    while True:
+        chunk = dict(islice(files, chunk_size))
+        if not chunk:
+            break
+        ChecksumRequest.enqueue_sizes(chunk)
+        ChecksumRecompute.objects.filter(pk=recompute_id).update(
+            enqueued=models.F('enqueued') + len(chunk)
+        )
+        # Start another chain of computation for each chunk, so that any idle workers can help
+        compute_pending_checksums.delay()
+
+    ChecksumRecompute.objects.filter(pk=recompute_id).update(completed=timezone.now())
+
+
+@shared_task()
+def expire_pending_files():
+    """Delete pending files which were never uploaded, releasing the quota they reserved."""
+    while True:
+        with transaction.atomic():
+            # Files which are concurrently having their blob set are locked, and will be skipped
+            file_ids = list(
+                File.expired_pending()
+                .order_by()
+                .select_for_update(skip_locked=True)
+                .values_list('pk', flat=True)[:1000]
+            )
+            if not file_ids:
+                return
+            deleted = File.bulk_delete(File.objects.filter(pk__in=file_ids))
+        logger.info(f'Expired {deleted} pending files')
+
+
+@shared_task()
+def take_storage_usage_snapshot():
+    StorageUsageSnapshot.take()
 
 
 @shared_task()
 def delete_folder(folder_id: int):
     Folder.objects.get(pk=folder_id).delete()
+
+
+@shared_task(
+    bind=True,
+    autoretry_for=(smtplib.SMTPException, OSError),
+    retry_backoff=True,
+    max_retries=8,
+)
+def send_upload_notifications(self, creator_id: int):
+    """Send a single email for all of a user's pending authorized upload notifications."""
+    # Retries keep the task id, so they send the notifications which were claimed at first
+    task_id = self.request.id or ''
+    with transaction.atomic():
+        notifications = list(
+            AuthorizedUploadNotification.objects.filter(creator_id=creator_id, failed=None)
+            .filter(claimed_by__in=['', task_id])
+            .select_related('creator', 'folder')
+            .select_for_update(skip_locked=True, of=('self',))
+            .order_by('created')
+        )
+        claimed = AuthorizedUploadNotification.objects.filter(
+            pk__in=[notification.pk for notification in notifications]
+        )
+        claimed.update(claimed_by=task_id)
+    if not notifications:
+        # Already sent along with an earlier notification
+        return
+
+    folders = {notification.folder_id: notification.folder for notification in notifications}
+    context = {
+        'uploads': len(notifications),
+        'folders': [
+            {
+                'abs_path': folder.abs_path,
+                'url': f'{settings.DKC_SPA_URL}#/folders/{folder.id}',
+            }
+            for folder in folders.values()
+        ],
+    }
+    # Locks are only held while claiming, so the email is sent outside of any transaction
+    try:
+        send_mail(
+            subject=(
+                'Authorized upload complete'
+                if len(folders) == 1
+                else f'{len(folders)} authorized uploads complete'
+            ),
+            message=render_to_string('email/authorized_upload_complete.txt', context),
+            html_message=render_to_string('email/authorized_upload_complete.html', context),
+            from_email=None,
+            recipient_list=[notifications[0].creator.email],
+        )
+    except (smtplib.SMTPException, OSError):
+        if self.request.retries >= self.max_retries:
+            # Keep the notifications for inspection, without sending them with any later ones
+            claimed.update(failed=timezone.now())
+        raise
+
+    claimed.delete()
@@ -26,7 +26,7 @@ def child_folder(folder, folder_factory):
 
 @pytest.fixture
 def hashed_file(file):
-    file.compute_sha512()
+    file.compute_checksums()
     file.save()
     return file
 
@@ -0,0 +1,54 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from guardian.shortcuts import assign_perm
+import pytest
+
+from dkc.core.permissions import Permission
+
+
+@pytest.mark.django_db
+def test_access_check(api_client, user, tree_factory, folder_factory, file_factory):
+    writeable_tree = tree_factory()
+    assign_perm(Permission.write.value, user, writeable_tree)
+    writeable_folder = folder_factory(tree=writeable_tree)
+    writeable_file = file_factory(folder=writeable_folder)
+    public_file = file_factory(folder__tree=tree_factory(public=True))
+    hidden_folder = folder_factory(tree=tree_factory())
+    api_client.force_authenticate(user=user)
+
+    resp = api_client.post(
+        '/api/v2/access/check',
+        data={
+            'folders': [writeable_folder.id, hidden_folder.id, 0],
+            'files': [writeable_file.id, public_file.id],
+        },
+        format='json',
+    )
+    assert resp.status_code == 200
+    assert resp.data == {
+        'folders': {writeable_folder.id: {'read': True, 'write': True, 'admin': False}},
+        'files': {
+            writeable_file.id: {'read': True, 'write': True, 'admin': False},
+            public_file.id: {'read': True, 'write': False, 'admin': False},
+        },
+    }
+
+
+@pytest.mark.django_db
+def test_access_check_queries_constant(api_client, user, tree_factory, file_factory):
+    api_client.force_authenticate(user=user)
+    files = []
+
+    def count_check_queries(count):
+        for _ in range(count):
+            tree = tree_factory()
+            assign_perm(Permission.read.value, user, tree)
+            files.append(file_factory(folder__tree=tree))
+        data = {'folders': [file.folder_id for file in files], 'files': [file.id for file in files]}
+        with CaptureQueriesContext(connection) as context:
+            resp = api_client.post('/api/v2/access/check', data=data, format='json')
+        assert resp.status_code == 200
+        assert len(resp.data['files']) == len(files)
+        return len(context.captured_queries)
+
+    assert count_check_queries(2) == count_check_queries(8)
@@ -0,0 +1,66 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+import pytest
+
+from dkc.core.admin import pagination
+from dkc.core.admin.pagination import estimated_count
+from dkc.core.models import File, LegacyCheckpoint
+
+
+def _counted(context: CaptureQueriesContext) -> bool:
+    return any('COUNT(' in query['sql'] for query in context.captured_queries)
+
+
+@pytest.mark.django_db
+def test_estimated_count_small_exact(file_factory):
+    file = file_factory()
+    file_factory()
+
+    # Small results are counted exactly, whether or not they are filtered
+    assert estimated_count(File.objects.all()) == 2
+    assert estimated_count(File.objects.filter(folder=file.folder)) == 1
+
+
+@pytest.mark.django_db
+def test_estimated_count_table_statistics(file_factory, monkeypatch):
+    monkeypatch.setattr(pagination, 'EXACT_COUNT_THRESHOLD', 1)
+    file_factory.create_batch(3)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE core_file')
+
+    with CaptureQueriesContext(connection) as context:
+        assert estimated_count(File.objects.all()) == 3
+    assert not _counted(context)
+
+
+@pytest.mark.django_db
+def test_estimated_count_query_plan(file_factory, monkeypatch):
+    monkeypatch.setattr(pagination, 'EXACT_COUNT_THRESHOLD', 1)
+    file_factory.create_batch(3)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE core_file')
+
+    with CaptureQueriesContext(connection) as context:
+        estimate = estimated_count(File.objects.filter(size__gte=0))
+    assert estimate >= 1
+    assert not _counted(context)
+    assert context.captured_queries[0]['sql'].startswith('EXPLAIN')
+
+
+@pytest.mark.django_db
+def test_estimated_count_never_analyzed(monkeypatch):
+    monkeypatch.setattr(pagination, 'EXACT_COUNT_THRESHOLD', 1)
+    # Truncating resets the table statistics, as if it had never been analyzed
+    with connection.cursor() as cursor:
+        cursor.execute('TRUNCATE core_legacycheckpoint')
+        cursor.execute(
+            "SELECT reltuples FROM pg_class WHERE oid = 'core_legacycheckpoint'::regclass"
+        )
+        assert cursor.fetchone()[0] <= 0
+    LegacyCheckpoint.objects.bulk_create(
+        [LegacyCheckpoint(kind=LegacyCheckpoint.Kind.ROOT, legacy_id=str(i)) for i in range(3)]
+    )
+
+    with CaptureQueriesContext(connection) as context:
+        assert estimated_count(LegacyCheckpoint.objects.all()) == 3
+    assert _counted(context)
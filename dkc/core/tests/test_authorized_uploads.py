@@ -1,9 +1,11 @@
 from datetime import datetime, timezone
+import smtplib
 
 import pytest
 
-from dkc.core.models import AuthorizedUpload
+from dkc.core.models import AuthorizedUpload, AuthorizedUploadNotification
 from dkc.core.permissions import Permission, PermissionGrant
+from dkc.core.tasks import send_upload_notifications
 
 
 @pytest.mark.django_db
@@ -165,7 +167,8 @@ def test_authorized_upload_completion_id_mismatch(api_client, authorized_upload_
 
 
 @pytest.mark.django_db
-def test_authorized_upload_completion(api_client, authorized_upload, mailoutbox):
+def test_authorized_upload_completion(api_client, authorized_upload, mailoutbox, mocker):
+    mocker.patch.object(send_upload_notifications, 'apply_async')
     resp = api_client.post(
         f'/api/v2/authorized_uploads/{authorized_upload.id}/completion',
         data={'authorization': authorized_upload.signature},
@@ -173,5 +176,62 @@ def test_authorized_upload_completion(api_client, authorized_upload, mailoutbox)
     assert resp.status_code == 204
     assert not AuthorizedUpload.objects.filter(pk=authorized_upload.id).exists()
 
+    # The email is sent later
+    assert len(mailoutbox) == 0
+    assert AuthorizedUploadNotification.objects.filter(
+        creator=authorized_upload.creator, folder=authorized_upload.folder
+    ).exists()
+    send_upload_notifications.apply_async.assert_called_once()
+
+
+@pytest.mark.django_db
+def test_send_upload_notifications(authorized_upload, mailoutbox):
+    AuthorizedUploadNotification.objects.create(
+        creator=authorized_upload.creator, folder=authorized_upload.folder
+    )
+    send_upload_notifications(authorized_upload.creator.id)
+
     assert len(mailoutbox) == 1
     assert mailoutbox[0].subject == 'Authorized upload complete'
+    assert mailoutbox[0].to == [authorized_upload.creator.email]
+    assert 'a user has completed an upload' in mailoutbox[0].body
+    assert 'in the following folder:' in mailoutbox[0].body
+    assert not AuthorizedUploadNotification.objects.exists()
+
+
+@pytest.mark.django_db
+def test_send_upload_notifications_coalesced(user, folder_factory, mailoutbox):
+    folders = [folder_factory(), folder_factory()]
+    for folder in folders:
+        AuthorizedUploadNotification.objects.create(creator=user, folder=folder)
+
+    # Each completion schedules a task, but only the first has anything to send
+    send_upload_notifications(user.id)
+    send_upload_notifications(user.id)
+
+    assert len(mailoutbox) == 1
+    assert mailoutbox[0].subject == '2 authorized uploads complete'
+    for folder in folders:
+        assert folder.abs_path in mailoutbox[0].body
+    assert 'users have completed uploads' in mailoutbox[0].body
+
+
+@pytest.mark.django_db
+def test_send_upload_notifications_failed(authorized_upload, mailoutbox, mocker):
+    notification = AuthorizedUploadNotification.objects.create(
+        creator=authorized_upload.creator, folder=authorized_upload.folder
+    )
+    mocker.patch('dkc.core.tasks.send_mail', side_effect=smtplib.SMTPException)
+    # Make the first attempt the last
+    mocker.patch.object(send_upload_notifications, 'max_retries', 0)
+
+    with pytest.raises(smtplib.SMTPException):
+        send_upload_notifications(authorized_upload.creator.id)
+
+    notification.refresh_from_db()
+    assert notification.failed is not None
+
+    # Later emails don't include notifications which failed
+    mocker.stopall()
+    send_upload_notifications(authorized_upload.creator.id)
+    assert len(mailoutbox) == 0
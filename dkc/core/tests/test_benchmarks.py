@@ -0,0 +1,178 @@
+import itertools
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+import pytest
+
+from dkc.core.hash_filter import known_checksums
+from dkc.core.permissions import Permission, PermissionGrant
+from dkc.core.tasks import compute_pending_checksums
+
+# The seeded tree is larger than any query budget, so a query per listed, nested or granted
+# object always exceeds it
+SEED_FOLDERS = 30
+SEED_FILES = 60
+SEED_DEPTH = 20
+SEED_GRANTEES = 30
+
+ROUNDS = 20
+
+# The most queries allowed in a single request, and the longest allowed mean latency, in seconds.
+# Query budgets are the measured counts plus one, so any new per-request query fails. Latency is
+# only checked when benchmarks are enabled, so plain "pytest" only enforces queries.
+BUDGETS = {
+    'folder_list': (5, 0.1),
+    'file_list': (5, 0.1),
+    'folder_path': (6, 0.1),
+    'file_download': (3, 0.05),
+    'file_hash_download': (2, 0.05),
+    'file_create': (19, 0.25),
+    'file_finalize': (13, 0.25),
+    'folder_permissions_put': (18, 0.25),
+}
+
+
+@pytest.fixture
+def seeded_tree(user_factory, folder_factory, file_factory):
+    user = user_factory()
+    root = folder_factory(creator=user)
+    root.tree.grant_permission(PermissionGrant(user, Permission.admin))
+
+    folder_factory.create_batch(SEED_FOLDERS, parent=root, creator=user)
+    file_factory.create_batch(SEED_FILES, folder=root, creator=user)
+
+    deepest = root
+    for _ in range(SEED_DEPTH):
+        deepest = folder_factory(parent=deepest, creator=user)
+
+    hashed_file = file_factory(folder=root, creator=user)
+    hashed_file.compute_checksums()
+    hashed_file.save()
+    known_checksums['sha512'].rebuild()
+
+    return {'user': user, 'root': root, 'deepest': deepest, 'hashed_file': hashed_file}
+
+
+@pytest.fixture
+def seeded_client(api_client, seeded_tree):
+    api_client.force_authenticate(user=seeded_tree['user'])
+    return api_client
+
+
+@pytest.fixture
+def measure(request, benchmark):
+    """Benchmark a request, failing if it exceeds the budget named after the test."""
+    name = request.node.originalname.replace('test_benchmark_', '')
+    max_queries, max_mean = BUDGETS[name]
+
+    def measure(make_request, setup=None):
+        query_counts = []
+
+        def target(*args):
+            with CaptureQueriesContext(connection) as context:
+                resp = make_request(*args)
+            query_counts.append(len(context.captured_queries))
+            return resp
+
+        resp = benchmark.pedantic(target, setup=setup, rounds=ROUNDS)
+        benchmark.extra_info['queries'] = max(query_counts)
+
+        assert max(query_counts) <= max_queries, f'{name} exceeded its query budget'
+        if not benchmark.disabled:
+            assert benchmark.stats.stats.mean <= max_mean, f'{name} exceeded its latency budget'
+        return resp
+
+    return measure
+
+
+@pytest.mark.django_db
+def test_benchmark_folder_list(seeded_client, seeded_tree, measure):
+    resp = measure(
+        lambda: seeded_client.get('/api/v2/folders', data={'parent': seeded_tree['root'].id})
+    )
+    assert resp.status_code == 200
+    assert resp.data['count'] == SEED_FOLDERS + 1
+
+
+@pytest.mark.django_db
+def test_benchmark_file_list(seeded_client, seeded_tree, measure):
+    resp = measure(
+        lambda: seeded_client.get('/api/v2/files', data={'folder': seeded_tree['root'].id})
+    )
+    assert resp.status_code == 200
+    assert resp.data['count'] == SEED_FILES + 1
+
+
+@pytest.mark.django_db
+def test_benchmark_folder_path(seeded_client, seeded_tree, measure):
+    resp = measure(lambda: seeded_client.get(f'/api/v2/folders/{seeded_tree["deepest"].id}/path'))
+    assert resp.status_code == 200
+    assert len(resp.data) == SEED_DEPTH + 1
+
+
+@pytest.mark.django_db
+def test_benchmark_file_download(seeded_client, seeded_tree, measure):
+    resp = measure(
+        lambda: seeded_client.get(f'/api/v2/files/{seeded_tree["hashed_file"].id}/download')
+    )
+    assert resp.status_code == 302
+
+
+@pytest.mark.django_db
+def test_benchmark_file_hash_download(seeded_client, seeded_tree, measure):
+    sha512 = seeded_tree['hashed_file'].sha512
+    resp = measure(
+        lambda: seeded_client.get('/api/v2/files/hash_download', data={'sha512': sha512})
+    )
+    assert resp.status_code == 302
+
+
+@pytest.mark.django_db
+def test_benchmark_file_create(seeded_client, seeded_tree, measure):
+    names = itertools.count()
+    resp = measure(
+        lambda: seeded_client.post(
+            '/api/v2/files',
+            data={
+                'name': f'created-{next(names)}.txt',
+                'folder': seeded_tree['root'].id,
+                'size': 42,
+            },
+        )
+    )
+    assert resp.status_code == 201
+
+
+@pytest.mark.django_db
+def test_benchmark_file_finalize(
+    seeded_client, seeded_tree, file_factory, s3ff_field_value, measure, mocker
+):
+    mocker.patch.object(compute_pending_checksums, 'delay')
+
+    def create_pending_file():
+        pending_file = file_factory(
+            folder=seeded_tree['root'], creator=seeded_tree['user'], size=42, blob=None
+        )
+        return (pending_file,), {}
+
+    resp = measure(
+        lambda pending_file: seeded_client.patch(
+            f'/api/v2/files/{pending_file.id}', data={'blob': s3ff_field_value}
+        ),
+        setup=create_pending_file,
+    )
+    assert resp.status_code == 200
+
+
+@pytest.mark.django_db
+def test_benchmark_folder_permissions_put(seeded_client, seeded_tree, user_factory, measure):
+    grantees = [seeded_tree['user']] + user_factory.create_batch(SEED_GRANTEES)
+    data = [
+        {'name': grantee.username, 'model': 'user', 'permission': 'admin'} for grantee in grantees
+    ]
+    resp = measure(
+        lambda: seeded_client.put(
+            f'/api/v2/folders/{seeded_tree["root"].id}/permissions', data=data, format='json'
+        )
+    )
+    assert resp.status_code == 200
@@ -0,0 +1,134 @@
+from datetime import timedelta
+import hashlib
+
+import pytest
+
+from dkc.core.models import ChecksumRecompute, ChecksumRequest, File
+from dkc.core.tasks import (
+    compute_pending_checksums,
+    enqueue_checksum_recompute,
+    verify_legacy_checksums,
+)
+
+
+@pytest.mark.django_db
+def test_checksum_request_enqueue_coalesces(file):
+    queryset = File.objects.filter(pk=file.pk)
+    assert ChecksumRequest.enqueue(queryset) == 1
+    assert ChecksumRequest.enqueue(queryset) == 1
+    assert ChecksumRequest.objects.filter(file=file).count() == 1
+
+
+@pytest.mark.django_db
+def test_checksum_request_enqueue_reopens_completed(file, mocker):
+    mocker.patch.object(compute_pending_checksums, 'delay')
+    ChecksumRequest.enqueue(File.objects.filter(pk=file.pk))
+    compute_pending_checksums()
+    assert not ChecksumRequest.pending().exists()
+
+    ChecksumRequest.enqueue(File.objects.filter(pk=file.pk))
+    assert ChecksumRequest.pending().filter(file=file).exists()
+
+
+@pytest.mark.django_db
+def test_checksum_request_pending_smallest_first(file_factory):
+    large = file_factory(blob__data=b'a' * 100)
+    small = file_factory(blob__data=b'a')
+    ChecksumRequest.enqueue(File.objects.all())
+    assert [request.file for request in ChecksumRequest.pending()] == [small, large]
+
+
+@pytest.mark.django_db
+def test_compute_pending_checksums(file_factory, mocker):
+    mocker.patch.object(compute_pending_checksums, 'delay')
+    files = [file_factory() for _ in range(3)]
+    ChecksumRequest.enqueue(File.objects.all())
+
+    compute_pending_checksums()
+
+    for file in files:
+        file.refresh_from_db()
+        assert len(file.sha512) == 128
+    assert ChecksumRequest.statistics()['backlog_files'] == 0
+    assert ChecksumRequest.statistics()['completed_files'] == 3
+    compute_pending_checksums.delay.assert_called_once_with()
+
+
+@pytest.mark.django_db
+def test_compute_pending_checksums_unreadable(file_factory, mocker, settings):
+    mocker.patch.object(compute_pending_checksums, 'delay')
+    unreadable = file_factory()
+    unreadable.blob.storage.delete(unreadable.blob.name)
+    readable = file_factory()
+    ChecksumRequest.enqueue(File.objects.all())
+
+    compute_pending_checksums()
+
+    unreadable.refresh_from_db()
+    assert unreadable.sha512 == ''
+    request = ChecksumRequest.objects.get(file=unreadable)
+    assert request.completed is None
+    assert request.failures == 1
+    assert ChecksumRequest.objects.get(file=readable).completed is not None
+
+    # The failed request is not claimed again until its claim expires
+    assert ChecksumRequest.claim(10) == []
+    request.claimed -= timedelta(hours=settings.DKC_CHECKSUM_CLAIM_EXPIRATION_HOURS + 1)
+    request.save(update_fields=['claimed'])
+    assert ChecksumRequest.claim(10) == [request]
+
+
+@pytest.mark.django_db
+def test_compute_pending_checksums_empty(mocker):
+    mocker.patch.object(compute_pending_checksums, 'delay')
+    compute_pending_checksums()
+    compute_pending_checksums.delay.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_enqueue_checksum_recompute(file_factory, user, mocker, settings):
+    mocker.patch.object(compute_pending_checksums, 'delay')
+    settings.DKC_CHECKSUM_ENQUEUE_CHUNK_SIZE = 2
+    files = [file_factory() for _ in range(5)]
+    recompute = ChecksumRecompute.objects.create(
+        creator=user, file_ids=[file.pk for file in files[1:]]
+    )
+
+    enqueue_checksum_recompute(recompute.id)
+
+    recompute.refresh_from_db()
+    assert recompute.total == 4
+    assert recompute.enqueued == 4
+    assert recompute.completed is not None
+    assert {request.file for request in ChecksumRequest.pending()} == set(files[1:])
+    # One chain of computation is started per chunk
+    assert compute_pending_checksums.delay.call_count == 2
+
+
+@pytest.mark.django_db
+def test_enqueue_checksum_recompute_changelist(file_factory, user, mocker):
+    mocker.patch.object(compute_pending_checksums, 'delay')
+    hashed = file_factory(name='match-hashed.txt')
+    hashed.compute_checksums()
+    hashed.save()
+    unhashed = file_factory(name='match-unhashed.txt')
+    file_factory(name='other.txt')
+    recompute = ChecksumRecompute.objects.create(
+        creator=user,
+        changelist_params={'sha512__isempty': ['1'], 'q': ['match'], 'o': ['-1'], 'p': ['0']},
+    )
+
+    enqueue_checksum_recompute(recompute.id)
+
+    assert [request.file for request in ChecksumRequest.pending()] == [unhashed]
+
+
+@pytest.mark.django_db
+def test_verify_legacy_checksums(file_factory):
+    file = file_factory(blob__data=b'content', sha512='0' * 128, sha512_verified=False)
+
+    verify_legacy_checksums()
+
+    file.refresh_from_db()
+    assert file.sha512_verified
+    assert file.sha512 == hashlib.sha512(b'content').hexdigest()
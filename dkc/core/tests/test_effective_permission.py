@@ -0,0 +1,79 @@
+from django.contrib.auth.models import Group
+from guardian.shortcuts import assign_perm, remove_perm
+import pytest
+
+from dkc.core.models import EffectivePermission
+from dkc.core.permissions import Permission, PermissionGrant
+
+
+@pytest.fixture
+def group():
+    return Group.objects.create(name='test-group')
+
+
+def _level(user, tree):
+    effective = EffectivePermission.objects.filter(user=user, tree=tree).first()
+    return effective.level if effective else None
+
+
+@pytest.mark.django_db
+def test_effective_permission_user_grant(user, tree):
+    tree.grant_permission(PermissionGrant(user_or_group=user, permission=Permission.write))
+    assert _level(user, tree) == Permission.write.level
+
+    tree.grant_permission(PermissionGrant(user_or_group=user, permission=Permission.read))
+    assert _level(user, tree) == Permission.read.level
+
+    tree.remove_permission(PermissionGrant(user_or_group=user, permission=Permission.read))
+    assert _level(user, tree) is None
+
+
+@pytest.mark.django_db
+def test_effective_permission_highest_level(user, tree, group):
+    group.user_set.add(user)
+    assign_perm(Permission.read.value, user, tree)
+    assign_perm(Permission.admin.value, group, tree)
+    assert _level(user, tree) == Permission.admin.level
+
+    remove_perm(Permission.admin.value, group, tree)
+    assert _level(user, tree) == Permission.read.level
+
+
+@pytest.mark.django_db
+def test_effective_permission_group_membership(user, tree, group):
+    tree.grant_permission(PermissionGrant(user_or_group=group, permission=Permission.write))
+    assert _level(user, tree) is None
+
+    user.groups.add(group)
+    assert _level(user, tree) == Permission.write.level
+    assert tree.has_permission(user, Permission.write)
+
+    group.user_set.remove(user)
+    assert _level(user, tree) is None
+
+
+@pytest.mark.django_db
+def test_effective_permission_group_clear(user, tree, group):
+    tree.grant_permission(PermissionGrant(user_or_group=group, permission=Permission.read))
+    user.groups.add(group)
+
+    user.groups.clear()
+    assert _level(user, tree) is None
+
+
+@pytest.mark.django_db
+def test_effective_permission_group_delete(user, tree, group):
+    tree.grant_permission(PermissionGrant(user_or_group=group, permission=Permission.read))
+    group.user_set.add(user)
+
+    group.delete()
+    assert _level(user, tree) is None
+
+
+@pytest.mark.django_db
+def test_effective_permission_tree_delete(user, folder):
+    tree = folder.tree
+    tree.grant_permission(PermissionGrant(user_or_group=user, permission=Permission.admin))
+
+    folder.delete()
+    assert not EffectivePermission.objects.exists()
@@ -1,3 +1,5 @@
+import hashlib
+
 from django.core.exceptions import ValidationError
 from django.db.utils import IntegrityError
 import pytest
@@ -11,9 +13,11 @@ def test_file_abs_path(folder, folder_factory, file_factory):
 
 
 @pytest.mark.django_db
-def test_file_checksum(file):
-    file.compute_sha512()
-    assert len(file.sha512) == 128
+def test_file_checksums(file):
+    file.compute_checksums()
+    assert file.md5 == hashlib.md5(b'fakefilebytes').hexdigest()
+    assert file.sha256 == hashlib.sha256(b'fakefilebytes').hexdigest()
+    assert file.sha512 == hashlib.sha512(b'fakefilebytes').hexdigest()
 
 
 @pytest.mark.django_db
@@ -1,8 +1,9 @@
 from django.conf import settings
 import pytest
 
-from dkc.core.models import File
-from dkc.core.tasks import file_compute_sha512
+from dkc.core.hash_filter import known_checksums
+from dkc.core.models import ChecksumRequest, File
+from dkc.core.tasks import compute_pending_checksums
 
 
 @pytest.mark.django_db
@@ -62,7 +63,7 @@ def test_file_rest_update(admin_api_client, file):
 
 @pytest.mark.django_db
 def test_file_rest_set_blob(admin_api_client, pending_file, s3ff_field_value, mocker):
-    mocker.patch.object(file_compute_sha512, 'delay')
+    mocker.patch.object(compute_pending_checksums, 'delay')
     resp = admin_api_client.patch(
         f'/api/v2/files/{pending_file.id}', data={'blob': s3ff_field_value}
     )
@@ -71,7 +72,8 @@ def test_file_rest_set_blob(admin_api_client, pending_file, s3ff_field_value, mo
     pending_file.refresh_from_db()
     assert pending_file.blob
 
-    file_compute_sha512.delay.assert_called_once_with(pending_file.id)
+    assert ChecksumRequest.pending().filter(file=pending_file).exists()
+    compute_pending_checksums.delay.assert_called_once_with()
 
 
 @pytest.mark.django_db
@@ -114,3 +116,42 @@ def test_hash_download_case_insensitive(admin_api_client, hashed_file):
     sha512 = hashed_file.sha512.upper()
     resp = admin_api_client.get('/api/v2/files/hash_download', data={'sha512': sha512})
     assert resp.status_code == 302
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('algorithm', ['md5', 'sha256', 'sha512', 'MD5', 'SHA256'])
+def test_hash_download_algorithm(admin_api_client, hashed_file, algorithm):
+    digest = getattr(hashed_file, algorithm.lower())
+    resp = admin_api_client.get(
+        '/api/v2/files/hash_download', data={'algorithm': algorithm, 'hash': digest}
+    )
+    assert resp.status_code == 302
+
+
+@pytest.mark.django_db
+def test_hash_download_pending_legacy_file(admin_api_client, hashed_file, file_factory):
+    # A file pending migration, whose legacy checksum was reused before its blob was copied
+    file_factory(
+        blob=None,
+        size=hashed_file.size,
+        sha512=hashed_file.sha512,
+        sha512_verified=False,
+        legacy_file_id='0' * 24,
+    )
+    known_checksums['sha512'].rebuild()
+
+    resp = admin_api_client.get('/api/v2/files/hash_download', data={'sha512': hashed_file.sha512})
+    assert resp.status_code == 302
+
+    hashed_file.delete()
+    resp = admin_api_client.get('/api/v2/files/hash_download', data={'sha512': hashed_file.sha512})
+    assert resp.status_code == 404
+
+
+@pytest.mark.django_db
+def test_hash_download_wrong_length(admin_api_client, hashed_file):
+    resp = admin_api_client.get(
+        '/api/v2/files/hash_download', data={'algorithm': 'md5', 'hash': hashed_file.sha256}
+    )
+    assert resp.status_code == 400
+    assert resp.data == {'hash': ['Must be 32 characters for md5.']}
@@ -2,6 +2,7 @@ from django.conf import settings
 import pytest
 
 from dkc.core.models import Folder
+from dkc.core.permissions import Permission, PermissionGrant
 from dkc.core.tasks import delete_folder
 
 
@@ -195,3 +196,28 @@ def test_folder_rest_get_quota(admin_api_client, folder):
         'used': 0,
         'allowed': settings.DKC_DEFAULT_QUOTA,
     }
+
+
+@pytest.mark.django_db
+def test_folder_rest_roots(api_client, user, user_factory, folder_factory):
+    other = user_factory()
+    owned = folder_factory(name='owned', creator=user)
+    owned.tree.grant_permission(PermissionGrant(user_or_group=user, permission=Permission.admin))
+    shared = folder_factory(name='shared', creator=other)
+    shared.tree.grant_permission(PermissionGrant(user_or_group=user, permission=Permission.read))
+    public = folder_factory(name='public', creator=other, tree__public=True)
+    folder_factory(name='hidden', creator=other)
+    api_client.force_authenticate(user=user)
+
+    for scope, expected in [('owned', owned), ('shared', shared), ('public', public)]:
+        resp = api_client.get(f'/api/v2/folders/roots/{scope}')
+        assert resp.status_code == 200
+        assert [folder['id'] for folder in resp.data['results']] == [expected.id]
+
+    assert resp.data['results'][0]['access'] == {'read': True, 'write': False, 'admin': False}
+
+
+@pytest.mark.django_db
+def test_folder_rest_roots_anonymous(api_client):
+    assert api_client.get('/api/v2/folders/roots/owned').status_code == 401
+    assert api_client.get('/api/v2/folders/roots/public').status_code == 200
@@ -0,0 +1,67 @@
+import hashlib
+
+import pytest
+
+from dkc.core.hash_filter import BloomFilter, ChecksumFilter, known_checksums
+
+
+def _digest(value: str) -> str:
+    return hashlib.sha512(value.encode()).hexdigest()
+
+
+def test_bloom_filter_contains():
+    bloom = BloomFilter(100)
+    digests = [_digest(str(i)) for i in range(100)]
+    for digest in digests:
+        bloom.add(digest)
+    assert all(digest in bloom for digest in digests)
+    assert all(digest.upper() in bloom for digest in digests)
+
+
+def test_bloom_filter_error_rate():
+    bloom = BloomFilter(1000, error_rate=0.01)
+    for i in range(1000):
+        bloom.add(_digest(str(i)))
+    false_positives = sum(_digest(f'absent-{i}') in bloom for i in range(10000))
+    # Allow some statistical slack above the configured rate
+    assert false_positives < 200
+
+
+def test_bloom_filter_saturation():
+    bloom = BloomFilter(1)
+    bloom.add(_digest('a'))
+    assert not bloom.is_saturated
+    bloom.add(_digest('b'))
+    assert bloom.is_saturated
+
+
+@pytest.mark.django_db
+def test_known_checksums_rebuild(hashed_file):
+    known_checksums['sha512'].rebuild()
+    assert known_checksums['sha512'].might_contain(hashed_file.sha512)
+    assert not known_checksums['sha512'].might_contain(_digest('absent'))
+
+
+@pytest.mark.django_db
+def test_known_checksums_added_on_save(file):
+    known_checksums['sha512'].rebuild()
+    file.compute_checksums()
+    file.save()
+    assert known_checksums['sha512'].might_contain(file.sha512)
+
+
+@pytest.mark.django_db
+def test_hash_download_unknown_skips_database(api_client, django_assert_num_queries):
+    known_checksums['sha512'].rebuild()
+    with django_assert_num_queries(0):
+        resp = api_client.get('/api/v2/files/hash_download', data={'sha512': _digest('absent')})
+    assert resp.status_code == 404
+
+
+@pytest.mark.django_db
+def test_checksum_filter_building_skips_database(django_assert_num_queries):
+    checksum_filter = ChecksumFilter('sha512')
+    checksum_filter._building = True
+    # Lookups don't wait for a background build, so anything might be present until it's done
+    with django_assert_num_queries(0):
+        assert checksum_filter.might_contain(_digest('absent'))
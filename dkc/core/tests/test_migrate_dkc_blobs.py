@@ -0,0 +1,34 @@
+import hashlib
+import io
+
+import pytest
+
+pytest.importorskip('requests')
+pytest.importorskip('pymongo')
+
+from dkc.core.management.commands.migrate_dkc_blobs import (  # noqa: E402
+    HashingReader,
+    server_side_copy_file,
+)
+
+
+def test_hashing_reader():
+    content = b'x' * 1000
+    reader = HashingReader(io.BytesIO(content))
+
+    assert b''.join(iter(lambda: reader.read(300), b'')) == content
+    assert reader.hexdigests()['sha512'] == hashlib.sha512(content).hexdigest()
+
+
+@pytest.mark.django_db
+def test_server_side_copy_file(file, pending_file):
+    # Any existing object may stand in for a legacy one, as long as the storage can read it
+    source = (file.blob.storage.bucket_name, file.blob.name)
+
+    key, checksums = server_side_copy_file(pending_file, source)
+
+    assert checksums is None
+    assert key != file.blob.name
+    pending_file.blob = key
+    with pending_file.blob.open() as blob, file.blob.open() as legacy_blob:
+        assert blob.read() == legacy_blob.read()
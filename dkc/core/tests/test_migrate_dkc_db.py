@@ -0,0 +1,203 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip('pymongo')
+
+from dkc.core.management.commands import migrate_dkc_db  # noqa: E402
+from dkc.core.management.commands.migrate_dkc_db import (  # noqa: E402
+    LegacyIndex,
+    LegacyRoot,
+    _apply_delta,
+    _import_root,
+)
+from dkc.core.models import (  # noqa: E402
+    File,
+    Folder,
+    LegacyCheckpoint,
+    LegacySync,
+    StorageUsageChange,
+)
+
+CREATED = datetime(2015, 1, 1)
+COLLECTION = {'_id': 'c1', 'name': 'collection', 'creatorId': 'u1', 'created': CREATED}
+
+
+def _legacy_folder(oid, name, parent_id, parent_collection='folder'):
+    return {
+        '_id': oid,
+        'name': name,
+        'creatorId': 'u1',
+        'created': CREATED,
+        'parentId': parent_id,
+        'parentCollection': parent_collection,
+    }
+
+
+def _legacy_item(oid, name, folder_id, **kwargs):
+    return {
+        '_id': oid,
+        'name': name,
+        'creatorId': 'u1',
+        'created': CREATED,
+        'folderId': folder_id,
+        **kwargs,
+    }
+
+
+def _legacy_file(oid, name, size, item_id):
+    return {
+        '_id': oid,
+        'name': name,
+        'size': size,
+        'creatorId': 'u1',
+        'created': CREATED,
+        'itemId': item_id,
+    }
+
+
+@pytest.fixture
+def imported_root(user):
+    index = LegacyIndex.build(
+        [_legacy_folder('f1', 'folder', 'c1', 'collection')],
+        [_legacy_item('i1', 'single', 'f1'), _legacy_item('i2', 'multi', 'f1')],
+        [
+            _legacy_file('a', 'a.txt', 3, 'i1'),
+            _legacy_file('b', 'b.txt', 5, 'i2'),
+            _legacy_file('c', 'c.txt', 7, 'i2'),
+        ],
+    )
+    _import_root(LegacyRoot('collection', COLLECTION), index, defaultdict(lambda: user))
+    return Folder.objects.get(parent=None, name='collection')
+
+
+@pytest.mark.django_db
+def test_import_root(user, imported_root):
+    folder = imported_root.child_folders.get()
+    multi = folder.child_folders.get()
+    assert (imported_root.size, folder.size, multi.size) == (15, 15, 12)
+    assert multi.depth == 2
+    assert {imported_root.created.year, folder.created.year, multi.created.year} == {2015}
+    assert {file.created.year for file in File.objects.all()} == {2015}
+    assert set(File.objects.values_list('name', flat=True)) == {'a.txt', 'b.txt', 'c.txt'}
+    user.quota.refresh_from_db()
+    assert user.quota.used == 15
+    assert StorageUsageChange.objects.get().bytes == 15
+
+
+@pytest.mark.django_db
+def test_apply_delta(user, imported_root):
+    _apply_delta(
+        [_legacy_folder('f1', 'renamed', 'c1', 'collection')],
+        [
+            _legacy_item('i1', 'single', 'f1', description='changed'),
+            _legacy_item('i2', 'multi', 'f1'),
+            _legacy_item('i3', 'new', 'f1'),
+        ],
+        [_legacy_file('d', 'd.txt', 11, 'i2'), _legacy_file('e', 'e.txt', 13, 'i3')],
+        {('collection', 'c1'): imported_root},
+        defaultdict(lambda: user),
+    )
+
+    folder = imported_root.child_folders.get()
+    assert folder.name == 'renamed'
+    assert folder.child_folders.get().size == 23
+    assert folder.size == 39
+    assert File.objects.get(name='a.txt').description == 'changed'
+    assert File.objects.get(name='e.txt').folder == folder
+    user.quota.refresh_from_db()
+    assert user.quota.used == 39
+
+
+@pytest.mark.django_db
+def test_import_root_resume(user, monkeypatch):
+    monkeypatch.setattr(migrate_dkc_db, 'CHECKPOINT_UNIT_SIZE', 2)
+    index = LegacyIndex.build(
+        [
+            _legacy_folder('f1', 'first', 'c1', 'collection'),
+            _legacy_folder('f2', 'second', 'c1', 'collection'),
+        ],
+        [_legacy_item('i1', 'one', 'f1'), _legacy_item('i2', 'two', 'f2')],
+        [_legacy_file('a', 'a.txt', 3, 'i1'), _legacy_file('b', 'b.txt', 5, 'i2')],
+    )
+    user_map = defaultdict(lambda: user)
+    _import_root(LegacyRoot('collection', COLLECTION), index, user_map)
+    assert LegacyCheckpoint.objects.filter(kind=LegacyCheckpoint.Kind.SUBTREE).count() == 3
+
+    # Simulate an interruption while the second subtree was being committed
+    LegacyCheckpoint.objects.filter(kind=LegacyCheckpoint.Kind.ROOT).delete()
+    LegacyCheckpoint.objects.filter(legacy_id='f2').delete()
+    Folder.objects.get(legacy_id='f2').delete()
+
+    _import_root(LegacyRoot('collection', COLLECTION), index, user_map)
+
+    root = Folder.objects.get(parent=None, name='collection')
+    assert root.size == 8
+    assert File.objects.count() == 2
+    user.quota.refresh_from_db()
+    assert user.quota.used == 8
+
+
+@pytest.mark.django_db
+def test_import_root_without_checkpoints(user, imported_root):
+    # Earlier imports saved each folder and file on its own, without checkpoints, so one which
+    # failed partway left a partial root
+    LegacyCheckpoint.objects.all().delete()
+    File.objects.get(name='c.txt').delete()
+    index = LegacyIndex.build(
+        [
+            _legacy_folder('f1', 'folder', 'c1', 'collection'),
+            _legacy_folder('f2', 'missing', 'c1', 'collection'),
+        ],
+        [
+            _legacy_item('i1', 'single', 'f1'),
+            _legacy_item('i2', 'multi', 'f1'),
+            _legacy_item('i3', 'other', 'f2'),
+        ],
+        [
+            _legacy_file('a', 'a.txt', 3, 'i1'),
+            _legacy_file('b', 'b.txt', 5, 'i2'),
+            _legacy_file('c', 'c.txt', 7, 'i2'),
+            _legacy_file('d', 'd.txt', 11, 'i3'),
+        ],
+    )
+
+    _import_root(LegacyRoot('collection', COLLECTION), index, defaultdict(lambda: user))
+
+    assert Folder.objects.filter(tree=imported_root.tree).count() == 4
+    assert sorted(File.objects.values_list('name', flat=True)) == [
+        'a.txt',
+        'b.txt',
+        'c.txt',
+        'd.txt',
+    ]
+    imported_root.refresh_from_db()
+    assert imported_root.size == 26
+    assert Folder.objects.get(legacy_id='f1').size == 15
+    assert Folder.objects.get(legacy_id='i2').size == 12
+    assert Folder.objects.get(legacy_id='f2').size == 11
+    user.quota.refresh_from_db()
+    assert user.quota.used == 26
+    assert LegacyCheckpoint.objects.filter(kind=LegacyCheckpoint.Kind.ROOT, legacy_id='c1').exists()
+
+
+@pytest.mark.django_db
+def test_delta_since_after_partial_rerun():
+    first = datetime(2021, 1, 1, tzinfo=timezone.utc)
+    LegacySync.objects.create(started=first, completed=first)
+    assert LegacySync.delta_since() < first
+
+    # A full import fails after importing some roots, then one of them changes in the legacy
+    # instance before a rerun imports only the remaining roots
+    failed = first + timedelta(days=1)
+    LegacySync.objects.create(started=failed)
+    changed = failed + timedelta(hours=1)
+    rerun = failed + timedelta(days=1)
+    LegacySync.objects.create(started=rerun, completed=rerun)
+    assert LegacySync.delta_since() < changed
+
+    # Later syncs no longer cover the failed run
+    delta = rerun + timedelta(days=1)
+    LegacySync.objects.create(started=delta, completed=delta, delta=True)
+    assert changed < LegacySync.delta_since() < delta
@@ -0,0 +1,57 @@
+from django.contrib.auth.models import Group, User
+from django.core.management import call_command
+import pytest
+
+from dkc.core.management.commands.mock_db import _bulk_populate_tree
+from dkc.core.models import File, Folder, Tree
+from dkc.core.permissions import Permission
+
+
+@pytest.mark.django_db
+def test_bulk_populate_tree(user):
+    tree = _bulk_populate_tree('mock', user, 2, 2, 3, lambda: 10, 'mock/placeholder.dat')
+
+    root = tree.root_folder
+    assert root.size == 120
+    assert [folder.size for folder in root.child_folders.all()] == [60, 60]
+    assert Folder.objects.filter(tree=tree, depth=2).count() == 4
+    assert File.objects.filter(folder__tree=tree).count() == 12
+    user.quota.refresh_from_db()
+    assert user.quota.used == 120
+
+
+@pytest.mark.django_db
+def test_mock_db_bulk(user_factory):
+    # A remaining user of an earlier run, whose predecessor was deleted
+    user_factory(username='mock-1')
+
+    call_command(
+        'mock_db',
+        '1',
+        '2',
+        '3',
+        '--bulk',
+        '--roots=2',
+        '--users=2',
+        '--groups=1',
+        '--group-size=2',
+        '--grants=3',
+        '--mean-file-size=100',
+        '--seed=0',
+    )
+
+    owners = list(User.objects.filter(username__in=['mock-2', 'mock-3']).select_related('quota'))
+    assert len(owners) == 2
+    group = Group.objects.get(name='mock-0')
+    assert group.user_set.count() == 2
+    for tree in Tree.objects.all():
+        owner = tree.quota.user
+        assert owner in owners
+        assert tree.has_permission(owner, Permission.admin)
+        assert tree.root_folder.name in {'mock-0', 'mock-1'}
+        assert File.objects.filter(folder__tree=tree).count() == 6
+    for owner in owners:
+        # Mock data may exceed the default quota, which is raised to fit
+        used = sum(tree.root_folder.size for tree in Tree.objects.filter(quota=owner.quota))
+        assert owner.quota.used == used
+        assert owner.quota.allowed >= used
@@ -0,0 +1,66 @@
+import time
+
+from guardian.shortcuts import assign_perm, remove_perm
+import pytest
+
+from dkc.core.models import EffectivePermission
+from dkc.core.permission_cache import PermissionCache
+from dkc.core.permissions import Permission
+
+
+def _wait_for_level(cache, user, tree, load, expected):
+    # Notifications are delivered asynchronously
+    for _ in range(50):
+        level = cache.get_levels(user.pk, [tree.pk], load)[tree.pk]
+        if level == expected:
+            return level
+        time.sleep(0.1)
+    return level
+
+
+@pytest.mark.django_db(transaction=True)
+def test_permission_cache_invalidated_across_processes(user_factory, tree_factory):
+    user = user_factory()
+    tree = tree_factory()
+    # A separate instance stands in for the cache of another process
+    cache = PermissionCache(max_trees=10)
+    loads = []
+
+    def load(tree_ids):
+        loads.append(tree_ids)
+        return dict(
+            EffectivePermission.objects.filter(user=user, tree__in=tree_ids).values_list(
+                'tree', 'level'
+            )
+        )
+
+    assert cache.get_levels(user.pk, [tree.pk], load) == {tree.pk: 0}
+    assert cache.get_levels(user.pk, [tree.pk], load) == {tree.pk: 0}
+    assert len(loads) == 1
+
+    assign_perm(Permission.write.value, user, tree)
+    assert _wait_for_level(cache, user, tree, load, Permission.write.level) == 2
+
+    remove_perm(Permission.write.value, user, tree)
+    assert _wait_for_level(cache, user, tree, load, 0) == 0
+
+
+@pytest.mark.django_db
+def test_permission_cache_not_stored_in_transaction(user, tree):
+    cache = PermissionCache(max_trees=10)
+    loads = []
+
+    def load(tree_ids):
+        loads.append(tree_ids)
+        return {}
+
+    cache.get_levels(user.pk, [tree.pk], load)
+    cache.get_levels(user.pk, [tree.pk], load)
+    assert len(loads) == 2
+
+
+@pytest.mark.django_db
+def test_has_permission_sees_own_changes(user, tree):
+    assert not tree.has_permission(user, Permission.read)
+    assign_perm(Permission.read.value, user, tree)
+    assert tree.has_permission(user, Permission.read)
@@ -1,7 +1,10 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from guardian.shortcuts import assign_perm
 import pytest
 
 from dkc.core.models import File, Folder
+from dkc.core.models.tree import TreeAccessChecker
 from dkc.core.permissions import Permission, PermissionGrant
 
 
@@ -275,6 +278,81 @@ def test_delete_permissions(api_client, user, user_factory, admin_folder):
     assert not admin_folder.tree.has_permission(user2, Permission.read)
 
 
+@pytest.mark.django_db
+def test_put_permissions_queries_constant(api_client, user, user_factory, admin_folder):
+    api_client.force_authenticate(user=user)
+
+    def count_put_queries(users):
+        # Every request also removes a stale grant, so both requests do the same kinds of writes
+        admin_folder.tree.grant_permission(PermissionGrant(user_factory(), Permission.read))
+        data = [
+            {
+                'name': other.username,
+                'model': 'user',
+                'permission': 'admin' if other == user else 'read',
+            }
+            for other in users
+        ]
+        with CaptureQueriesContext(connection) as context:
+            resp = api_client.put(
+                f'/api/v2/folders/{admin_folder.id}/permissions', data=data, format='json'
+            )
+        assert resp.status_code == 200
+        return len(context.captured_queries)
+
+    # Keep the requesting user as an admin, so every request is authorized the same way
+    small_acl_queries = count_put_queries([user, user_factory()])
+    large_users = [user] + [user_factory() for _ in range(9)]
+    large_acl_queries = count_put_queries(large_users)
+    assert large_acl_queries == small_acl_queries
+    assert all(admin_folder.tree.has_permission(other, Permission.read) for other in large_users)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('method,kept', [('put', False), ('patch', True)])
+def test_bulk_permissions(
+    api_client, user, user_factory, tree_factory, folder_factory, method, kept
+):
+    user2 = user_factory()
+    user3 = user_factory()
+    folders = []
+    for _ in range(3):
+        tree = tree_factory()
+        assign_perm(Permission.admin.value, user, tree)
+        assign_perm(Permission.read.value, user3, tree)
+        folders.append(folder_factory(tree=tree))
+    api_client.force_authenticate(user=user)
+
+    data = {
+        'folders': [folder.id for folder in folders],
+        'permissions': [
+            {'name': user.username, 'model': 'user', 'permission': 'admin'},
+            {'name': user2.username, 'model': 'user', 'permission': 'write'},
+        ],
+    }
+    resp = getattr(api_client, method)('/api/v2/folders/permissions', data=data, format='json')
+    assert resp.status_code == 204
+    for folder in folders:
+        assert folder.tree.has_permission(user, Permission.admin)
+        assert folder.tree.has_permission(user2, Permission.write)
+        assert folder.tree.has_permission(user3, Permission.read) is kept
+
+
+@pytest.mark.django_db
+def test_bulk_permissions_requires_admin(
+    api_client, user, user_factory, admin_folder, readable_folder
+):
+    api_client.force_authenticate(user=user)
+
+    data = {
+        'folders': [admin_folder.id, readable_folder.id],
+        'permissions': [{'name': user_factory().username, 'model': 'user', 'permission': 'read'}],
+    }
+    resp = api_client.put('/api/v2/folders/permissions', data=data, format='json')
+    assert resp.status_code == 403
+    assert admin_folder.tree.has_permission(user, Permission.admin)
+
+
 @pytest.mark.django_db
 def test_root_folder_create_sets_permissions(api_client, user):
     api_client.force_authenticate(user=user)
@@ -340,3 +418,59 @@ def test_set_admin_permission(user_factory, folder):
 def test_file_download_permission(api_client, file):
     resp = api_client.get(f'/api/v2/files/{file.id}/download')
     assert resp.status_code == 404
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'name,expected',
+    [
+        ('public', {'read': True, 'write': False, 'admin': False}),
+        ('no_access', {'read': False, 'write': False, 'admin': False}),
+        ('readable', {'read': True, 'write': False, 'admin': False}),
+        ('writeable', {'read': True, 'write': True, 'admin': False}),
+        ('admin', {'read': True, 'write': True, 'admin': True}),
+    ],
+)
+def test_tree_access_checker(user, all_folders, name, expected):
+    checker = TreeAccessChecker(user)
+    checker.prefetch(folder.tree for folder in all_folders.values())
+    assert checker.get_access(all_folders[name].tree) == expected
+
+
+@pytest.mark.django_db
+def test_file_list_access_queries_constant(api_client, user, tree_factory, file_factory):
+    api_client.force_authenticate(user=user)
+
+    def add_readable_files(count):
+        for _ in range(count):
+            tree = tree_factory()
+            assign_perm(Permission.read.value, user, tree)
+            file_factory(folder__tree=tree)
+
+    def count_list_queries():
+        with CaptureQueriesContext(connection) as context:
+            resp = api_client.get('/api/v2/files')
+        assert resp.status_code == 200
+        return len(context.captured_queries)
+
+    add_readable_files(2)
+    small_page_queries = count_list_queries()
+    add_readable_files(8)
+    assert count_list_queries() == small_page_queries
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'endpoint,params,fixture',
+    [('folders', {'parent': 'null'}, 'all_folders'), ('files', {}, 'all_files')],
+    ids=['folders', 'files'],
+)
+def test_anonymous_list_skips_permission_tables(api_client, request, endpoint, params, fixture):
+    request.getfixturevalue(fixture)
+    with CaptureQueriesContext(connection) as context:
+        resp = api_client.get(f'/api/v2/{endpoint}', data=params)
+    assert resp.status_code == 200
+    assert [result['name'] for result in resp.data['results']] == ['public']
+    sql = ' '.join(query['sql'] for query in context.captured_queries)
+    assert 'effectivepermission' not in sql
+    assert 'objectpermission' not in sql
@@ -1,8 +1,14 @@
+from datetime import timedelta
+
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.db import IntegrityError
+from django.utils import timezone
 import pytest
 
+from dkc.core.models import File
+from dkc.core.tasks import expire_pending_files
+
 
 @pytest.mark.django_db
 def test_quota_default_allowed(tree):
@@ -47,3 +53,25 @@ def test_file_deletion_decrements_usage(file):
     file.delete()
     assert file.folder.tree.quota.used == 0
     assert file.folder.tree.quota.used == 0
+
+
+@pytest.mark.django_db
+def test_expire_pending_files(folder, folder_factory, file_factory):
+    child = folder_factory(parent=folder)
+    uploaded = file_factory(folder=child)
+    abandoned = file_factory(folder=child, blob=None, size=100)
+    legacy = file_factory(folder=child, blob=None, size=200, legacy_file_id='0' * 24)
+    File.objects.filter(pk__in=[uploaded.pk, abandoned.pk, legacy.pk]).update(
+        created=timezone.now() - timedelta(days=settings.DKC_PENDING_FILE_EXPIRATION_DAYS + 1)
+    )
+    recent = file_factory(folder=child, blob=None, size=300)
+
+    expire_pending_files()
+
+    assert set(File.objects.all()) == {uploaded, legacy, recent}
+    expected_size = uploaded.size + legacy.size + recent.size
+    for ancestor in [folder, child]:
+        ancestor.refresh_from_db()
+        assert ancestor.size == expected_size
+    folder.tree.quota.refresh_from_db()
+    assert folder.tree.quota.used == expected_size
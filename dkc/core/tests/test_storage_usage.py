@@ -0,0 +1,93 @@
+from django.db import connection
+from django.db.models import Sum
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+import pytest
+
+from dkc.core.models import File, StorageUsage, StorageUsageChange, StorageUsageSnapshot
+from dkc.core.models.storage_usage import CHANGE_COMMIT_GRACE
+
+
+def _usages(snapshot, dimension):
+    return {
+        usage.key: (usage.files, usage.bytes)
+        for usage in snapshot.usages.filter(dimension=dimension)
+    }
+
+
+def _age_history():
+    # Move all changes out of the grace period, so the next snapshot includes them
+    now = timezone.now()
+    StorageUsageSnapshot.objects.update(taken=now - CHANGE_COMMIT_GRACE * 3)
+    StorageUsageChange.objects.update(created=now - CHANGE_COMMIT_GRACE * 2)
+
+
+@pytest.mark.django_db
+def test_storage_usage_snapshot_initial(file_factory):
+    file = file_factory(size=10, content_type='text/plain')
+
+    snapshot = StorageUsageSnapshot.take()
+
+    assert _usages(snapshot, StorageUsage.Dimension.USER) == {str(file.creator_id): (1, 10)}
+    assert _usages(snapshot, StorageUsage.Dimension.TREE) == {str(file.folder.tree_id): (1, 10)}
+    assert _usages(snapshot, StorageUsage.Dimension.CONTENT_TYPE) == {'text/plain': (1, 10)}
+    # Changes already included in the snapshot are pruned
+    assert not StorageUsageChange.objects.exists()
+
+
+@pytest.mark.django_db
+def test_storage_usage_snapshot_incremental(folder, file_factory):
+    deleted = file_factory(folder=folder, size=10, content_type='text/plain')
+    StorageUsageSnapshot.take()
+    file_factory(folder=folder, size=5, content_type='text/plain')
+    file_factory(folder=folder, size=7, content_type='image/png')
+    deleted.delete()
+    _age_history()
+
+    with CaptureQueriesContext(connection) as context:
+        snapshot = StorageUsageSnapshot.take()
+    # No queries aggregate the file table
+    assert not any('core_file' in query['sql'] for query in context.captured_queries)
+
+    assert _usages(snapshot, StorageUsage.Dimension.CONTENT_TYPE) == {
+        'text/plain': (1, 5),
+        'image/png': (1, 7),
+    }
+    assert _usages(snapshot, StorageUsage.Dimension.TREE) == {str(folder.tree_id): (2, 12)}
+
+
+@pytest.mark.django_db
+def test_storage_usage_snapshot_updated_file(folder, file_factory):
+    file = file_factory(folder=folder, size=10, content_type='text/plain')
+    StorageUsageSnapshot.take()
+    file.content_type = 'image/png'
+    file.save()
+    # Saving other fields records no changes
+    file.description = 'changed'
+    file.save(update_fields=['description'])
+    _age_history()
+
+    snapshot = StorageUsageSnapshot.take()
+
+    assert _usages(snapshot, StorageUsage.Dimension.CONTENT_TYPE) == {'image/png': (1, 10)}
+    assert _usages(snapshot, StorageUsage.Dimension.TREE) == {str(folder.tree_id): (1, 10)}
+
+
+@pytest.mark.django_db
+def test_storage_usage_bulk_delete(folder, file_factory):
+    def count_delete_queries(files):
+        with CaptureQueriesContext(connection) as context:
+            File.bulk_delete(File.objects.filter(pk__in=[file.pk for file in files]))
+        return len(context.captured_queries)
+
+    small_queries = count_delete_queries(
+        [file_factory(folder=folder, size=1, content_type='text/plain') for _ in range(2)]
+    )
+    large_queries = count_delete_queries(
+        [file_factory(folder=folder, size=1, content_type='text/plain') for _ in range(6)]
+    )
+
+    assert large_queries == small_queries
+    assert StorageUsageChange.objects.filter(files__lt=0).aggregate(
+        files=Sum('files'), bytes=Sum('bytes')
+    ) == {'files': -8, 'bytes': -8}
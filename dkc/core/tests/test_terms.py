@@ -1,8 +1,11 @@
 from hashlib import md5
 
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 import pytest
 
-from dkc.core.models import TermsAgreement
+from dkc.core.models import Folder, TermsAgreement
+from dkc.core.models.terms_agreement import TermsAgreementChecker
 from dkc.core.permissions import Permission, PermissionGrant
 
 
@@ -102,3 +105,37 @@ def test_terms_agreement_post_invalid_folder(api_client, folder, user):
     resp = api_client.post(f'/api/v2/folders/{folder.id}/terms/agreement', data={'checksum': 'x'})
     assert resp.status_code == 400
     assert resp.json()['folder'] == 'This folder has no associated terms of use.'
+
+
+@pytest.mark.django_db
+def test_terms_required_listed(api_client, user, terms, terms_agreement_factory, folder_factory):
+    terms.tree.public = True
+    terms.tree.save()
+    folder_factory(tree__public=True)
+    api_client.force_authenticate(user=user)
+
+    def terms_required():
+        resp = api_client.get('/api/v2/folders', data={'parent': 'null'})
+        assert resp.status_code == 200
+        return {folder['id']: folder['terms_required'] for folder in resp.data['results']}
+
+    other_folder_id = Folder.objects.exclude(tree=terms.tree).get().id
+    assert terms_required() == {terms.tree.root_folder.id: True, other_folder_id: False}
+
+    terms_agreement_factory(terms=terms, user=user)
+    assert terms_required() == {terms.tree.root_folder.id: False, other_folder_id: False}
+
+    # Updated terms should require re-agreement
+    terms.text += 'extra content'
+    terms.save()
+    assert terms_required() == {terms.tree.root_folder.id: True, other_folder_id: False}
+
+
+@pytest.mark.django_db
+def test_terms_agreement_checker_cached(user, terms, terms_agreement_factory):
+    terms_agreement_factory(terms=terms, user=user)
+    TermsAgreementChecker(user).has_agreed(terms)
+
+    with CaptureQueriesContext(connection) as context:
+        assert TermsAgreementChecker(user).has_agreed(terms)
+    assert len(context.captured_queries) == 0
@@ -1,6 +1,7 @@
 import pytest
 
-from dkc.core.models.tree import Tree
+from dkc.core.models.tree import Tree, TreeUserObjectPermission
+from dkc.core.permissions import Permission, PermissionGrant
 
 
 @pytest.mark.django_db
@@ -50,3 +51,13 @@ def test_root_folder(folder, folder_factory):
     folder_factory(parent=folder)
     tree = Tree.objects.first()
     assert tree.root_folder == folder
+
+
+@pytest.mark.django_db
+def test_deleted_root_folder_removes_permissions(folder, user_factory):
+    tree = folder.tree
+    tree.grant_permission(PermissionGrant(user_or_group=user_factory(), permission=Permission.read))
+    assert TreeUserObjectPermission.objects.filter(content_object=tree).exists()
+
+    folder.delete()
+    assert not TreeUserObjectPermission.objects.exists()
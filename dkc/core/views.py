@@ -1,9 +1,14 @@
+import csv
+from datetime import timedelta
+from typing import Dict, List
+
 from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth.models import User
 from django.db.models import Count, F, Max
 from django.http import Http404, HttpRequest, HttpResponse
 from django.shortcuts import render
 
-from dkc.core.models import Tree
+from dkc.core.models import ChecksumRequest, Folder, StorageUsage, StorageUsageSnapshot, Tree
 
 
 @staff_member_required
@@ -36,3 +41,91 @@ def staff_tree_list(request: HttpRequest) -> HttpResponse:
         .order_by(order_by)
     )
     return render(request, 'core/staff_tree_list.html', {'trees': trees_annotated})
+
+
+@staff_member_required
+def staff_checksum_status(request: HttpRequest) -> HttpResponse:
+    return render(
+        request, 'core/staff_checksum_status.html', {'stats': ChecksumRequest.statistics()}
+    )
+
+
+def _get_usage_dimension(request: HttpRequest) -> str:
+    dimension = request.GET.get('dimension', StorageUsage.Dimension.USER)
+    if dimension not in StorageUsage.Dimension.values:
+        raise Http404('Invalid dimension')
+    return dimension
+
+
+def _usage_labels(dimension: str, keys: List[str]) -> Dict[str, str]:
+    if dimension == StorageUsage.Dimension.USER:
+        users = User.objects.filter(pk__in=keys).values_list('pk', 'username')
+        return {str(pk): username for pk, username in users}
+    if dimension == StorageUsage.Dimension.TREE:
+        roots = Folder.objects.filter(tree__in=keys, parent=None).values_list('tree', 'name')
+        return {str(tree_id): name for tree_id, name in roots}
+    return {key: key for key in keys}
+
+
+@staff_member_required
+def staff_storage_usage(request: HttpRequest) -> HttpResponse:
+    dimension = _get_usage_dimension(request)
+    try:
+        days = int(request.GET.get('days', 30))
+    except ValueError:
+        raise Http404('Invalid days')
+
+    latest = StorageUsageSnapshot.objects.order_by('-taken').first()
+    usages = []
+    if latest:
+        usages = list(latest.usages.filter(dimension=dimension).order_by('-bytes')[:100])
+        keys = [usage.key for usage in usages]
+        baseline = (
+            StorageUsageSnapshot.objects.filter(taken__lte=latest.taken - timedelta(days=days))
+            .order_by('-taken')
+            .first()
+        )
+        previous_bytes = (
+            dict(
+                baseline.usages.filter(dimension=dimension, key__in=keys).values_list(
+                    'key', 'bytes'
+                )
+            )
+            if baseline
+            else {}
+        )
+        labels = _usage_labels(dimension, keys)
+        for usage in usages:
+            usage.label = labels.get(usage.key, f'{usage.key} (deleted)')
+            usage.growth = usage.bytes - previous_bytes.get(usage.key, 0)
+
+    return render(
+        request,
+        'core/staff_storage_usage.html',
+        {
+            'dimension': dimension,
+            'dimensions': StorageUsage.Dimension.choices,
+            'days': days,
+            'snapshot': latest,
+            'usages': usages,
+        },
+    )
+
+
+@staff_member_required
+def staff_storage_usage_csv(request: HttpRequest) -> HttpResponse:
+    dimension = _get_usage_dimension(request)
+    usages = StorageUsage.objects.filter(dimension=dimension).order_by('snapshot__taken', 'key')
+    keys = request.GET.getlist('key')
+    if keys:
+        usages = usages.filter(key__in=keys)
+
+    response = HttpResponse(content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="storage_usage_{dimension}.csv"'
+    writer = csv.writer(response)
+    writer.writerow(['date', dimension, 'files', 'bytes'])
+    for taken, key, files, size in usages.values_list(
+        'snapshot__taken', 'key', 'files', 'bytes'
+    ).iterator():
+        writer.writerow([taken.date().isoformat(), key, files, size])
+    return response
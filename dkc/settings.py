@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from datetime import timedelta
 from pathlib import Path
 import re
 
@@ -43,8 +44,50 @@ class DkcMixin(ConfigMixin):
 
     DKC_DEFAULT_QUOTA = 3 << 30  # 3 GB
     DKC_AUTHORIZED_UPLOAD_EXPIRATION_DAYS = 7
+    # Pending files hold their quota until their blob is set, or until they expire
+    DKC_PENDING_FILE_EXPIRATION_DAYS = 7
+    # Completion notifications sent within this delay are coalesced into a single email
+    DKC_UPLOAD_NOTIFICATION_DELAY_SECONDS = 60
+    # Maximum staleness of a process's filter of known checksums, used by hash_download
+    DKC_HASH_FILTER_REFRESH_SECONDS = 10
+    # Threads used by each checksum task, and the number of files each task claims at once
+    DKC_CHECKSUM_WORKERS = 4
+    DKC_CHECKSUM_BATCH_SIZE = 32
+    # Claimed checksum requests are claimed again after this long, which must exceed the time
+    # taken to compute a batch; failed requests are retried at this interval, a limited number
+    # of times
+    DKC_CHECKSUM_CLAIM_EXPIRATION_HOURS = 6
+    DKC_CHECKSUM_MAX_FAILURES = 3
+    # Files enqueued at once, when checksums are recomputed in bulk from the admin
+    DKC_CHECKSUM_ENQUEUE_CHUNK_SIZE = 5000
+    # Files whose legacy checksums are verified by each run of the sampling verifier
+    DKC_LEGACY_CHECKSUM_SAMPLE_SIZE = 16
+    # The number of trees whose permissions are cached, per process
+    DKC_PERMISSION_CACHE_TREES = 10000
+    # Cache lifetime of users' terms of use agreements; revocations may be delayed by up to this
+    DKC_TERMS_AGREEMENT_CACHE_SECONDS = 300
     DKC_SPA_URL = values.Value(environ_required=True)
 
+    CELERY_BEAT_SCHEDULE = {
+        'expire-pending-files': {
+            'task': 'dkc.core.tasks.expire_pending_files',
+            'schedule': timedelta(hours=1),
+        },
+        'take-storage-usage-snapshot': {
+            'task': 'dkc.core.tasks.take_storage_usage_snapshot',
+            'schedule': timedelta(days=1),
+        },
+        # Resume requests whose claims expired, after a failure or a lost worker
+        'compute-pending-checksums': {
+            'task': 'dkc.core.tasks.compute_pending_checksums',
+            'schedule': timedelta(hours=1),
+        },
+        'verify-legacy-checksums': {
+            'task': 'dkc.core.tasks.verify_legacy_checksums',
+            'schedule': timedelta(hours=1),
+        },
+    }
+
     @staticmethod
     def before_binding(configuration: ComposedConfiguration) -> None:
         # Install local apps first, to ensure any overridden resources are found first
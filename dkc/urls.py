@@ -7,9 +7,16 @@ from drf_yasg.views import get_schema_view
 from rest_framework import permissions, routers
 
 from dkc.core import views
-from dkc.core.rest import AuthorizedUploadViewSet, FileViewSet, FolderViewSet, UserViewSet
+from dkc.core.rest import (
+    AccessViewSet,
+    AuthorizedUploadViewSet,
+    FileViewSet,
+    FolderViewSet,
+    UserViewSet,
+)
 
 router = routers.SimpleRouter(trailing_slash=False)
+router.register(r'access', AccessViewSet, basename='access')
 router.register(r'authorized_uploads', AuthorizedUploadViewSet)
 router.register(r'files', FileViewSet)
 router.register(r'folders', FolderViewSet)
@@ -29,6 +36,9 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('staff/', views.staff_home, name='staff-home'),
     path('staff/tree/', views.staff_tree_list, name='staff-tree-list'),
+    path('staff/checksums/', views.staff_checksum_status, name='staff-checksum-status'),
+    path('staff/usage/', views.staff_storage_usage, name='staff-storage-usage'),
+    path('staff/usage.csv', views.staff_storage_usage_csv, name='staff-storage-usage-csv'),
     path('api/v2/s3-upload/', include('s3_file_field.urls')),
     path('api/v2/', include(router.urls)),
     path('api/docs/redoc/', schema_view.with_ui('redoc'), name='docs-redoc'),
@@ -3,9 +3,13 @@ import os
 import configurations.importer
 from django.core.wsgi import get_wsgi_application
 
+from dkc.core.hash_filter import warm_known_checksums
+
 os.environ['DJANGO_SETTINGS_MODULE'] = 'dkc.settings'
 if not os.environ.get('DJANGO_CONFIGURATION'):
     raise ValueError('The environment variable "DJANGO_CONFIGURATION" must be set.')
 configurations.importer.install()
 
 application = get_wsgi_application()
+# Build the filters used by hash_download before this process serves its first requests
+warm_known_checksums()